@@ -204,6 +204,7 @@ function Chatbot() {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          Authorization: `Bearer ${localStorage.getItem("token")}`,
         },
         body: JSON.stringify({
           message: userMessage.text,
@@ -232,11 +233,12 @@ function Chatbot() {
         judge_reason: null,
         pollingStatus: "checking",
         translatedQuery: translatedQuery,
+        interactionId: data.interaction_id,
       };
 
       setMessages((prev) => [...prev, botMessage]);
 
-      startPollingForGrade(newBotMessageId);
+      startPollingForGrade(newBotMessageId, data.interaction_id);
     } catch (error) {
       console.error("Error fetching response:", error);
       const errorMessage = {
@@ -254,7 +256,7 @@ function Chatbot() {
     }
   };
 
-  const startPollingForGrade = (messageId) => {
+  const startPollingForGrade = (messageId, interactionId) => {
     const maxAttempts = 10;
     let attempts = 0;
     const BACKEND_URL = import.meta.env.VITE_BACKEND_URL;
@@ -287,10 +289,19 @@ function Chatbot() {
           )
         );
 
-        const logsResponse = await fetch(`${BACKEND_URL}/logs`);
+        // Long-poll: the server holds the request open until this
+        // interaction is graded (or 30s pass), so no client-side delay.
+        const gradeResponse = await fetch(
+          `${BACKEND_URL}/interactions/${interactionId}/grade?wait=30`,
+          {
+            headers: {
+              Authorization: `Bearer ${localStorage.getItem("token")}`,
+            },
+          }
+        );
 
-        if (!logsResponse.ok) {
-          if (logsResponse.status === 429) {
+        if (!gradeResponse.ok) {
+          if (gradeResponse.status === 429) {
             console.log("Rate limited (429). Too many requests.");
 
             setMessages((prev) =>
@@ -330,38 +341,44 @@ function Chatbot() {
 
             return;
           }
-          throw new Error(`Failed to fetch logs: ${logsResponse.status}`);
+          throw new Error(`Failed to fetch grade: ${gradeResponse.status}`);
         }
 
-        const logsData = await logsResponse.json();
-        console.log("Logs response:", logsData);
+        const gradeData = await gradeResponse.json();
+        console.log("Grade response:", gradeData);
 
-        if (logsData.logs && logsData.logs.length > 0) {
-          const latestLog = logsData.logs[0];
+        if (gradeData.status === "graded") {
+          const judge_score = gradeData.judge_score ?? null;
+          const judge_reason = gradeData.judge_reason || null;
 
-          if (latestLog.status === "graded") {
-            const judge_score = latestLog.judge_score || null;
-            const judge_reason = latestLog.judge_reason || null;
+          setMessages((prev) =>
+            prev.map((msg) =>
+              msg.id === messageId
+                ? {
+                    ...msg,
+                    judge_score,
+                    judge_reason,
+                    pollingStatus: "complete",
+                  }
+                : msg
+            )
+          );
+          console.log("Grading complete! Score:", judge_score);
+          return;
+        }
 
-            setMessages((prev) =>
-              prev.map((msg) =>
-                msg.id === messageId
-                  ? {
-                      ...msg,
-                      judge_score,
-                      judge_reason,
-                      pollingStatus: "complete",
-                    }
-                  : msg
-              )
-            );
-            console.log("Grading complete! Score:", judge_score);
-            return;
-          }
+        if (gradeData.status === "failed") {
+          console.log("The judge could not grade this answer");
+          setMessages((prev) =>
+            prev.map((msg) =>
+              msg.id === messageId ? { ...msg, pollingStatus: "timeout" } : msg
+            )
+          );
+          return;
         }
 
         if (attempts < maxAttempts) {
-          setTimeout(poll, 5000);
+          poll();
         } else {
           console.log("Max polling attempts reached (Timeout)");
           setMessages((prev) =>
@@ -371,14 +388,14 @@ function Chatbot() {
           );
         }
       } catch (error) {
-        console.error("Error fetching logs:", error);
+        console.error("Error fetching grade:", error);
         if (attempts < maxAttempts) {
           setTimeout(poll, 5000);
         }
       }
     };
 
-    setTimeout(poll, 3000);
+    poll();
   };
 
   const openGradingModal = (message) => {
@@ -406,7 +423,8 @@ function Chatbot() {
         msg.id === messageId ? { ...msg, pollingStatus: "checking" } : msg
       )
     );
-    startPollingForGrade(messageId);
+    const message = messages.find((msg) => msg.id === messageId);
+    startPollingForGrade(messageId, message?.interactionId);
   };
 
   const closeGradingModal = () => {
@@ -1,13 +1,25 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, HTTPException
+import asyncio
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Annotated
-import libsql
 import os
 from dotenv import load_dotenv
 from routes.auth import router as auth_router
+from routes.chat import router as chat_router
+from routes.interactions import router as interactions_router
+from routes.search import router as search_router
+from routes.ws import router as ws_router
 
 
-from database import get_db, init_db
+from database import init_db, close_pool, start_replication, stop_replication
+from counters import interaction_counts
+from db_async import db
+from grades import grade_notifier
+import hashing
+import judge_worker
+import metrics
+import providers
+import retrieval
+from write_behind import writer
 
 
 load_dotenv()
@@ -20,7 +32,37 @@ app = FastAPI(title="CivicAccess Backend")
 def on_startup():
     print("Starting FastAPI app...")
 
+    providers.check_llm_provider()
     init_db()
+    start_replication()
+    hashing.pool.start()
+    retrieval.get_retriever()
+    retrieval.start_watching()
+
+
+_judge = None
+
+
+@app.on_event("startup")
+async def start_judge():
+    global _judge
+
+    if judge_worker.JUDGE_IN_PROCESS:
+        _judge = judge_worker.create_worker(on_graded=grade_notifier.notify)
+        app.state.judge_task = asyncio.get_running_loop().create_task(_judge.run())
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if _judge is not None:
+        _judge.stop()
+        await app.state.judge_task
+    await writer.stop()
+    retrieval.stop_watching()
+    stop_replication()
+    hashing.pool.shutdown()
+    db.close()
+    close_pool()
 
 
 origins = [
@@ -40,6 +82,10 @@ print("CORS configured")
 
 
 app.include_router(auth_router)
+app.include_router(chat_router)
+app.include_router(interactions_router)
+app.include_router(search_router)
+app.include_router(ws_router)
 
 
 @app.get("/")
@@ -47,14 +93,24 @@ def read_root():
     return {"message": "Welcome to CivicAccess API"}
 
 
+@app.get("/metrics")
+def get_metrics():
+    """
+    Reports in-process gauges (connection pool usage, wait times, ...) for this worker.
+    """
+    return metrics.snapshot()
+
+
 @app.get("/interactions/count")
-def get_interaction_count(conn: Annotated[libsql.Connection, Depends(get_db)]):
+async def get_interaction_count():
     """
-    Retrieves the total count of interactions from the Turso database.
+    Retrieves interaction counts (total, per status and per language) from the
+    trigger-maintained counters table, cached for COUNTS_CACHE_TTL seconds.
     """
     try:
-        result = conn.execute("SELECT COUNT(id) AS count FROM interactions").fetchone()
-        return {"total_interactions": result["count"]}
+        return await interaction_counts.get()
+    except HTTPException:
+        raise
     except Exception as e:
 
         raise HTTPException(status_code=500, detail=f"Database query failed: {e}")
@@ -0,0 +1,106 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+
+import metrics
+
+
+class Flight:
+    """
+    One in-flight computation that any number of requests can follow.
+
+    The computation publishes (event, data) pairs as it goes; each follower
+    first gets everything published so far, then live events, then the
+    result or the error the computation ended with.
+    """
+
+    def __init__(self):
+        self.events: list[tuple[str, dict]] = []
+        self.done = False
+        self.result = None
+        self.error: BaseException | None = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event: str, data: dict):
+        self.events.append((event, data))
+        self._notify()
+
+    def finish(self, result=None, error: BaseException | None = None):
+        self.result = result
+        self.error = error
+        self.done = True
+        self._notify()
+
+    async def follow(self) -> AsyncIterator[tuple[str, dict]]:
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+    async def wait(self):
+        while not self.done:
+            await self._changed.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time.
+
+    The first request for a key starts the computation as its own task, so a
+    client disconnecting does not cancel it for the others; later requests
+    for the same key attach to it until it finishes.
+    """
+
+    def __init__(self):
+        self._flights: dict[str, Flight] = {}
+        self._tasks = set()
+        self._started = 0
+        self._joined = 0
+
+    def join(self, key: str, compute: Callable[[Flight], Awaitable]) -> tuple[Flight, bool]:
+        """Returns (flight, started) where `started` is True for the request that began it."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            self._joined += 1
+            return flight, False
+
+        flight = self._flights[key] = Flight()
+        self._started += 1
+        task = asyncio.get_running_loop().create_task(self._run(key, flight, compute))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return flight, True
+
+    def stats(self) -> dict:
+        requests = self._started + self._joined
+        return {
+            "in_flight": len(self._flights),
+            "started": self._started,
+            "coalesced": self._joined,
+            "coalesced_ratio": round(self._joined / requests, 4) if requests else 0.0,
+        }
+
+    async def _run(self, key: str, flight: Flight, compute):
+        try:
+            flight.finish(result=await compute(flight))
+        except Exception as e:
+            flight.finish(error=e)
+        finally:
+            self._flights.pop(key, None)
+
+
+chat_flights = SingleFlight()
+metrics.register("chat_coalescing", chat_flights.stats)
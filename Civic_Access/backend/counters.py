@@ -0,0 +1,60 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+
+from db_async import db
+
+
+load_dotenv()
+
+
+COUNTS_CACHE_TTL = float(os.getenv("COUNTS_CACHE_TTL", 2))
+
+
+class InteractionCounts:
+    """
+    Reads the trigger-maintained `interaction_counters` table, caching the
+    result for `ttl` seconds so dashboard polling costs one small query per
+    TTL per worker, whatever the size of `interactions`.
+    """
+
+    def __init__(self, ttl: float = 2.0):
+        self.ttl = ttl
+        self._cached = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> dict:
+        if self._cached is not None and time.monotonic() - self._fetched_at < self.ttl:
+            return self._cached
+
+        async with self._lock:
+            if self._cached is not None and time.monotonic() - self._fetched_at < self.ttl:
+                return self._cached
+
+            rows = await db.fetchall(
+                "SELECT status, target_lang, count FROM interaction_counters"
+            )
+            self._cached = summarize(rows)
+            self._fetched_at = time.monotonic()
+            return self._cached
+
+
+def summarize(rows: list[dict]) -> dict:
+    by_status = {}
+    by_language = {}
+    for row in rows:
+        status = row["status"] or "unknown"
+        language = row["target_lang"] or "unknown"
+        by_status[status] = by_status.get(status, 0) + row["count"]
+        by_language[language] = by_language.get(language, 0) + row["count"]
+
+    return {
+        "total_interactions": sum(by_status.values()),
+        "by_status": by_status,
+        "by_language": by_language,
+    }
+
+
+interaction_counts = InteractionCounts(COUNTS_CACHE_TTL)
@@ -1,108 +1,312 @@
 import os
 import libsql
+import threading
+from collections import deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from typing import Generator
 from fastapi import HTTPException
 import time
 
+import metrics
+import migrate
+import replication
+
 
 load_dotenv()
 
 
 TURSO_URL = os.getenv("TURSO_URL")
 TURSO_TOKEN = os.getenv("TURSO_TOKEN")
+# Use only the local.db file, with no Turso replication (offline development and load tests).
+LOCAL_DB_ONLY = os.getenv("LOCAL_DB_ONLY", "").lower() in ("1", "true", "yes")
+
+
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 8))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))
+POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", 1800))
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up within the checkout timeout."""
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at")
+
+    def __init__(self, conn: libsql.Connection):
+        self.conn = conn
+        self.created_at = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Bounded pool of libsql connections.
+
+    Connections are opened lazily up to `max_size`, health-checked on checkout
+    and replaced once they are older than `recycle` seconds. Callers that find
+    the pool exhausted wait up to `timeout` seconds before giving up.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=8, timeout=5.0, recycle=1800.0):
+        self._connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._health_failures = 0
+        self._wait = metrics.LatencyStats()
+
+    def open(self):
+        """Opens the first `min_size` connections so early requests don't pay for them."""
+        for _ in range(self.min_size):
+            entry = _PooledConnection(self._connect())
+            with self._cond:
+                self._size += 1
+                self._idle.append(entry)
+
+    def acquire(self, timeout: float | None = None) -> _PooledConnection:
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    entry = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {timeout}s"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._in_use += 1
+            self._checkouts += 1
+
+        try:
+            if entry is None:
+                entry = _PooledConnection(self._connect())
+            elif not self._is_usable(entry):
+                self._close_quietly(entry.conn)
+                entry = _PooledConnection(self._connect())
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        self._wait.record(time.monotonic() - start)
+        return entry
+
+    def release(self, entry: _PooledConnection, discard: bool = False):
+        if not discard:
+            try:
+                if entry.conn.in_transaction:
+                    entry.conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append(entry)
+            self._cond.notify()
+
+        if discard or self._closed:
+            self._close_quietly(entry.conn)
+
+    @contextmanager
+    def connection(self, timeout: float | None = None):
+        entry = self.acquire(timeout)
+        try:
+            yield entry.conn
+        finally:
+            self.release(entry)
 
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
 
-_db_connection = None
-_last_sync = 0
-SYNC_INTERVAL = 5
+        for entry in idle:
+            self._close_quietly(entry.conn)
 
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "health_check_failures": self._health_failures,
+                "wait": self._wait.snapshot(),
+            }
 
-def get_db_connection() -> libsql.Connection | None:
+    def _is_usable(self, entry: _PooledConnection) -> bool:
+        if time.monotonic() - entry.created_at > self.recycle:
+            with self._cond:
+                self._recycled += 1
+            return False
+        try:
+            entry.conn.execute("SELECT 1").fetchone()
+            return True
+        except Exception as e:
+            print(f"--- Pooled connection failed health check: {e} ---")
+            with self._cond:
+                self._health_failures += 1
+            return False
+
+    @staticmethod
+    def _close_quietly(conn: libsql.Connection):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def _connect() -> libsql.Connection:
+    if LOCAL_DB_ONLY:
+        return libsql.connect("local.db")
+    return libsql.connect(
+        database="local.db", sync_url=TURSO_URL, auth_token=TURSO_TOKEN
+    )
+
+
+def get_pool() -> ConnectionPool | None:
     """
-    Reuses a single connection instead of creating a new one each time.
+    Returns the process-wide connection pool, creating it on first use.
     """
-    global _db_connection, _last_sync
+    global _pool
 
-    if not TURSO_URL or not TURSO_TOKEN:
+    if _pool is not None:
+        return _pool
+
+    if not LOCAL_DB_ONLY and (not TURSO_URL or not TURSO_TOKEN):
         print("--- Error: TURSO_URL or TURSO_TOKEN missing in .env ---")
         return None
 
-    try:
-
-        if _db_connection is None:
-            print("Creating new Turso connection...")
-            _db_connection = libsql.connect(
-                database="local.db", sync_url=TURSO_URL, auth_token=TURSO_TOKEN
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+        try:
+            print("Creating local.db connection pool..." if LOCAL_DB_ONLY else "Creating Turso connection pool...")
+            pool = ConnectionPool(
+                _connect,
+                min_size=POOL_MIN_SIZE,
+                max_size=POOL_MAX_SIZE,
+                timeout=POOL_TIMEOUT,
+                recycle=POOL_RECYCLE,
             )
-            _db_connection.sync()
-            _last_sync = time.time()
+            pool.open()
+        except Exception as e:
+            print(f"--- Turso Connection Error: {e} ---")
+            return None
 
-        current_time = time.time()
-        if current_time - _last_sync > SYNC_INTERVAL:
-            print("Syncing with remote Turso...")
-            _db_connection.sync()
-            _last_sync = current_time
+        _pool = pool
+        metrics.register("db_pool", pool.stats)
+        return _pool
 
-        return _db_connection
-    except Exception as e:
-        print(f"--- Turso Connection Error: {e} ---")
-        _db_connection = None
-        return None
+
+def close_pool():
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def start_replication():
+    """Starts background replica syncs; the first one runs off the startup path."""
+    if TURSO_URL and TURSO_TOKEN and not LOCAL_DB_ONLY:
+        replication.start(_connect)
+
+
+def stop_replication():
+    replication.stop()
 
 
 def init_db():
-    """Creates tables in the database if they don't exist."""
-    conn = get_db_connection()
-    if not conn:
+    """Applies pending schema migrations; does no DDL when the schema is current."""
+    pool = get_pool()
+    if not pool:
         print("--- Cannot initialize DB: Connection failed. ---")
         return
 
     try:
-
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS user (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """
-        )
-
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS interactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                user_query TEXT,
-                target_lang TEXT,
-                rag_context TEXT,
-                model_reply TEXT,
-                judge_score INTEGER,
-                judge_reason TEXT,
-                status TEXT DEFAULT 'pending'
-            )
-        """
-        )
-        conn.commit()
-        conn.sync()
-        print("Database Initialized on Turso (user and interactions tables)")
+        with pool.connection() as conn:
+            applied = migrate.run(conn, sync=not LOCAL_DB_ONLY)
+        if applied:
+            replication.request_sync()
+            print(f"Database migrated {'in local.db' if LOCAL_DB_ONLY else 'on Turso'} (applied versions {applied})")
+        else:
+            print("Database schema is up to date")
     except Exception as e:
         print(f"--- DB Init Error: {e} ---")
 
 
 def get_db() -> Generator[libsql.Connection, None, None]:
     """
-    Dependency function that provides a reused database connection.
+    Dependency function that checks a connection out of the pool for one request.
     """
-    conn = get_db_connection()
-    if conn is None:
+    pool = get_pool()
+    if pool is None:
+        raise HTTPException(status_code=503, detail="Database connection unavailable")
+
+    try:
+        entry = pool.acquire()
+    except PoolTimeout as e:
+        print(f"--- {e} ---")
+        raise HTTPException(status_code=503, detail="Database is busy, try again")
+    except Exception as e:
+        print(f"--- Turso Connection Error: {e} ---")
         raise HTTPException(status_code=503, detail="Database connection unavailable")
 
     try:
-        yield conn
+        yield entry.conn
     except Exception as e:
         print(f"Database error: {e}")
         raise
+    finally:
+        pool.release(entry)
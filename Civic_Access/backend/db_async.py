@@ -0,0 +1,184 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+import metrics
+import replication
+from database import POOL_MAX_SIZE, PoolTimeout, get_pool
+
+
+load_dotenv()
+
+
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", 4))
+
+
+def _rows_as_dicts(cursor, rows):
+    columns = [col[0] for col in cursor.description or ()]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def _checkout(pool_timeout: float | None = None):
+    pool = get_pool()
+    if pool is None:
+        raise HTTPException(status_code=503, detail="Database connection unavailable")
+    try:
+        return pool, pool.acquire(pool_timeout)
+    except PoolTimeout as e:
+        print(f"--- {e} ---")
+        raise HTTPException(status_code=503, detail="Database is busy, try again")
+
+
+def _fetchone(conn, sql, params):
+    cursor = conn.execute(sql, params)
+    row = cursor.fetchone()
+    return _rows_as_dicts(cursor, [row])[0] if row is not None else None
+
+
+def _fetchall(conn, sql, params):
+    cursor = conn.execute(sql, params)
+    return _rows_as_dicts(cursor, cursor.fetchall())
+
+
+def _execute(conn, sql, params):
+    return conn.execute(sql, params)
+
+
+def _executemany(conn, sql, seq_of_params):
+    return conn.executemany(sql, seq_of_params)
+
+
+class AsyncDatabase:
+    """
+    Awaitable access to libsql for `async def` routes.
+
+    Every call runs on a small dedicated thread pool so a slow round-trip to
+    Turso only ties up a DB thread, never the event loop. Each of those
+    threads keeps one pooled connection checked out for as long as it lives.
+    """
+
+    def __init__(self, max_workers: int = 4, pool_size: int = POOL_MAX_SIZE):
+        if max_workers >= pool_size:
+            raise RuntimeError(
+                f"DB_EXECUTOR_WORKERS ({max_workers}) must be below DB_POOL_MAX_SIZE ({pool_size}): "
+                "each DB thread keeps one pooled connection checked out, and get_db and "
+                "migrations need one more"
+            )
+        self.max_workers = max_workers
+        self._executor = None
+        self._local = threading.local()
+        self._pinned = []
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._latency = metrics.LatencyStats()
+
+    async def fetchone(self, sql: str, params=()) -> dict | None:
+        """Runs a query and returns its first row as a dict, or None."""
+        return await self._submit(self._on_pinned, False, _fetchone, sql, params)
+
+    async def fetchall(self, sql: str, params=()) -> list[dict]:
+        """Runs a query and returns every row as a dict."""
+        return await self._submit(self._on_pinned, False, _fetchall, sql, params)
+
+    async def execute(self, sql: str, params=()):
+        """Runs a single write and commits it. Returns the cursor (lastrowid, rowcount)."""
+        cursor = await self._submit(self._on_pinned, True, _execute, sql, params)
+        replication.request_sync()
+        return cursor
+
+    async def run(self, fn, *args):
+        """
+        Calls `fn(conn, *args)` on a DB thread and commits afterwards.
+
+        For batches that would otherwise cost one executor hop per statement,
+        and for statements that must commit together.
+        """
+        result = await self._submit(self._on_pinned, True, fn, *args)
+        replication.request_sync()
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "pinned_connections": len(self._pinned),
+                "queued": self._queued,
+                "latency": self._latency.snapshot(),
+            }
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+        with self._lock:
+            pinned, self._pinned = self._pinned, []
+        for pool, entry in pinned:
+            pool.release(entry)
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.max_workers, thread_name_prefix="db"
+                )
+            executor = self._executor
+            self._queued += 1
+
+        start = time.monotonic()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            self._latency.record(time.monotonic() - start)
+            with self._lock:
+                self._queued -= 1
+
+    def _on_pinned(self, commit, fn, *args):
+        """Runs `fn` on this worker thread's own connection (called inside the executor)."""
+        pinned = getattr(self._local, "pinned", None)
+        if pinned is not None:
+            pool, entry = pinned
+            if time.monotonic() - entry.created_at > pool.recycle:
+                self._unpin(discard=True)
+                pinned = None
+
+        if pinned is None:
+            pinned = _checkout()
+            self._local.pinned = pinned
+            with self._lock:
+                self._pinned.append(pinned)
+
+        conn = pinned[1].conn
+        try:
+            result = fn(conn, *args)
+            if commit:
+                conn.commit()
+            return result
+        except Exception:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                conn.execute("SELECT 1").fetchone()
+            except Exception:
+                self._unpin(discard=True)
+            raise
+
+    def _unpin(self, discard=False):
+        pinned = getattr(self._local, "pinned", None)
+        if pinned is None:
+            return
+        self._local.pinned = None
+        with self._lock:
+            if pinned in self._pinned:
+                self._pinned.remove(pinned)
+        pool, entry = pinned
+        pool.release(entry, discard=discard)
+
+
+db = AsyncDatabase(DB_EXECUTOR_WORKERS)
+metrics.register("db_executor", db.stats)
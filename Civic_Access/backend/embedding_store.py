@@ -0,0 +1,312 @@
+"""Embedding store for corpus chunks on disk, with a per-worker LRU for query embeddings."""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from dotenv import load_dotenv
+
+import numpy as np
+
+import metrics
+from providers import EmbeddingProvider, get_embedding_provider
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends from several processes are not serialized
+    fcntl = None
+
+
+load_dotenv()
+
+
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", str(Path(__file__).resolve().parent / "embeddings"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 256))
+EMBEDDING_QUERY_CACHE_SIZE = int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", 10000))
+
+_MAGIC = b"CIVICEMB"
+_HEADER = struct.Struct("<8sHHI")
+_KEY_BYTES = 16
+_SCAN_ROWS = 4096
+
+
+class EmbeddingStoreError(ValueError):
+    """The store file belongs to another model or dimension, or is not a store file."""
+
+
+def content_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()[:_KEY_BYTES]
+
+
+class EmbeddingStore:
+    """
+    Append-only file of fixed-size (key, float32 vector) records for one model.
+
+    The key -> row index is rebuilt by scanning the keys when the file is
+    opened, and extended when another process has appended since. A record
+    torn by a crash is ignored and overwritten by the next append.
+    """
+
+    def __init__(self, path: str | os.PathLike, dim: int):
+        self.path = Path(path)
+        self.dim = dim
+        self._record = _KEY_BYTES + 4 * dim
+        self._rows: dict[bytes, int] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+        self._file = open(self.path, "r+b")
+        try:
+            with self._file_lock():
+                header = self._read(0, _HEADER.size)
+                if not header:
+                    self._write(0, _HEADER.pack(_MAGIC, 1, 0, dim))
+                else:
+                    magic, _, _, stored_dim = _HEADER.unpack(header.ljust(_HEADER.size, b"\0"))
+                    if magic != _MAGIC:
+                        raise EmbeddingStoreError(f"{self.path}: not an embedding store")
+                    if stored_dim != dim:
+                        raise EmbeddingStoreError(f"{self.path}: stores {stored_dim}-d vectors, not {dim}-d")
+                self._scan()
+        except Exception:
+            self._file.close()
+            raise
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get_many(self, keys: list[bytes]) -> dict[bytes, np.ndarray]:
+        """Returns the stored vectors for whichever of `keys` are present."""
+        with self._lock:
+            if any(key not in self._rows for key in keys):
+                self._scan()
+            found = {}
+            for key in keys:
+                row = self._rows.get(key)
+                if row is not None and key not in found:
+                    data = self._read(self._offset(row) + _KEY_BYTES, 4 * self.dim)
+                    found[key] = np.frombuffer(data, dtype="<f4")
+            return found
+
+    def put_many(self, keys: list[bytes], vectors: np.ndarray):
+        with self._lock, self._file_lock():
+            self._scan()
+            records = []
+            for key, vector in zip(keys, vectors):
+                if key in self._rows:
+                    continue
+                self._rows[key] = self._count + len(records)
+                records.append(key + np.asarray(vector, dtype="<f4").tobytes())
+            if records:
+                self._write(self._offset(self._count), b"".join(records))
+                self._count += len(records)
+
+    def stats(self) -> dict:
+        return {"path": str(self.path), "vectors": self._count, "file_bytes": self._offset(self._count)}
+
+    def close(self):
+        self._file.close()
+
+    def _offset(self, row: int) -> int:
+        return _HEADER.size + row * self._record
+
+    def _read(self, offset: int, length: int) -> bytes:
+        self._file.seek(offset)
+        return self._file.read(length)
+
+    def _write(self, offset: int, data: bytes):
+        self._file.seek(offset)
+        self._file.write(data)
+        self._file.flush()
+
+    def _scan(self):
+        """Indexes records appended (by any process) since the last scan."""
+        complete = (os.fstat(self._file.fileno()).st_size - _HEADER.size) // self._record
+        while self._count < complete:
+            rows = min(_SCAN_ROWS, complete - self._count)
+            data = self._read(self._offset(self._count), rows * self._record)
+            for i in range(rows):
+                key = data[i * self._record : i * self._record + _KEY_BYTES]
+                self._rows.setdefault(key, self._count + i)
+            self._count += rows
+
+    def _file_lock(self):
+        return _FileLock(self._file.fileno())
+
+
+class _FileLock:
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+def store_path(directory: str | os.PathLike, model_id: str) -> Path:
+    return Path(directory) / f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', model_id)}.emb"
+
+
+class CachedEmbedder(EmbeddingProvider):
+    """
+    EmbeddingProvider that only sends texts it has not seen to the wrapped
+    model, deduplicated and batched.
+
+    `embed` (queries) answers from an in-memory LRU of `query_cache_size`
+    vectors. `embed_documents` (corpus chunks) answers from the on-disk
+    `store`, when there is one; its file I/O runs in a worker thread so it
+    never blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        embedder: EmbeddingProvider,
+        store: EmbeddingStore | None = None,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        query_cache_size: int = EMBEDDING_QUERY_CACHE_SIZE,
+    ):
+        self.embedder = embedder
+        self.store = store
+        self.batch_size = batch_size
+        self.query_cache_size = query_cache_size
+        self.name = embedder.name
+        self.model_id = embedder.model_id
+        self.dim = embedder.dim
+        self._queries: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.query_hits = 0
+        self.query_misses = 0
+        self.batches = 0
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        keys = [content_key(text) for text in texts]
+        found = {}
+        for key in keys:
+            vector = self._queries.get(key)
+            if vector is not None:
+                self._queries.move_to_end(key)
+                found[key] = vector
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        self.query_hits += len(texts) - sum(1 for key in keys if key in missing)
+        self.query_misses += len(missing)
+
+        for batch_keys, vectors in await self._embed_missing(missing):
+            for key, vector in zip(batch_keys, vectors):
+                found[key] = vector
+                self._queries[key] = vector
+                self._queries.move_to_end(key)
+        while len(self._queries) > self.query_cache_size:
+            self._queries.popitem(last=False)
+        return self._stack(keys, found)
+
+    async def embed_documents(self, texts: list[str]) -> np.ndarray:
+        """Like `embed`, but cached in the persistent store; for corpus chunks."""
+        keys = [content_key(text) for text in texts]
+        found = await asyncio.to_thread(self.store.get_many, keys) if self.store is not None else {}
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        self.hits += len(texts) - sum(1 for key in keys if key in missing)
+        self.misses += len(missing)
+
+        for batch_keys, vectors in await self._embed_missing(missing):
+            if self.store is not None:
+                await asyncio.to_thread(self.store.put_many, batch_keys, vectors)
+            found.update(zip(batch_keys, vectors))
+        return self._stack(keys, found)
+
+    async def _embed_missing(self, missing: dict[bytes, str]) -> list[tuple[list[bytes], np.ndarray]]:
+        pending = list(missing.items())
+        batches = []
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start : start + self.batch_size]
+            vectors = await self.embedder.embed([text for _, text in batch])
+            self.batches += 1
+            batches.append(([key for key, _ in batch], vectors))
+        return batches
+
+    def _stack(self, keys: list[bytes], found: dict[bytes, np.ndarray]) -> np.ndarray:
+        if not keys:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([found[key] for key in keys]).astype(np.float32, copy=False)
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        queries = self.query_hits + self.query_misses
+        return {
+            "model_id": self.model_id,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+            "model_batches": self.batches,
+            "query_cache": {
+                "size": len(self._queries),
+                "capacity": self.query_cache_size,
+                "hits": self.query_hits,
+                "misses": self.query_misses,
+                "hit_rate": round(self.query_hits / queries, 4) if queries else 0.0,
+            },
+            **(self.store.stats() if self.store is not None else {}),
+        }
+
+
+_embedder: CachedEmbedder | None = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> CachedEmbedder:
+    """
+    The configured embedding model behind the query LRU and, unless
+    EMBEDDING_STORE_DIR is empty, the shared document store.
+    """
+    global _embedder
+
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                provider = get_embedding_provider()
+                store = None
+                if EMBEDDING_STORE_DIR:
+                    store = EmbeddingStore(store_path(EMBEDDING_STORE_DIR, provider.model_id), provider.dim)
+                _embedder = CachedEmbedder(provider, store)
+                metrics.register("embedding_store", _embedder.stats)
+    return _embedder
+
+
+async def _warm(corpus_dir: str):
+    from retrieval import load_corpus
+
+    embedder = get_embedder()
+    sections = load_corpus(corpus_dir)
+    await embedder.embed_documents([s.index_text for s in sections])
+    print(
+        f"{len(sections)} chunks: {embedder.misses} embedded in "
+        f"{embedder.batches} batches, {embedder.hits} already stored"
+    )
+
+
+if __name__ == "__main__":
+    from retrieval import CORPUS_DIR
+
+    parser = argparse.ArgumentParser(description="Manage the shared embedding store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    warm = commands.add_parser("warm", help="embed corpus chunks that are not stored yet")
+    warm.add_argument("--corpus", default=CORPUS_DIR)
+    commands.add_parser("stats", help="print the store's size")
+    args = parser.parse_args()
+
+    if args.command == "warm":
+        asyncio.run(_warm(args.corpus))
+    else:
+        print(json.dumps(get_embedder().stats(), indent=2))
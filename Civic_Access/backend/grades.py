@@ -0,0 +1,125 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+
+import metrics
+from db_async import db
+from write_behind import writer
+
+
+load_dotenv()
+
+
+GRADE_WATCH_INTERVAL = float(os.getenv("GRADE_WATCH_INTERVAL", 1))
+GRADE_MAX_WAIT = float(os.getenv("GRADE_MAX_WAIT", 60))
+
+_SELECT_GRADE = "SELECT id, user_id, status, judge_score, judge_reason FROM interactions"
+_FINISHED = ("graded", "failed")
+
+
+def _grade(row: dict) -> dict:
+    return {
+        "interaction_id": row["id"],
+        "status": row["status"],
+        "judge_score": row["judge_score"],
+        "judge_reason": row["judge_reason"],
+    }
+
+
+class GradeNotifier:
+    """
+    Lets requests wait for a specific interaction to be graded.
+
+    Grades written through this process's interaction writer wake waiters
+    immediately. Grades written elsewhere (a separate judge process) are
+    picked up by one watcher query per `interval` covering every waiting
+    interaction, no matter how many clients are waiting.
+    """
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._waiters: dict[int, list[asyncio.Future]] = {}
+        self._watcher = None
+        self._notified = 0
+        self._timeouts = 0
+
+    async def get(self, interaction_id: int, user_id: int | None = None) -> dict | None:
+        """The interaction's grade; None if it doesn't exist or, with `user_id`, isn't theirs."""
+        row = await db.fetchone(f"{_SELECT_GRADE} WHERE id = ?", [interaction_id])
+        if row is None or (user_id is not None and row["user_id"] != user_id):
+            return None
+        return _grade(row)
+
+    async def wait(self, interaction_id: int, timeout: float, user_id: int | None = None) -> dict | None:
+        """Returns the grade once judging finishes, or the current state after `timeout`."""
+        current = await self.get(interaction_id, user_id)
+        if current is None or current["status"] in _FINISHED or timeout <= 0:
+            return current
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(interaction_id, []).append(future)
+        self._ensure_watcher()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            return current
+        finally:
+            waiters = self._waiters.get(interaction_id, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(interaction_id, None)
+
+    def notify(self, grade: dict):
+        for future in self._waiters.pop(grade["interaction_id"], []):
+            if not future.done():
+                future.set_result(grade)
+                self._notified += 1
+
+    def on_write(self, kind: str, interaction_id: int, fields: dict):
+        """Interaction writer listener: wakes waiters as soon as judging finishes, graded or failed."""
+        if kind == "update" and fields.get("status") in _FINISHED:
+            self.notify(
+                {
+                    "interaction_id": interaction_id,
+                    "status": fields["status"],
+                    "judge_score": fields.get("judge_score"),
+                    "judge_reason": fields.get("judge_reason"),
+                }
+            )
+
+    def stats(self) -> dict:
+        return {
+            "waiting_interactions": len(self._waiters),
+            "waiters": sum(len(w) for w in self._waiters.values()),
+            "notified": self._notified,
+            "timeouts": self._timeouts,
+        }
+
+    def _ensure_watcher(self):
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.get_running_loop().create_task(self._watch())
+
+    async def _watch(self):
+        while self._waiters:
+            await asyncio.sleep(self.interval)
+            ids = list(self._waiters)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start : start + 500]
+                try:
+                    rows = await db.fetchall(
+                        f"{_SELECT_GRADE} WHERE status IN ('graded', 'failed') "
+                        f"AND id IN ({', '.join('?' for _ in chunk)})",
+                        chunk,
+                    )
+                except Exception as e:
+                    print(f"--- Grade watcher query failed: {e} ---")
+                    break
+                for row in rows:
+                    self.notify(_grade(row))
+
+
+grade_notifier = GradeNotifier(GRADE_WATCH_INTERVAL)
+writer.add_listener(grade_notifier.on_write)
+metrics.register("grade_notifier", grade_notifier.stats)
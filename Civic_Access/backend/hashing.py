@@ -0,0 +1,190 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+import bcrypt
+
+import metrics
+
+
+load_dotenv()
+
+
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", 0)) or os.cpu_count() or 1
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", 0)) or HASH_POOL_SIZE * 4
+
+# Either pin the bcrypt cost with BCRYPT_ROUNDS, or set BCRYPT_TARGET_MS and the
+# cost is calibrated on this host at startup. Existing hashes move to a pinned
+# cost the next time their owner logs in. A calibrated cost differs between
+# processes and hosts, so it only moves hashes up, and only when they are more
+# than BCRYPT_REHASH_TOLERANCE rounds below it (or outside the min/max bounds).
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 0))
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", 0))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", 10))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", 15))
+BCRYPT_REHASH_TOLERANCE = int(os.getenv("BCRYPT_REHASH_TOLERANCE", 1))
+DEFAULT_ROUNDS = 12
+CALIBRATION_ROUNDS = 10
+
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _verify(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+def _time_hash(rounds: int) -> float:
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+    return time.perf_counter() - start
+
+
+def rounds_of(hashed_password: str) -> int | None:
+    """Reads the cost factor out of a `$2b$12$...` bcrypt hash."""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def rounds_for_target(seconds_at_calibration: float, target_ms: float) -> int:
+    """Picks the cost whose hash time is closest to `target_ms`; each extra round doubles it."""
+    rounds = CALIBRATION_ROUNDS
+    elapsed_ms = seconds_at_calibration * 1000
+    while elapsed_ms * 2 <= target_ms * 1.5 and rounds < BCRYPT_MAX_ROUNDS:
+        elapsed_ms *= 2
+        rounds += 1
+    while elapsed_ms > target_ms * 1.5 and rounds > BCRYPT_MIN_ROUNDS:
+        elapsed_ms /= 2
+        rounds -= 1
+    return max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, rounds))
+
+
+class HashingPool:
+    """
+    Runs bcrypt in worker processes so password checks never hold the event loop.
+
+    At most `queue_limit` hashes may be in flight (running or waiting for a
+    worker); anything beyond that is refused with a 503 rather than queued.
+    """
+
+    def __init__(self, size: int, queue_limit: int):
+        self.size = size
+        self.queue_limit = max(queue_limit, size)
+        self.rounds = max(BCRYPT_MIN_ROUNDS, BCRYPT_ROUNDS or DEFAULT_ROUNDS)
+        self._executor = None
+        self._start_lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+        self._latency = {"hash": metrics.LatencyStats(), "verify": metrics.LatencyStats()}
+
+    def start(self):
+        """Spawns the workers and waits until each one has answered once."""
+        with self._start_lock:
+            if self._executor is not None:
+                return
+            executor = ProcessPoolExecutor(
+                max_workers=self.size, mp_context=multiprocessing.get_context("spawn")
+            )
+            warm = [executor.submit(_warm_up) for _ in range(self.size)]
+            for future in warm:
+                future.result()
+            if BCRYPT_TARGET_MS and not BCRYPT_ROUNDS:
+                elapsed = min(
+                    executor.submit(_time_hash, CALIBRATION_ROUNDS).result()
+                    for _ in range(3)
+                )
+                self.rounds = rounds_for_target(elapsed, BCRYPT_TARGET_MS)
+            self._executor = executor
+        print(
+            f"Password hashing pool ready ({self.size} workers, bcrypt cost {self.rounds})"
+        )
+
+    def shutdown(self):
+        with self._start_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    async def run(self, kind: str, fn, *args):
+        if self._in_flight >= self.queue_limit:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+
+        # Counted before the first await, so a burst at cold start can't all
+        # pass the limit check while the pool is still starting.
+        self._in_flight += 1
+        try:
+            if self._executor is None:
+                await asyncio.to_thread(self.start)
+
+            start = time.monotonic()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._executor, fn, *args
+                )
+            finally:
+                self._latency[kind].record(time.monotonic() - start)
+        finally:
+            self._in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.size,
+            "bcrypt_rounds": self.rounds,
+            "in_flight": self._in_flight,
+            "queue_depth": max(0, self._in_flight - self.size),
+            "queue_limit": self.queue_limit,
+            "rejected": self._rejected,
+            "hash_latency": self._latency["hash"].snapshot(),
+            "verify_latency": self._latency["verify"].snapshot(),
+        }
+
+
+pool = HashingPool(HASH_POOL_SIZE, HASH_QUEUE_LIMIT)
+metrics.register("password_hashing", pool.stats)
+
+
+async def hash_password(password: str) -> str:
+    """Hash password using bcrypt"""
+    hashed = await pool.run("hash", _hash, password.encode(), pool.rounds)
+    return hashed.decode()
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify password against hash"""
+    return await pool.run(
+        "verify", _verify, plain_password.encode(), hashed_password.encode()
+    )
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    True when a stored hash should be upgraded: its cost differs from a pinned
+    BCRYPT_ROUNDS, or is out of bounds or well below the calibrated cost.
+    """
+    rounds = rounds_of(hashed_password)
+    if rounds is None:
+        return True
+    if BCRYPT_ROUNDS:
+        return rounds != pool.rounds
+    return (
+        rounds < BCRYPT_MIN_ROUNDS
+        or rounds > BCRYPT_MAX_ROUNDS
+        or rounds < pool.rounds - BCRYPT_REHASH_TOLERANCE
+    )
@@ -0,0 +1,371 @@
+"""Background LLM-as-judge grading of pending interactions."""
+
+import argparse
+import asyncio
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from dotenv import load_dotenv
+
+import metrics
+from db_async import db
+from providers import JudgeProvider, JudgeReplyError, get_judge_provider
+
+
+load_dotenv()
+
+
+JUDGE_BATCH_SIZE = int(os.getenv("JUDGE_BATCH_SIZE", 20))
+JUDGE_CONCURRENCY = int(os.getenv("JUDGE_CONCURRENCY", 8))
+JUDGE_LEASE_SECONDS = float(os.getenv("JUDGE_LEASE_SECONDS", 120))
+JUDGE_POLL_INTERVAL = float(os.getenv("JUDGE_POLL_INTERVAL", 2))
+JUDGE_MAX_ATTEMPTS = int(os.getenv("JUDGE_MAX_ATTEMPTS", 3))
+JUDGE_MAX_ITEMS_PER_CALL = int(os.getenv("JUDGE_MAX_ITEMS_PER_CALL", 8))
+JUDGE_TARGET_CALL_MS = float(os.getenv("JUDGE_TARGET_CALL_MS", 10000))
+JUDGE_BACKLOG_INTERVAL = float(os.getenv("JUDGE_BACKLOG_INTERVAL", 10))
+JUDGE_IN_PROCESS = os.getenv("JUDGE_IN_PROCESS", "").lower() in ("1", "true", "yes")
+
+
+def _claim(
+    conn, owner: str, now: float, lease_seconds: float, limit: int, max_attempts: int
+) -> list[dict]:
+    # A row whose worker died mid-grade never reaches _write_results, so its
+    # attempts are only checked here; give up on it instead of reclaiming forever.
+    conn.execute(
+        """
+        UPDATE interactions
+        SET status = 'failed',
+            judge_reason = COALESCE(judge_reason, 'Judge lease expired too many times'),
+            lease_owner = NULL,
+            lease_expires_at = NULL
+        WHERE status = 'judging' AND lease_expires_at < ? AND judge_attempts >= ?
+        """,
+        [now, max_attempts],
+    )
+    cursor = conn.execute(
+        """
+        UPDATE interactions
+        SET status = 'judging',
+            lease_owner = ?,
+            lease_expires_at = ?,
+            judge_attempts = judge_attempts + 1
+        WHERE id IN (
+            SELECT id FROM interactions
+            WHERE status = 'pending'
+               OR (status = 'judging' AND lease_expires_at < ? AND judge_attempts < ?)
+            ORDER BY id
+            LIMIT ?
+        )
+        RETURNING id, user_query, rag_context, model_reply, judge_attempts
+        """,
+        [owner, now + lease_seconds, now, max_attempts, limit],
+    )
+    columns = [col[0] for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _write_results(conn, owner: str, graded: list, failed: list, max_attempts: int) -> set:
+    # A row whose lease expired mid-grade may already belong to another worker;
+    # only the ids this worker still held are returned as graded.
+    written = set()
+    for interaction_id, score, reason in graded:
+        cursor = conn.execute(
+            """
+            UPDATE interactions
+            SET status = 'graded', judge_score = ?, judge_reason = ?,
+                lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = ? AND lease_owner = ?
+            RETURNING id
+            """,
+            [score, reason, interaction_id, owner],
+        )
+        written.update(row[0] for row in cursor.fetchall())
+    if failed:
+        conn.executemany(
+            """
+            UPDATE interactions
+            SET status = CASE WHEN judge_attempts >= ? THEN 'failed' ELSE 'pending' END,
+                judge_reason = ?, lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = ? AND lease_owner = ?
+            """,
+            [[max_attempts, reason, interaction_id, owner] for interaction_id, reason in failed],
+        )
+    return written
+
+
+def _triple(row: dict) -> tuple[str, str, str]:
+    return (row["user_query"] or "", row["rag_context"] or "", row["model_reply"] or "")
+
+
+class CallSizer:
+    """
+    Picks how many rows go into one judge call.
+
+    The size grows by one after each full call that finishes under
+    `target_ms` and halves after a slow call or an unparseable reply.
+    `pack` also keeps every call inside the judge's context budget.
+    """
+
+    def __init__(self, judge: JudgeProvider, max_items: int, target_ms: float):
+        self.judge = judge
+        self.max_items = max(1, max_items)
+        self.target_ms = target_ms
+        self.size = min(4, self.max_items)
+
+    def pack(self, rows: list[dict]) -> list[list[dict]]:
+        budget = self.judge.context_tokens
+        calls, current, tokens = [], [], self.judge.overhead_tokens
+        for row in rows:
+            cost = self.judge.item_tokens(_triple(row))
+            full = len(current) >= self.size or (
+                budget is not None and tokens + cost > budget
+            )
+            if current and full:
+                calls.append(current)
+                current, tokens = [], self.judge.overhead_tokens
+            current.append(row)
+            tokens += cost
+        if current:
+            calls.append(current)
+        return calls
+
+    def observe(self, seconds: float, items: int):
+        if seconds * 1000 > self.target_ms:
+            self.size = max(1, self.size // 2)
+        elif items >= self.size:
+            self.size = min(self.max_items, self.size + 1)
+
+    def reply_failed(self):
+        self.size = max(1, self.size // 2)
+
+
+class JudgeWorker:
+    def __init__(
+        self,
+        judge: JudgeProvider,
+        batch_size: int = 20,
+        concurrency: int = 8,
+        lease_seconds: float = 120.0,
+        poll_interval: float = 2.0,
+        max_attempts: int = 3,
+        max_items_per_call: int = 8,
+        target_call_ms: float = 10000.0,
+        backlog_interval: float = 10.0,
+        on_graded=None,
+    ):
+        self.judge = judge
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backlog_interval = backlog_interval
+        self.on_graded = on_graded
+        self.sizer = CallSizer(judge, max_items_per_call, target_call_ms)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._stopping = False
+        self._graded = 0
+        self._failed = 0
+        self._batches = 0
+        self._calls = 0
+        self._items_judged = 0
+        self._reply_errors = 0
+        self._recent = deque()
+        self._call_latency = metrics.LatencyStats()
+        self._backlog = {}
+        self._backlog_at = 0.0
+
+    async def run(self):
+        """Claims and grades batches until `stop()` is called."""
+        print(f"Judge worker {self.owner} started")
+        while not self._stopping:
+            if time.monotonic() - self._backlog_at >= self.backlog_interval:
+                try:
+                    await self.refresh_backlog()
+                except Exception as e:
+                    print(f"--- Backlog query failed: {e} ---")
+                    self._backlog_at = time.monotonic()
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                print(f"--- Judge worker error: {e} ---")
+                processed = 0
+            if not processed:
+                await asyncio.sleep(self.poll_interval)
+
+    def stop(self):
+        self._stopping = True
+
+    async def run_once(self) -> int:
+        rows = await db.run(
+            _claim, self.owner, time.time(), self.lease_seconds, self.batch_size, self.max_attempts
+        )
+        if not rows:
+            return 0
+
+        chunks = await asyncio.gather(*(self._grade(call) for call in self.sizer.pack(rows)))
+        results = [result for chunk in chunks for result in chunk]
+        graded = [r for r in results if r[0] == "graded"]
+        failed = [r for r in results if r[0] == "failed"]
+        written = await db.run(
+            _write_results,
+            self.owner,
+            [r[1:] for r in graded],
+            [r[1:] for r in failed],
+            self.max_attempts,
+        )
+        graded = [r for r in graded if r[1] in written]
+
+        self._batches += 1
+        self._graded += len(graded)
+        self._failed += len(failed)
+        now = time.monotonic()
+        self._recent.extend([now] * len(graded))
+
+        if self.on_graded:
+            for _, interaction_id, score, reason in graded:
+                self.on_graded(
+                    {
+                        "interaction_id": interaction_id,
+                        "status": "graded",
+                        "judge_score": score,
+                        "judge_reason": reason,
+                    }
+                )
+        return len(rows)
+
+    async def _grade(self, rows: list[dict]) -> list[tuple]:
+        async with self._semaphore:
+            start = time.monotonic()
+            try:
+                if len(rows) == 1:
+                    scores = [await self.judge.grade(*_triple(rows[0]))]
+                else:
+                    scores = await self.judge.grade_batch([_triple(row) for row in rows])
+            except JudgeReplyError as e:
+                self._reply_errors += 1
+                self.sizer.reply_failed()
+                if len(rows) == 1:
+                    return [("failed", rows[0]["id"], f"Unreadable judge reply: {e}")]
+                print(f"--- Unreadable judge reply for {len(rows)} rows, grading singly: {e} ---")
+                scores = None
+            except Exception as e:
+                print(f"--- Judge failed for interactions {[row['id'] for row in rows]}: {e} ---")
+                return [("failed", row["id"], f"Judge error: {e}") for row in rows]
+            else:
+                elapsed = time.monotonic() - start
+                self._call_latency.record(elapsed)
+                self.sizer.observe(elapsed, len(rows))
+            finally:
+                self._calls += 1
+                self._items_judged += len(rows)
+
+        if scores is None:
+            chunks = await asyncio.gather(*(self._grade([row]) for row in rows))
+            return [chunk[0] for chunk in chunks]
+        return [
+            ("graded", row["id"], int(score), reason) for row, (score, reason) in zip(rows, scores)
+        ]
+
+    async def refresh_backlog(self):
+        rows = await db.fetchall(
+            "SELECT status, SUM(count) AS count FROM interaction_counters "
+            "WHERE status IN ('pending', 'judging', 'failed') GROUP BY status"
+        )
+        self._backlog = {row["status"]: row["count"] for row in rows}
+        self._backlog_at = time.monotonic()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > 60:
+            self._recent.popleft()
+        return {
+            "owner": self.owner,
+            "graded": self._graded,
+            "failed": self._failed,
+            "batches": self._batches,
+            "graded_per_second_1m": round(len(self._recent) / 60, 3),
+            "backlog": self._backlog,
+            "judge_calls": self._calls,
+            "items_per_call": round(self._items_judged / self._calls, 2) if self._calls else 0.0,
+            "items_per_call_target": self.sizer.size,
+            "reply_errors": self._reply_errors,
+            "call_latency": self._call_latency.snapshot(),
+        }
+
+
+def create_worker(**overrides) -> JudgeWorker:
+    options = dict(
+        batch_size=JUDGE_BATCH_SIZE,
+        concurrency=JUDGE_CONCURRENCY,
+        lease_seconds=JUDGE_LEASE_SECONDS,
+        poll_interval=JUDGE_POLL_INTERVAL,
+        max_attempts=JUDGE_MAX_ATTEMPTS,
+        max_items_per_call=JUDGE_MAX_ITEMS_PER_CALL,
+        target_call_ms=JUDGE_TARGET_CALL_MS,
+        backlog_interval=JUDGE_BACKLOG_INTERVAL,
+    )
+    options.update(overrides)
+    judge = get_judge_provider()
+    if judge.name == "fake":
+        print(
+            "--- ERROR: JUDGE_PROVIDER=fake: grades are heuristic scores, not a model's judgement, "
+            "and feed /metrics and the semantic cache. Use it for development and load tests only. ---"
+        )
+    worker = JudgeWorker(judge, **options)
+    metrics.register("judge_worker", worker.stats)
+    return worker
+
+
+async def _report(worker: JudgeWorker, every: float):
+    while True:
+        await asyncio.sleep(every)
+        print(f"Judge stats: {worker.stats()}")
+
+
+async def _main(args):
+    from database import close_pool, init_db, start_replication, stop_replication
+
+    init_db()
+    start_replication()
+    worker = create_worker(
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        lease_seconds=args.lease,
+        poll_interval=args.poll_interval,
+        max_items_per_call=args.items_per_call,
+    )
+    reporter = asyncio.get_running_loop().create_task(_report(worker, args.report_every))
+    try:
+        if args.once:
+            await worker.run_once()
+        else:
+            await worker.run()
+    finally:
+        reporter.cancel()
+        await worker.refresh_backlog()
+        print(f"Judge stats: {worker.stats()}")
+        stop_replication()
+        db.close()
+        close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grade pending interactions with the LLM judge.")
+    parser.add_argument("--batch-size", type=int, default=JUDGE_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=JUDGE_CONCURRENCY)
+    parser.add_argument(
+        "--items-per-call", type=int, default=JUDGE_MAX_ITEMS_PER_CALL, help="max rows per judge call"
+    )
+    parser.add_argument("--lease", type=float, default=JUDGE_LEASE_SECONDS, help="lease length in seconds")
+    parser.add_argument("--poll-interval", type=float, default=JUDGE_POLL_INTERVAL)
+    parser.add_argument("--report-every", type=float, default=30.0, help="seconds between stats lines")
+    parser.add_argument("--once", action="store_true", help="grade a single batch and exit")
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,57 @@
+import threading
+from collections import deque
+from typing import Callable
+
+
+_sources: dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, source: Callable[[], dict]):
+    """Registers a callable whose dict result is reported under `name` in /metrics."""
+    _sources[name] = source
+
+
+def snapshot() -> dict:
+    """Collects the current value of every registered metrics source."""
+    report = {}
+    for name, source in list(_sources.items()):
+        try:
+            report[name] = source()
+        except Exception as e:
+            report[name] = {"error": str(e)}
+    return report
+
+
+class LatencyStats:
+    """
+    Keeps the most recent `window` durations and summarizes them as percentiles.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._samples = deque(maxlen=window)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+
+        if not samples:
+            return {"count": count, "avg_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+
+        def pct(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 3)
+
+        return {
+            "count": count,
+            "avg_ms": round(sum(samples) / len(samples) * 1000, 3),
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+            "max_ms": round(samples[-1] * 1000, 3),
+        }
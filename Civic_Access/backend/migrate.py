@@ -0,0 +1,185 @@
+"""Versioned schema migrations from `migrations/NNNN_name.sql`, recorded in `schema_version`."""
+
+import os
+import re
+import sqlite3
+import sys
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# How long a process waits for another one's migration to finish.
+MIGRATION_LOCK_TIMEOUT = float(os.getenv("MIGRATION_LOCK_TIMEOUT", 60))
+
+_FILENAME = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+_ADD_COLUMN = re.compile(
+    r"^\s*ALTER\s+TABLE\s+[\"`]?(\w+)[\"`]?\s+ADD\s+(?:COLUMN\s+)?[\"`]?(\w+)", re.IGNORECASE
+)
+
+
+class Migration:
+    def __init__(self, version: int, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def read(self) -> tuple[bool, list[str]]:
+        """Returns (online, statements) for this migration file."""
+        with open(self.path, encoding="utf-8") as f:
+            text = f.read()
+        online = text.lstrip().startswith("-- migrate: online")
+        return online, split_statements(text)
+
+
+def split_statements(text: str) -> list[str]:
+    """Splits a SQL script into statements (trigger bodies are kept whole)."""
+    statements = []
+    buffer = ""
+    for line in text.splitlines(keepends=True):
+        if not buffer.strip() and line.strip().startswith("--"):
+            continue
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ""
+    if buffer.strip():
+        statements.append(buffer.strip())
+    return statements
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> list[Migration]:
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME.match(filename)
+        if match:
+            migrations.append(
+                Migration(int(match.group(1)), match.group(2), os.path.join(directory, filename))
+            )
+
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+    return sorted(migrations, key=lambda m: m.version)
+
+
+def applied_versions(conn) -> set[int] | None:
+    """Versions recorded in schema_version, or None if the table doesn't exist yet."""
+    try:
+        rows = conn.execute("SELECT version FROM schema_version").fetchall()
+    except Exception:
+        return None
+    return {row[0] for row in rows}
+
+
+def pending(conn, migrations: list[Migration]) -> list[Migration]:
+    applied = applied_versions(conn) or set()
+    return [m for m in migrations if m.version not in applied]
+
+
+def _already_applied(conn, statement: str) -> bool:
+    """True for an ADD COLUMN whose column exists (left by an interrupted online migration)."""
+    match = _ADD_COLUMN.match(statement)
+    if not match:
+        return False
+    table, column = match.groups()
+    columns = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    return any(row[1].lower() == column.lower() for row in columns)
+
+
+def _apply(conn, migration: Migration) -> bool:
+    """Applies `migration`; False if another process applied it first."""
+    online, statements = migration.read()
+    record = (
+        "INSERT OR IGNORE INTO schema_version (version, name) VALUES (?, ?)",
+        [migration.version, migration.name],
+    )
+
+    if online:
+        for statement in statements:
+            if not _already_applied(conn, statement):
+                conn.execute(statement)
+                conn.commit()
+        recorded = conn.execute(*record).rowcount == 1
+        conn.commit()
+        return recorded
+
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if migration.version in (applied_versions(conn) or set()):
+            conn.rollback()
+            return False
+        for statement in statements:
+            if not _already_applied(conn, statement):
+                conn.execute(statement)
+        conn.execute(*record)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def run(conn, migrations: list[Migration] | None = None, sync: bool = True) -> list[int]:
+    """
+    Brings the schema up to date and returns the versions that were applied.
+
+    When every migration is already recorded this is a single read and issues
+    no DDL. Otherwise the local replica is synced first, so a cold replica
+    doesn't re-run migrations the primary already has.
+    """
+    migrations = discover() if migrations is None else migrations
+    if not pending(conn, migrations):
+        return []
+
+    if sync:
+        try:
+            conn.sync()
+        except Exception as e:
+            print(f"--- Pre-migration sync failed, continuing: {e} ---")
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+    )
+    conn.commit()
+    conn.execute(f"PRAGMA busy_timeout = {int(MIGRATION_LOCK_TIMEOUT * 1000)}")
+
+    applied = []
+    for migration in pending(conn, migrations):
+        print(f"Applying migration {migration.version:04d}_{migration.name}...")
+        if _apply(conn, migration):
+            applied.append(migration.version)
+    return applied
+
+
+def main(argv: list[str]) -> int:
+    from database import LOCAL_DB_ONLY, get_pool
+
+    pool = get_pool()
+    if pool is None:
+        print("--- Cannot run migrations: Connection failed. ---")
+        return 1
+
+    migrations = discover()
+    with pool.connection() as conn:
+        if argv[:1] == ["status"]:
+            applied = applied_versions(conn) or set()
+            for m in migrations:
+                state = "applied" if m.version in applied else "pending"
+                print(f"{m.version:04d}_{m.name}: {state}")
+            return 0
+
+        versions = run(conn, migrations, sync=not LOCAL_DB_ONLY)
+        if not LOCAL_DB_ONLY:
+            conn.sync()
+
+    print(f"Applied {len(versions)} migration(s)" if versions else "Schema is up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,19 @@
+-- Tables that init_db() used to create on every startup.
+CREATE TABLE IF NOT EXISTS user (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS interactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    user_query TEXT,
+    target_lang TEXT,
+    rag_context TEXT,
+    model_reply TEXT,
+    judge_score INTEGER,
+    judge_reason TEXT,
+    status TEXT DEFAULT 'pending'
+);
@@ -0,0 +1,7 @@
+-- migrate: online
+-- Pending-work scans (status, id) and per-language reporting (target_lang, timestamp).
+CREATE INDEX IF NOT EXISTS idx_interactions_status_id
+    ON interactions (status, id);
+
+CREATE INDEX IF NOT EXISTS idx_interactions_lang_timestamp
+    ON interactions (target_lang, timestamp);
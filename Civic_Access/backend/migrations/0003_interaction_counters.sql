@@ -0,0 +1,43 @@
+-- Row counts per (status, target_lang), kept current by triggers so
+-- /interactions/count never scans the interactions table. The triggers are
+-- created before the backfill, in the same transaction, so no insert is missed.
+CREATE TABLE IF NOT EXISTS interaction_counters (
+    status TEXT NOT NULL,
+    target_lang TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (status, target_lang)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_interactions_count_insert
+AFTER INSERT ON interactions
+BEGIN
+    INSERT INTO interaction_counters (status, target_lang, count)
+    VALUES (COALESCE(NEW.status, ''), COALESCE(NEW.target_lang, ''), 1)
+    ON CONFLICT (status, target_lang) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_interactions_count_delete
+AFTER DELETE ON interactions
+BEGIN
+    UPDATE interaction_counters SET count = count - 1
+    WHERE status = COALESCE(OLD.status, '') AND target_lang = COALESCE(OLD.target_lang, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_interactions_count_update
+AFTER UPDATE OF status, target_lang ON interactions
+WHEN COALESCE(OLD.status, '') != COALESCE(NEW.status, '')
+  OR COALESCE(OLD.target_lang, '') != COALESCE(NEW.target_lang, '')
+BEGIN
+    UPDATE interaction_counters SET count = count - 1
+    WHERE status = COALESCE(OLD.status, '') AND target_lang = COALESCE(OLD.target_lang, '');
+    INSERT INTO interaction_counters (status, target_lang, count)
+    VALUES (COALESCE(NEW.status, ''), COALESCE(NEW.target_lang, ''), 1)
+    ON CONFLICT (status, target_lang) DO UPDATE SET count = count + 1;
+END;
+
+DELETE FROM interaction_counters;
+
+INSERT INTO interaction_counters (status, target_lang, count)
+SELECT COALESCE(status, ''), COALESCE(target_lang, ''), COUNT(*)
+FROM interactions
+GROUP BY COALESCE(status, ''), COALESCE(target_lang, '');
@@ -0,0 +1,2 @@
+-- The pivot-language query the chat pipeline retrieved and generated with.
+ALTER TABLE interactions ADD COLUMN translated_query TEXT;
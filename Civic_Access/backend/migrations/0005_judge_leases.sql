@@ -0,0 +1,8 @@
+-- Judge workers claim pending interactions by leasing them:
+-- status 'judging' + lease_owner + lease_expires_at (unix seconds).
+-- Expired leases are claimable again; judge_attempts caps retries.
+ALTER TABLE interactions ADD COLUMN lease_owner TEXT;
+
+ALTER TABLE interactions ADD COLUMN lease_expires_at REAL;
+
+ALTER TABLE interactions ADD COLUMN judge_attempts INTEGER NOT NULL DEFAULT 0;
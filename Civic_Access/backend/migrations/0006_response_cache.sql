@@ -0,0 +1,16 @@
+-- Persistent tier of the /chat response cache, shared by all workers.
+-- Keys already include the corpus and prompt versions; the version columns
+-- let a version change purge stale rows in one statement.
+CREATE TABLE IF NOT EXISTS response_cache (
+    key TEXT PRIMARY KEY,
+    target_lang TEXT NOT NULL,
+    corpus_version TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    translated_query TEXT,
+    passages TEXT,
+    model_reply TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_response_cache_versions
+ON response_cache (corpus_version, prompt_version);
@@ -0,0 +1,3 @@
+-- Corpus and prompt version an answer was generated under
+-- ("<corpus_version>:<prompt_version>"), so caches reuse only current answers.
+ALTER TABLE interactions ADD COLUMN answer_version TEXT;
@@ -0,0 +1,3 @@
+-- The signed-in user who asked, so only they can read the interaction's grade.
+-- NULL for anonymous /chat requests.
+ALTER TABLE interactions ADD COLUMN user_id INTEGER;
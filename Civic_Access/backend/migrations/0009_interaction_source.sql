@@ -0,0 +1,5 @@
+-- Where an answer came from: 'model', or the cache tier that served it
+-- ('memory', 'persistent', 'semantic'). Only model answers feed the semantic
+-- cache; cached_from is the interaction a semantic hit reused.
+ALTER TABLE interactions ADD COLUMN source TEXT NOT NULL DEFAULT 'model';
+ALTER TABLE interactions ADD COLUMN cached_from INTEGER;
@@ -0,0 +1,371 @@
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+import metrics
+from coalescing import Flight, SingleFlight, chat_flights
+from providers import LLMProvider, get_llm_provider
+from rerank import Reranker, reranker
+from retrieval import Passage, get_retriever
+from response_cache import CachedAnswer, ResponseCache, cache_key, response_cache
+from semantic_cache import SemanticCache, semantic_cache
+from write_behind import writer
+
+
+PIVOT_LANGUAGE = "english"
+RETRIEVAL_TOP_K = 5
+
+PROMPT_TEMPLATE = """You are CivicAccess, a legal assistant for Nigerian citizens.
+Answer in {language}, in plain words, using only the legal context below.
+Cite the sections you rely on.
+
+Context:
+{context}
+
+Question: {question}
+"""
+
+# Cached answers are tied to this, so editing the template invalidates them.
+PROMPT_VERSION = hashlib.sha256(PROMPT_TEMPLATE.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass
+class ChatTurn:
+    message: str
+    language: str
+    user_id: int | None = None
+    translated_query: str = ""
+    passages: list[Passage] = field(default_factory=list)
+    prompt: str = ""
+    reply: str = ""
+    interaction_id: int | None = None
+    cache: str = "off"
+    cached_from: int | None = None
+    coalesced: bool = False
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def rag_context(self) -> str:
+        return json.dumps([{"id": p.id, "source": p.source, "text": p.text} for p in self.passages])
+
+    def citations(self) -> list[dict]:
+        return [{"id": p.id, "source": p.source, "score": round(p.score, 4)} for p in self.passages]
+
+
+class _Stage:
+    def __init__(self, turn: ChatTurn, name: str, stats: dict):
+        self.turn = turn
+        self.name = name
+        self.stats = stats
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.turn.timings[self.name] = round(elapsed * 1000, 3)
+        self.stats.setdefault(self.name, metrics.LatencyStats()).record(elapsed)
+
+
+class ChatPipeline:
+    """
+    translate -> retrieve -> rerank -> generate -> persist, each stage timed
+    separately.
+
+    The model sits behind `LLMProvider` and retrieval behind any object with
+    `async search(query, k)`, so both can be swapped for local fakes. With a
+    `reranker`, retrieval fetches its `candidates` and the reranker keeps the
+    best `top_k`. With a `cache`, a repeated question skips straight to
+    persist; with a `semantic_cache`, a close paraphrase of a well-graded
+    question skips retrieval and generation once translated. Every request
+    still gets its own interactions row. Concurrent requests for the same
+    question share one translate/retrieve/generate run (see
+    coalescing.SingleFlight).
+    """
+
+    def __init__(
+        self,
+        provider: LLMProvider | None = None,
+        retriever=None,
+        top_k: int = RETRIEVAL_TOP_K,
+        cache: ResponseCache | None = None,
+        semantic_cache: SemanticCache | None = None,
+        flights: SingleFlight | None = None,
+        reranker: Reranker | None = None,
+    ):
+        self._provider = provider
+        self._retriever = retriever
+        self.top_k = top_k
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        self.flights = flights or SingleFlight()
+        self.reranker = reranker
+        self._stage_stats = {}
+        self._tasks = set()
+
+    @property
+    def provider(self) -> LLMProvider:
+        if self._provider is None:
+            self._provider = get_llm_provider()
+        return self._provider
+
+    @property
+    def retriever(self):
+        # Not cached: the module-level retriever is replaced when the corpus changes.
+        return self._retriever or get_retriever()
+
+    def stage(self, turn: ChatTurn, name: str) -> _Stage:
+        return _Stage(turn, name, self._stage_stats)
+
+    async def run(self, message: str, language: str, user_id: int | None = None) -> ChatTurn:
+        turn = ChatTurn(message=message, language=language, user_id=user_id)
+        if not await self.lookup(turn):
+            flight = self._join(turn, stream=False)
+            self._adopt(turn, await flight.wait())
+        await self.persist(turn)
+        return turn
+
+    async def run_stream(
+        self, message: str, language: str, user_id: int | None = None
+    ) -> AsyncIterator[tuple[str, dict]]:
+        """
+        Same stages as `run`, yielding (event, data) pairs as results appear:
+        translated_query, citations, one token per generated chunk, then done
+        once the interaction row is persisted.
+        """
+        turn = ChatTurn(message=message, language=language, user_id=user_id)
+        flight = None
+        streamed = False
+        try:
+            if await self.lookup(turn):
+                yield "translated_query", {"translated_query": turn.translated_query}
+                yield "citations", {"citations": turn.citations()}
+                yield "token", {"text": turn.reply}
+            else:
+                flight = self._join(turn, stream=True)
+                async for event, data in flight.follow():
+                    yield event, data
+                self._adopt(turn, flight.result)
+            streamed = True
+        finally:
+            if not streamed:
+                # The client went away mid-stream; the flight keeps running, so
+                # record its answer once it completes.
+                self._spawn(self._persist_when_done(turn, flight))
+
+        await asyncio.shield(self._spawn(self.persist(turn)))
+        yield "done", self._done(turn)
+
+    async def _persist_when_done(self, turn: ChatTurn, flight: Flight | None):
+        if flight is not None:
+            try:
+                self._adopt(turn, await flight.wait())
+            except Exception:
+                return  # the flight's error was already sent to the client
+        if turn.reply:
+            await self.persist(turn)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _join(self, turn: ChatTurn, stream: bool) -> Flight:
+        """
+        Attaches `turn` to the computation already answering the same question,
+        or starts one. Whoever starts it decides whether the model streams; a
+        streaming request that joins a non-streaming one gets the answer as a
+        single token.
+        """
+        key = cache_key(turn.message, turn.language, *self._cache_versions())
+        flight, started = self.flights.join(
+            key, lambda flight: self._answer(turn.message, turn.language, flight, stream)
+        )
+        turn.coalesced = not started
+        return flight
+
+    async def _answer(self, message: str, language: str, flight: Flight, stream: bool) -> ChatTurn:
+        """Translates, retrieves and generates once for every request following `flight`."""
+        turn = ChatTurn(message=message, language=language)
+        await self.translate(turn)
+        flight.publish("translated_query", {"translated_query": turn.translated_query})
+
+        if await self.lookup_similar(turn):
+            flight.publish("citations", {"citations": turn.citations()})
+            flight.publish("token", {"text": turn.reply})
+        else:
+            await self.retrieve(turn)
+            await self.rerank(turn)
+            flight.publish("citations", {"citations": turn.citations()})
+            if stream:
+                async for chunk in self.generate_stream(turn):
+                    flight.publish("token", {"text": chunk})
+            else:
+                await self.generate(turn)
+                flight.publish("token", {"text": turn.reply})
+
+        self.remember(turn)
+        return turn
+
+    @staticmethod
+    def _adopt(turn: ChatTurn, answer: ChatTurn):
+        turn.translated_query = answer.translated_query
+        turn.passages = answer.passages
+        turn.prompt = answer.prompt
+        turn.reply = answer.reply
+        if answer.cache == "semantic":
+            turn.cache = "semantic"
+            turn.cached_from = answer.cached_from
+        turn.timings = {**answer.timings, **turn.timings}
+
+    @staticmethod
+    def _done(turn: ChatTurn) -> dict:
+        return {
+            "interaction_id": turn.interaction_id,
+            "cache": turn.cache,
+            "coalesced": turn.coalesced,
+            "timings_ms": turn.timings,
+        }
+
+    def _cache_versions(self) -> tuple[str, str]:
+        retrieval = str(getattr(self.retriever, "version", "none"))
+        if self.reranker is not None:
+            retrieval = f"{retrieval}+{self.reranker.version}"
+        return retrieval, PROMPT_VERSION
+
+    @property
+    def answer_version(self) -> str:
+        return ":".join(self._cache_versions())
+
+    async def lookup(self, turn: ChatTurn) -> bool:
+        """Fills `turn` from the response cache; returns False on a miss."""
+        if self.cache is None:
+            return False
+        with self.stage(turn, "cache"):
+            answer, turn.cache = await self.cache.get(
+                turn.message, turn.language, *self._cache_versions()
+            )
+        if answer is None:
+            return False
+        turn.translated_query = answer.translated_query
+        turn.passages = [Passage(**p) for p in answer.passages]
+        turn.reply = answer.reply
+        return True
+
+    async def lookup_similar(self, turn: ChatTurn) -> bool:
+        """Fills `turn` from a well-graded answer to a similar question; False if none."""
+        if self.semantic_cache is None:
+            return False
+        with self.stage(turn, "semantic_cache"):
+            hit = await self.semantic_cache.lookup(
+                turn.translated_query, turn.language, self.answer_version
+            )
+        if hit is None:
+            return False
+        turn.cache = "semantic"
+        turn.cached_from = hit.interaction_id
+        turn.passages = [
+            Passage(id=p["id"], text=p["text"], source=p.get("source", "")) for p in hit.passages
+        ]
+        turn.reply = hit.reply
+        turn.timings["semantic_similarity"] = hit.similarity
+        return True
+
+    def remember(self, turn: ChatTurn):
+        if self.cache is None or not turn.reply:
+            return
+        self.cache.put(
+            turn.message,
+            turn.language,
+            *self._cache_versions(),
+            CachedAnswer(
+                translated_query=turn.translated_query,
+                passages=[asdict(p) for p in turn.passages],
+                reply=turn.reply,
+            ),
+        )
+
+    async def translate(self, turn: ChatTurn):
+        with self.stage(turn, "translate"):
+            if turn.language == PIVOT_LANGUAGE:
+                turn.translated_query = turn.message
+            else:
+                turn.translated_query = await self.provider.translate(
+                    turn.message, turn.language, PIVOT_LANGUAGE
+                )
+
+    async def retrieve(self, turn: ChatTurn):
+        with self.stage(turn, "retrieve"):
+            depth = max(self.top_k, self.reranker.candidates) if self.reranker else self.top_k
+            turn.passages = await self.retriever.search(turn.translated_query, depth)
+
+    async def rerank(self, turn: ChatTurn):
+        if self.reranker is None:
+            return
+        with self.stage(turn, "rerank"):
+            result = await self.reranker.rerank(
+                turn.translated_query,
+                turn.passages,
+                self.top_k,
+                str(getattr(self.retriever, "version", "none")),
+            )
+            turn.passages = result.passages
+        turn.timings["rerank_scoring"] = round(result.scoring_seconds * 1000, 3)
+
+    def build_prompt(self, turn: ChatTurn) -> str:
+        context = "\n\n".join(f"[{p.id}] {p.text}" for p in turn.passages) or "(none found)"
+        return PROMPT_TEMPLATE.format(
+            language=turn.language, context=context, question=turn.translated_query
+        )
+
+    async def generate(self, turn: ChatTurn):
+        with self.stage(turn, "generate"):
+            turn.prompt = self.build_prompt(turn)
+            turn.reply = await self.provider.generate(turn.prompt, turn.language)
+
+    async def generate_stream(self, turn: ChatTurn) -> AsyncIterator[str]:
+        chunks = []
+        with self.stage(turn, "generate"):
+            turn.prompt = self.build_prompt(turn)
+            start = time.perf_counter()
+            async for chunk in self.provider.stream(turn.prompt, turn.language):
+                if not chunks:
+                    first_token = time.perf_counter() - start
+                    turn.timings["first_token"] = round(first_token * 1000, 3)
+                    self._stage_stats.setdefault("first_token", metrics.LatencyStats()).record(first_token)
+                chunks.append(chunk)
+                yield chunk
+            turn.reply = "".join(chunks)
+
+    async def persist(self, turn: ChatTurn):
+        with self.stage(turn, "persist"):
+            turn.interaction_id = await writer.insert(
+                {
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "user_query": turn.message,
+                    "translated_query": turn.translated_query,
+                    "target_lang": turn.language,
+                    "rag_context": turn.rag_context,
+                    "model_reply": turn.reply,
+                    "status": "pending",
+                    "answer_version": self.answer_version,
+                    "user_id": turn.user_id,
+                    "source": turn.cache if turn.cache in ("memory", "persistent", "semantic") else "model",
+                    "cached_from": turn.cached_from,
+                },
+                wait_for_id=True,
+            )
+
+    def stats(self) -> dict:
+        return {name: stats.snapshot() for name, stats in self._stage_stats.items()}
+
+
+chat_pipeline = ChatPipeline(
+    cache=response_cache, semantic_cache=semantic_cache, flights=chat_flights, reranker=reranker
+)
+metrics.register("chat_pipeline", chat_pipeline.stats)
@@ -0,0 +1,565 @@
+import asyncio
+import json
+import os
+import re
+import zlib
+from typing import AsyncIterator
+from dotenv import load_dotenv
+
+import httpx
+import numpy as np
+
+from retrieval.text import tokenize
+
+
+load_dotenv()
+
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+GEMINI_API_URL = os.getenv("GEMINI_API_URL", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", 60))
+
+FAKE_LLM_TRANSLATE_MS = float(os.getenv("FAKE_LLM_TRANSLATE_MS", 50))
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", 300))
+FAKE_LLM_TOKEN_MS = float(os.getenv("FAKE_LLM_TOKEN_MS", 20))
+
+JUDGE_PROVIDER = os.getenv("JUDGE_PROVIDER", "gemini")
+FAKE_JUDGE_LATENCY_MS = float(os.getenv("FAKE_JUDGE_LATENCY_MS", 500))
+FAKE_JUDGE_ITEM_MS = float(os.getenv("FAKE_JUDGE_ITEM_MS", 50))
+FAKE_JUDGE_CONTEXT_TOKENS = int(os.getenv("FAKE_JUDGE_CONTEXT_TOKENS", 8000))
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "hashing")
+HASHING_EMBEDDING_DIM = int(os.getenv("HASHING_EMBEDDING_DIM", 256))
+
+RERANK_PROVIDER = os.getenv("RERANK_PROVIDER", "none")
+FAKE_RERANK_LATENCY_MS = float(os.getenv("FAKE_RERANK_LATENCY_MS", 20))
+FAKE_RERANK_ITEM_MS = float(os.getenv("FAKE_RERANK_ITEM_MS", 2))
+
+
+class LLMProvider:
+    """
+    Interface the chat pipeline uses to talk to a language model.
+
+    Subclasses implement `translate` and `generate`; `stream` defaults to
+    yielding the whole generated answer as one chunk.
+    """
+
+    name = "base"
+
+    async def translate(self, text: str, source_lang: str, target_lang: str) -> str:
+        raise NotImplementedError
+
+    async def generate(self, prompt: str, language: str) -> str:
+        raise NotImplementedError
+
+    async def stream(self, prompt: str, language: str) -> AsyncIterator[str]:
+        yield await self.generate(prompt, language)
+
+
+class FakeProvider(LLMProvider):
+    """
+    In-process stand-in for a real model, for local development and load tests.
+
+    It does no real translation or generation, only sleeps for the configured
+    latencies and returns a deterministic answer built from the prompt.
+    """
+
+    name = "fake"
+
+    def __init__(self, translate_ms=50.0, latency_ms=300.0, token_ms=20.0):
+        self.translate_ms = translate_ms
+        self.latency_ms = latency_ms
+        self.token_ms = token_ms
+
+    async def translate(self, text: str, source_lang: str, target_lang: str) -> str:
+        await asyncio.sleep(self.translate_ms / 1000)
+        return text
+
+    async def generate(self, prompt: str, language: str) -> str:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._answer(prompt, language)
+
+    async def stream(self, prompt: str, language: str) -> AsyncIterator[str]:
+        words = self._answer(prompt, language).split(" ")
+        first_token_delay = max(0.0, self.latency_ms - self.token_ms * len(words))
+        await asyncio.sleep(first_token_delay / 1000)
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.token_ms / 1000)
+            yield word if i == 0 else " " + word
+
+    @staticmethod
+    def _answer(prompt: str, language: str) -> str:
+        lines = prompt.rsplit("Question:", 1)[-1].strip().splitlines()
+        question = lines[0] if lines else ""
+        return (
+            f"[{language}] Here is what the law says about \"{question}\". "
+            "You have the right to be treated with dignity and to ask for a lawyer."
+        )
+
+
+class GeminiClient:
+    """Calls the Gemini `generateContent` REST API."""
+
+    def __init__(self, api_key: str | None, model: str, base_url: str, timeout: float = 60.0, transport=None):
+        if not api_key:
+            raise RuntimeError("GEMINI_API_KEY is not set")
+        self.model = model
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"x-goog-api-key": api_key},
+            timeout=timeout,
+            transport=transport,
+        )
+
+    async def generate(self, prompt: str, json_reply: bool = False) -> str:
+        response = await self._http.post(
+            f"/models/{self.model}:generateContent", json=self._body(prompt, json_reply)
+        )
+        response.raise_for_status()
+        return self._text(response.json(), required=True)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        async with self._http.stream(
+            "POST",
+            f"/models/{self.model}:streamGenerateContent",
+            params={"alt": "sse"},
+            json=self._body(prompt),
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    text = self._text(json.loads(line[5:]))
+                    if text:
+                        yield text
+
+    async def close(self):
+        await self._http.aclose()
+
+    @staticmethod
+    def _body(prompt: str, json_reply: bool = False) -> dict:
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if json_reply:
+            body["generationConfig"] = {"responseMimeType": "application/json"}
+        return body
+
+    @staticmethod
+    def _text(payload: dict, required: bool = False) -> str:
+        candidates = payload.get("candidates") or []
+        parts = candidates[0].get("content", {}).get("parts", []) if candidates else []
+        text = "".join(part.get("text", "") for part in parts)
+        if required and not text:
+            reason = payload.get("promptFeedback", {}).get("blockReason") or (
+                candidates[0].get("finishReason") if candidates else "no candidates"
+            )
+            raise RuntimeError(f"Gemini returned no text ({reason})")
+        return text
+
+
+TRANSLATE_PROMPT = """Translate the text below from {source_lang} to {target_lang}.
+Keep legal terms accurate. Reply with the translation only.
+
+{text}"""
+
+
+class GeminiProvider(LLMProvider):
+    """Translates and answers with a Gemini model."""
+
+    name = "gemini"
+
+    def __init__(self, client: GeminiClient):
+        self.client = client
+
+    async def translate(self, text: str, source_lang: str, target_lang: str) -> str:
+        prompt = TRANSLATE_PROMPT.format(source_lang=source_lang, target_lang=target_lang, text=text)
+        return (await self.client.generate(prompt)).strip()
+
+    async def generate(self, prompt: str, language: str) -> str:
+        return await self.client.generate(prompt)
+
+    async def stream(self, prompt: str, language: str) -> AsyncIterator[str]:
+        async for chunk in self.client.stream(prompt):
+            yield chunk
+
+
+def gemini_client() -> GeminiClient:
+    return GeminiClient(GEMINI_API_KEY, GEMINI_MODEL, GEMINI_API_URL, GEMINI_TIMEOUT)
+
+
+PROVIDERS = {
+    "gemini": lambda: GeminiProvider(gemini_client()),
+    "fake": lambda: FakeProvider(
+        FAKE_LLM_TRANSLATE_MS, FAKE_LLM_LATENCY_MS, FAKE_LLM_TOKEN_MS
+    ),
+}
+
+
+def register_provider(name: str, factory):
+    """Makes `factory()` available as LLM_PROVIDER=<name>."""
+    PROVIDERS[name] = factory
+
+
+_provider: LLMProvider | None = None
+
+
+def get_llm_provider() -> LLMProvider:
+    global _provider
+
+    if _provider is None:
+        if LLM_PROVIDER not in PROVIDERS:
+            raise RuntimeError(
+                f"Unknown LLM_PROVIDER '{LLM_PROVIDER}', expected one of {sorted(PROVIDERS)}"
+            )
+        _provider = PROVIDERS[LLM_PROVIDER]()
+    return _provider
+
+
+def check_llm_provider():
+    """
+    Creates the LLM provider at startup, so a missing key fails there rather
+    than on the first /chat, and flags the fake provider's canned answers.
+    """
+    provider = get_llm_provider()
+    if provider.name == "fake":
+        print(
+            "--- ERROR: LLM_PROVIDER=fake: /chat returns canned text, not answers from a model. "
+            "Use it for development and load tests only. ---"
+        )
+
+
+class JudgeReplyError(ValueError):
+    """The judge's reply could not be parsed into one result per graded item."""
+
+
+JUDGE_PROMPT = """You are grading answers given by a Nigerian legal-aid assistant.
+For each numbered item, score how well the answer addresses the question using the
+legal context, from 1 (wrong or unhelpful) to 5 (accurate, grounded and complete).
+Reply with JSON only: a list with one {{"item": <number>, "score": <1-5>, "reason": "<one sentence>"}}
+object per item.
+
+{items}"""
+
+JUDGE_ITEM = """### Item {number}
+Question: {user_query}
+Legal context: {rag_context}
+Answer: {model_reply}
+"""
+
+JUDGE_MAX_CONTEXT_CHARS = 4000
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) for budgeting prompts."""
+    return len(text) // 4 + 1
+
+
+class JudgeProvider:
+    """
+    Interface for LLM-as-judge grading of (question, context, answer) triples.
+
+    `grade` returns a 1-5 score and a short reason. `grade_batch` grades several
+    triples in one call where the provider supports it; `context_tokens`,
+    `overhead_tokens` and `item_tokens` let callers size batches to fit.
+    """
+
+    name = "base"
+    context_tokens: int | None = None
+    overhead_tokens = 0
+
+    async def grade(self, user_query: str, rag_context: str, model_reply: str) -> tuple[int, str]:
+        raise NotImplementedError
+
+    async def grade_batch(self, items: list[tuple[str, str, str]]) -> list[tuple[int, str]]:
+        return list(await asyncio.gather(*(self.grade(*item) for item in items)))
+
+    def item_tokens(self, item: tuple[str, str, str]) -> int:
+        return 0
+
+
+class PromptJudge(JudgeProvider):
+    """
+    Judge backed by a text-completion model: subclasses implement `complete`.
+
+    Every call, single or batched, uses the same numbered-items prompt and
+    expects a JSON list back; replies that do not parse raise JudgeReplyError.
+    """
+
+    context_tokens = 8000
+    reply_tokens_per_item = 60
+
+    def __init__(self):
+        self.overhead_tokens = estimate_tokens(JUDGE_PROMPT)
+
+    async def complete(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def grade(self, user_query: str, rag_context: str, model_reply: str) -> tuple[int, str]:
+        return (await self.grade_batch([(user_query, rag_context, model_reply)]))[0]
+
+    async def grade_batch(self, items: list[tuple[str, str, str]]) -> list[tuple[int, str]]:
+        reply = await self.complete(self.build_prompt(items))
+        return self.parse_reply(reply, len(items))
+
+    def item_tokens(self, item: tuple[str, str, str]) -> int:
+        return estimate_tokens(self._format_item(1, item)) + self.reply_tokens_per_item
+
+    @classmethod
+    def build_prompt(cls, items: list[tuple[str, str, str]]) -> str:
+        return JUDGE_PROMPT.format(
+            items="\n".join(cls._format_item(n, item) for n, item in enumerate(items, 1))
+        )
+
+    @staticmethod
+    def _format_item(number: int, item: tuple[str, str, str]) -> str:
+        user_query, rag_context, model_reply = item
+        return JUDGE_ITEM.format(
+            number=number,
+            user_query=user_query,
+            rag_context=rag_context[:JUDGE_MAX_CONTEXT_CHARS],
+            model_reply=model_reply,
+        )
+
+    @staticmethod
+    def parse_reply(reply: str, count: int) -> list[tuple[int, str]]:
+        start, end = reply.find("["), reply.rfind("]")
+        if start < 0 or end < start:
+            raise JudgeReplyError("reply contains no JSON list")
+        try:
+            entries = json.loads(reply[start : end + 1])
+        except json.JSONDecodeError as e:
+            raise JudgeReplyError(f"reply is not valid JSON: {e}") from None
+
+        results = {}
+        for entry in entries:
+            try:
+                number, score = int(entry["item"]), int(entry["score"])
+                reason = str(entry.get("reason", "")).strip()
+            except (TypeError, KeyError, ValueError):
+                raise JudgeReplyError(f"malformed entry {entry!r}") from None
+            if not 1 <= score <= 5:
+                raise JudgeReplyError(f"score {score} for item {number} is out of range")
+            results[number] = (score, reason)
+
+        missing = [n for n in range(1, count + 1) if n not in results]
+        if missing:
+            raise JudgeReplyError(f"reply has no result for items {missing}")
+        return [results[n] for n in range(1, count + 1)]
+
+
+class FakeJudge(PromptJudge):
+    """
+    Deterministic local judge that goes through the real prompt and reply format.
+
+    `complete` sleeps `latency_ms` plus `item_ms` per item, reads the items back
+    out of the prompt and scores them on simple heuristics.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_ms=500.0, item_ms=50.0, context_tokens=8000):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.item_ms = item_ms
+        self.context_tokens = context_tokens
+
+    async def complete(self, prompt: str) -> str:
+        items = _ITEM_PATTERN.findall(prompt)
+        await asyncio.sleep((self.latency_ms + self.item_ms * len(items)) / 1000)
+        return json.dumps(
+            [
+                dict(zip(("score", "reason"), self._score(query, context, reply)), item=int(number))
+                for number, query, context, reply in items
+            ]
+        )
+
+    @staticmethod
+    def _score(user_query: str, rag_context: str, model_reply: str) -> tuple[int, str]:
+        if not (model_reply or "").strip():
+            return 1, "The answer is empty."
+        score = 3
+        reasons = []
+        if rag_context and rag_context not in ("[]", "null"):
+            score += 1
+            reasons.append("grounded in retrieved legal context")
+        else:
+            reasons.append("no legal context was retrieved")
+        if len(model_reply.split()) >= 15:
+            score += 1
+            reasons.append("explains the answer in full sentences")
+        return min(score, 5), "; ".join(reasons).capitalize() + "."
+
+
+_ITEM_PATTERN = re.compile(
+    r"^### Item (\d+)\nQuestion: (.*?)\nLegal context: (.*?)\nAnswer: (.*?)\n(?=### Item |\Z)",
+    re.DOTALL | re.MULTILINE,
+)
+
+
+class GeminiJudge(PromptJudge):
+    """Judge that sends the numbered-items prompt to Gemini and asks for a JSON reply."""
+
+    name = "gemini"
+
+    def __init__(self, client: GeminiClient):
+        super().__init__()
+        self.client = client
+
+    async def complete(self, prompt: str) -> str:
+        return await self.client.generate(prompt, json_reply=True)
+
+
+JUDGE_PROVIDERS = {
+    "gemini": lambda: GeminiJudge(gemini_client()),
+    "fake": lambda: FakeJudge(
+        FAKE_JUDGE_LATENCY_MS, FAKE_JUDGE_ITEM_MS, FAKE_JUDGE_CONTEXT_TOKENS
+    ),
+}
+
+
+def register_judge_provider(name: str, factory):
+    """Makes `factory()` available as JUDGE_PROVIDER=<name>."""
+    JUDGE_PROVIDERS[name] = factory
+
+
+def get_judge_provider() -> JudgeProvider:
+    if JUDGE_PROVIDER not in JUDGE_PROVIDERS:
+        raise RuntimeError(
+            f"Unknown JUDGE_PROVIDER '{JUDGE_PROVIDER}', expected one of {sorted(JUDGE_PROVIDERS)}"
+        )
+    return JUDGE_PROVIDERS[JUDGE_PROVIDER]()
+
+
+class EmbeddingProvider:
+    """
+    Interface for text embedding models.
+
+    `embed` returns one L2-normalized float32 row per text, so a dot product
+    is the cosine similarity. `model_id` changes whenever vectors from two
+    models would not be comparable.
+    """
+
+    name = "base"
+    model_id = "base"
+    dim = 0
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(EmbeddingProvider):
+    """
+    Local, model-free embedder: hashed word unigrams and bigrams.
+
+    It only captures word overlap, not meaning, but is deterministic and fast
+    enough for development and load tests.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.model_id = f"hashing-{dim}"
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.casefold())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                vectors[row, zlib.crc32(feature.encode("utf-8")) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+EMBEDDING_PROVIDERS = {
+    "hashing": lambda: HashingEmbedder(HASHING_EMBEDDING_DIM),
+}
+
+
+def register_embedding_provider(name: str, factory):
+    """Makes `factory()` available as EMBEDDING_PROVIDER=<name>."""
+    EMBEDDING_PROVIDERS[name] = factory
+
+
+_embedder: EmbeddingProvider | None = None
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    global _embedder
+
+    if _embedder is None:
+        if EMBEDDING_PROVIDER not in EMBEDDING_PROVIDERS:
+            raise RuntimeError(
+                f"Unknown EMBEDDING_PROVIDER '{EMBEDDING_PROVIDER}', "
+                f"expected one of {sorted(EMBEDDING_PROVIDERS)}"
+            )
+        _embedder = EMBEDDING_PROVIDERS[EMBEDDING_PROVIDER]()
+    return _embedder
+
+
+class RerankScorer:
+    """
+    Interface for cross-encoder rerankers.
+
+    `score` reads the query together with each passage and returns one
+    relevance score per passage, higher is better. Scores only need to be
+    comparable within one query. `model_id` changes whenever the scores
+    would.
+    """
+
+    name = "base"
+    model_id = "base"
+
+    async def score(self, query: str, passages: list[str]) -> list[float]:
+        raise NotImplementedError
+
+
+class FakeRerankScorer(RerankScorer):
+    """
+    Deterministic local reranker: the share of query terms, and of adjacent
+    query term pairs, that appear in the passage (stopwords ignored).
+
+    `score` sleeps `latency_ms` per call plus `item_ms` per passage, like a
+    cross-encoder served in batches.
+    """
+
+    name = "fake"
+    model_id = "fake-overlap-1"
+
+    def __init__(self, latency_ms=20.0, item_ms=2.0):
+        self.latency_ms = latency_ms
+        self.item_ms = item_ms
+
+    async def score(self, query: str, passages: list[str]) -> list[float]:
+        await asyncio.sleep((self.latency_ms + self.item_ms * len(passages)) / 1000)
+        words = tokenize(query)
+        pairs = set(zip(words, words[1:]))
+        words = set(words)
+        scores = []
+        for passage in passages:
+            text = tokenize(passage)
+            score = len(words & set(text)) / len(words) if words else 0.0
+            if pairs:
+                score += 0.5 * len(pairs & set(zip(text, text[1:]))) / len(pairs)
+            scores.append(score)
+        return scores
+
+
+RERANK_PROVIDERS = {
+    "fake": lambda: FakeRerankScorer(FAKE_RERANK_LATENCY_MS, FAKE_RERANK_ITEM_MS),
+}
+
+
+def register_rerank_provider(name: str, factory):
+    """Makes `factory()` available as RERANK_PROVIDER=<name>."""
+    RERANK_PROVIDERS[name] = factory
+
+
+def get_rerank_provider() -> RerankScorer:
+    if RERANK_PROVIDER not in RERANK_PROVIDERS:
+        raise RuntimeError(
+            f"Unknown RERANK_PROVIDER '{RERANK_PROVIDER}', "
+            f"expected one of {sorted(RERANK_PROVIDERS)} or 'none'"
+        )
+    return RERANK_PROVIDERS[RERANK_PROVIDER]()
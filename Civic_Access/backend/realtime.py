@@ -0,0 +1,136 @@
+import asyncio
+import os
+import secrets
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+import metrics
+
+
+load_dotenv()
+
+
+WS_REPLAY_BUFFER = int(os.getenv("WS_REPLAY_BUFFER", 500))
+WS_SESSION_TTL = float(os.getenv("WS_SESSION_TTL", 300))
+WS_CHAT_RATE_PER_MINUTE = float(os.getenv("WS_CHAT_RATE_PER_MINUTE", 20))
+WS_CHAT_BURST = int(os.getenv("WS_CHAT_BURST", 5))
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consumes a token; returns 0 on success or the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate else float("inf")
+
+
+class UserChannel:
+    """
+    Everything one user's sockets receive, in order.
+
+    Each published event gets the next `event_id` and is kept in a bounded
+    replay buffer, so a client that reconnects with its last seen id gets
+    exactly the events it missed. The `session` token changes whenever the
+    channel is recreated (expiry, worker restart); a client resuming against
+    a different session must treat its history as lost.
+    """
+
+    def __init__(self, user_id: int, replay: int):
+        self.user_id = user_id
+        self.session = secrets.token_hex(8)
+        self.sockets = {}
+        self.rate_limit = TokenBucket(WS_CHAT_RATE_PER_MINUTE, WS_CHAT_BURST)
+        self.tasks = set()
+        self.send_lock = asyncio.Lock()
+        self._events = deque(maxlen=replay)
+        self._next_id = 1
+        self.idle_since = time.monotonic()
+
+    async def publish(self, type: str, data: dict, request_id=None) -> dict:
+        event = {"event_id": self._next_id, "type": type, "id": request_id, "data": data}
+        self._next_id += 1
+        self._events.append(event)
+        await self._send_all(event)
+        return event
+
+    @property
+    def last_event_id(self) -> int:
+        return self._next_id - 1
+
+    @property
+    def oldest_event_id(self) -> int:
+        """The oldest event still in the replay buffer (the next id when it is empty)."""
+        return self._events[0]["event_id"] if self._events else self._next_id
+
+    def replay_after(self, last_event_id: int) -> tuple[list[dict], bool]:
+        """Returns (missed events, complete) for a client that saw up to `last_event_id`."""
+        missed = [e for e in self._events if e["event_id"] > last_event_id]
+        complete = last_event_id >= self.oldest_event_id - 1
+        return missed, complete
+
+    def spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _send_all(self, event: dict):
+        async with self.send_lock:
+            for socket, replayed_up_to in list(self.sockets.items()):
+                if event["event_id"] <= replayed_up_to:
+                    continue
+                try:
+                    await socket.send_json(event)
+                except Exception:
+                    self.sockets.pop(socket, None)
+
+
+class ChannelHub:
+    def __init__(self, replay: int = 500, ttl: float = 300.0):
+        self.replay = replay
+        self.ttl = ttl
+        self._channels: dict[int, UserChannel] = {}
+
+    def channel(self, user_id: int) -> UserChannel:
+        self._expire()
+        channel = self._channels.get(user_id)
+        if channel is None:
+            channel = self._channels[user_id] = UserChannel(user_id, self.replay)
+        return channel
+
+    def attach(self, channel: UserChannel, socket, replayed_up_to: int):
+        """Starts live delivery to `socket`, skipping events it already got by replay."""
+        channel.sockets[socket] = replayed_up_to
+
+    def detach(self, channel: UserChannel, socket):
+        channel.sockets.pop(socket, None)
+        if not channel.sockets:
+            channel.idle_since = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self._channels),
+            "connections": sum(len(c.sockets) for c in self._channels.values()),
+            "running_tasks": sum(len(c.tasks) for c in self._channels.values()),
+        }
+
+    def _expire(self):
+        now = time.monotonic()
+        for user_id, channel in list(self._channels.items()):
+            if not channel.sockets and not channel.tasks and now - channel.idle_since > self.ttl:
+                del self._channels[user_id]
+
+
+hub = ChannelHub(WS_REPLAY_BUFFER, WS_SESSION_TTL)
+metrics.register("websockets", hub.stats)
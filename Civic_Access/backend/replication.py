@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+import metrics
+
+
+load_dotenv()
+
+
+SYNC_INTERVAL = float(os.getenv("TURSO_SYNC_INTERVAL", 5))
+SYNC_DEBOUNCE = float(os.getenv("TURSO_SYNC_DEBOUNCE", 0.25))
+
+
+class SyncScheduler:
+    """
+    Replicates the local libsql file from Turso on a background thread.
+
+    A sync runs every `interval` seconds, and `debounce` seconds after a write
+    is reported through `request_sync()`. Bursts of writes inside the debounce
+    window share one sync, so request handlers never wait on the remote.
+    """
+
+    def __init__(self, connect, interval: float = 5.0, debounce: float = 0.25):
+        self._connect = connect
+        self.interval = interval
+        self.debounce = debounce
+
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._write_due = None
+        self._conn = None
+
+        self._last_sync = None
+        self._last_attempt = None
+        self._last_error = None
+        self._syncs = 0
+        self._failures = 0
+        self._duration = metrics.LatencyStats(window=256)
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run, name="turso-sync", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout)
+        with self._cond:
+            self._thread = None
+
+    def request_sync(self):
+        """Schedules a sync shortly after a write; never blocks on the remote."""
+        with self._cond:
+            if self._write_due is None:
+                self._write_due = time.monotonic() + self.debounce
+                self._cond.notify()
+
+    def status(self) -> dict:
+        with self._cond:
+            last_sync = self._last_sync
+            return {
+                "running": self._thread is not None,
+                "last_sync": last_sync,
+                "lag_seconds": round(time.time() - last_sync, 3) if last_sync else None,
+                "pending_write_sync": self._write_due is not None,
+                "syncs": self._syncs,
+                "failures": self._failures,
+                "last_error": self._last_error,
+                "duration": self._duration.snapshot(),
+            }
+
+    def _run(self):
+        next_interval = time.monotonic()
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    due = next_interval
+                    if self._write_due is not None:
+                        due = min(due, self._write_due)
+                    remaining = due - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopping:
+                    break
+                self._write_due = None
+
+            self._sync_once()
+            next_interval = time.monotonic() + self.interval
+
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _sync_once(self):
+        start = time.monotonic()
+        self._last_attempt = time.time()
+        try:
+            if self._conn is None:
+                self._conn = self._connect()
+            self._conn.sync()
+        except Exception as e:
+            print(f"--- Turso sync failed: {e} ---")
+            self._conn = None
+            with self._cond:
+                self._failures += 1
+                self._last_error = str(e)
+            return
+
+        self._duration.record(time.monotonic() - start)
+        with self._cond:
+            self._syncs += 1
+            self._last_sync = time.time()
+            self._last_error = None
+
+
+_scheduler: SyncScheduler | None = None
+
+
+def start(connect):
+    """Starts the process-wide sync scheduler using `connect` for its own connection."""
+    global _scheduler
+
+    if _scheduler is None:
+        _scheduler = SyncScheduler(connect, SYNC_INTERVAL, SYNC_DEBOUNCE)
+        metrics.register("replication", _scheduler.status)
+    _scheduler.start()
+    return _scheduler
+
+
+def stop():
+    if _scheduler is not None:
+        _scheduler.stop()
+
+
+def request_sync():
+    """Asks for a replica sync after a write. No-op until the scheduler is started."""
+    if _scheduler is not None:
+        _scheduler.request_sync()
+
+
+def status() -> dict | None:
+    return _scheduler.status() if _scheduler is not None else None
@@ -0,0 +1,193 @@
+"""Second-stage reranking of retrieved passages, stopping early once the top k settles."""
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from dotenv import load_dotenv
+
+import metrics
+from providers import RERANK_PROVIDER, RerankScorer, get_rerank_provider
+from retrieval import Passage
+
+
+load_dotenv()
+
+
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 50))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 8))
+RERANK_MARGIN = float(os.getenv("RERANK_MARGIN", 0.1))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", 50000))
+
+
+def query_key(query: str) -> bytes:
+    return hashlib.sha256(query.encode("utf-8")).digest()[:16]
+
+
+@dataclass
+class RerankResult:
+    passages: list[Passage]
+    scored: int
+    cached: int
+    batches: int
+    early_exit: bool
+    scoring_seconds: float
+
+
+class Reranker:
+    """
+    Re-scores retrieved passages with a RerankScorer, keeping the best `k`.
+
+    Scores are cached per worker by (query hash, chunk id), so a repeated or
+    coalesced question only scores passages it has not seen. The cache is
+    emptied when the corpus version changes, since a chunk id may then name
+    different text.
+    """
+
+    def __init__(
+        self,
+        scorer: RerankScorer | None = None,
+        candidates: int = RERANK_CANDIDATES,
+        batch_size: int = RERANK_BATCH_SIZE,
+        margin: float = RERANK_MARGIN,
+        cache_size: int = RERANK_CACHE_SIZE,
+    ):
+        self._scorer = scorer
+        self.candidates = candidates
+        self.batch_size = max(1, batch_size)
+        self.margin = margin
+        self.cache_size = cache_size
+        self._scores: OrderedDict[tuple[bytes, str], float] = OrderedDict()
+        self._corpus_version = None
+        self._scoring_latency = metrics.LatencyStats()
+        self._counts = {
+            "queries": 0,
+            "candidates": 0,
+            "scored": 0,
+            "cache_hits": 0,
+            "batches": 0,
+            "early_exits": 0,
+            "invalidations": 0,
+        }
+
+    @property
+    def scorer(self) -> RerankScorer:
+        if self._scorer is None:
+            self._scorer = get_rerank_provider()
+        return self._scorer
+
+    @property
+    def version(self) -> str:
+        settings = json.dumps([self.scorer.model_id, self.candidates, self.batch_size, self.margin])
+        return "x" + hashlib.sha256(settings.encode("utf-8")).hexdigest()[:8]
+
+    async def rerank(self, query: str, passages: list[Passage], k: int, corpus_version: str) -> RerankResult:
+        """
+        Returns the best `k` of `passages` by reranker score, best first.
+        Ties keep retrieval order.
+        """
+        self._check_version(corpus_version)
+        qkey = query_key(query)
+        scores: dict[int, float] = {}
+        top: list[int] = []
+        scored = cached = batches = 0
+        early_exit = False
+        scoring = 0.0
+
+        for start in range(0, len(passages), self.batch_size):
+            batch = range(start, min(start + self.batch_size, len(passages)))
+            missing = []
+            for i in batch:
+                score = self._cached(qkey, passages[i].id)
+                if score is None:
+                    missing.append(i)
+                else:
+                    scores[i] = score
+                    cached += 1
+            if missing:
+                began = time.perf_counter()
+                values = await self.scorer.score(query, [passages[i].text for i in missing])
+                scoring += time.perf_counter() - began
+                batches += 1
+                scored += len(missing)
+                for i, score in zip(missing, values):
+                    scores[i] = float(score)
+                    self._store(qkey, passages[i].id, float(score))
+
+            previous = top
+            top = sorted(scores, key=lambda i: (-scores[i], i))[:k]
+            if (
+                len(top) == k
+                and top == previous
+                and batch.stop < len(passages)
+                and scores[top[-1]] - max(scores[i] for i in batch) >= self.margin
+            ):
+                early_exit = True
+                break
+
+        self._counts["queries"] += 1
+        self._counts["candidates"] += len(passages)
+        self._counts["scored"] += scored
+        self._counts["cache_hits"] += cached
+        self._counts["batches"] += batches
+        self._counts["early_exits"] += early_exit
+        if batches:
+            self._scoring_latency.record(scoring)
+        return RerankResult(
+            passages=[replace(passages[i], score=scores[i]) for i in top],
+            scored=scored,
+            cached=cached,
+            batches=batches,
+            early_exit=early_exit,
+            scoring_seconds=scoring,
+        )
+
+    def _cached(self, qkey: bytes, chunk_id: str) -> float | None:
+        score = self._scores.get((qkey, chunk_id))
+        if score is not None:
+            self._scores.move_to_end((qkey, chunk_id))
+        return score
+
+    def _store(self, qkey: bytes, chunk_id: str, score: float):
+        self._scores[(qkey, chunk_id)] = score
+        self._scores.move_to_end((qkey, chunk_id))
+        while len(self._scores) > self.cache_size:
+            self._scores.popitem(last=False)
+
+    def _check_version(self, corpus_version: str):
+        if corpus_version != self._corpus_version:
+            if self._corpus_version is not None:
+                self._counts["invalidations"] += 1
+            self._scores.clear()
+            self._corpus_version = corpus_version
+
+    def stats(self) -> dict:
+        counts = self._counts
+        considered = counts["scored"] + counts["cache_hits"]
+        return {
+            "scorer": self.scorer.model_id,
+            "candidates_per_query": self.candidates,
+            "batch_size": self.batch_size,
+            "margin": self.margin,
+            **counts,
+            "cached_scores": len(self._scores),
+            "cache_hit_rate": round(counts["cache_hits"] / considered, 4) if considered else 0.0,
+            "early_exit_rate": round(counts["early_exits"] / counts["queries"], 4) if counts["queries"] else 0.0,
+            "avg_fraction_considered": (
+                round(considered / counts["candidates"], 4) if counts["candidates"] else 0.0
+            ),
+            "scoring_latency": self._scoring_latency.snapshot(),
+        }
+
+
+reranker = None
+if RERANK_PROVIDER != "none":
+    reranker = Reranker(
+        candidates=RERANK_CANDIDATES,
+        batch_size=RERANK_BATCH_SIZE,
+        margin=RERANK_MARGIN,
+        cache_size=RERANK_CACHE_SIZE,
+    )
+    metrics.register("reranker", reranker.stats)
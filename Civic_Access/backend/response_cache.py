@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+
+import metrics
+from db_async import db
+
+
+load_dotenv()
+
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 3600))
+RESPONSE_CACHE_PERSIST = os.getenv("RESPONSE_CACHE_PERSIST", "").lower() in ("1", "true", "yes")
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Folds case, width, punctuation and spacing so trivially different questions match."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def cache_key(message: str, language: str, corpus_version: str, prompt_version: str) -> str:
+    raw = "\x1f".join([normalize_query(message), language, corpus_version, prompt_version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    translated_query: str
+    passages: list[dict]
+    reply: str
+    created_at: float = field(default_factory=time.time)
+
+
+class ResponseCache:
+    """
+    Exact-match cache of /chat answers.
+
+    Keys are the normalized question, target language, corpus version and
+    prompt version. Lookups go to a per-worker LRU first, then (with
+    `persist`) to the `response_cache` table shared by every worker. When
+    either version changes, the cache purges everything stored under the
+    old versions.
+    """
+
+    def __init__(self, size: int = 1000, ttl: float = 3600.0, persist: bool = False):
+        self.size = size
+        self.ttl = ttl
+        self.persist = persist
+        self._entries: OrderedDict[str, CachedAnswer] = OrderedDict()
+        self._versions = None
+        self._tasks = set()
+        self._counts = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "stale_stores": 0,
+            "evictions": 0,
+            "expired": 0,
+            "invalidations": 0,
+            "errors": 0,
+        }
+
+    async def get(
+        self, message: str, language: str, corpus_version: str, prompt_version: str
+    ) -> tuple[CachedAnswer | None, str]:
+        """Returns (answer, tier) where tier is 'memory', 'persistent' or 'miss'."""
+        self._check_versions(corpus_version, prompt_version)
+        key = cache_key(message, language, corpus_version, prompt_version)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._fresh(entry):
+                self._entries.move_to_end(key)
+                self._counts["memory_hits"] += 1
+                return entry, "memory"
+            del self._entries[key]
+            self._counts["expired"] += 1
+
+        if self.persist:
+            try:
+                entry = await self._load(key)
+            except Exception as e:
+                self._counts["errors"] += 1
+                print(f"--- Response cache read failed: {e} ---")
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+                self._counts["persistent_hits"] += 1
+                return entry, "persistent"
+
+        self._counts["misses"] += 1
+        return None, "miss"
+
+    def put(
+        self,
+        message: str,
+        language: str,
+        corpus_version: str,
+        prompt_version: str,
+        answer: CachedAnswer,
+    ):
+        """
+        Stores `answer`; the persistent write runs in the background.
+
+        An answer computed under versions other than the current ones (a
+        request that was in flight across a corpus reload) is dropped rather
+        than purging the cache back to its versions.
+        """
+        if self._versions is None:
+            self._versions = (corpus_version, prompt_version)
+        elif self._versions != (corpus_version, prompt_version):
+            self._counts["stale_stores"] += 1
+            return
+        key = cache_key(message, language, corpus_version, prompt_version)
+        self._remember(key, answer)
+        self._counts["stores"] += 1
+        if self.persist:
+            self._spawn(self._store(key, language, corpus_version, prompt_version, answer))
+
+    def stats(self) -> dict:
+        hits = self._counts["memory_hits"] + self._counts["persistent_hits"]
+        lookups = hits + self._counts["misses"]
+        return {
+            **self._counts,
+            "entries": len(self._entries),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "persist": self.persist,
+        }
+
+    def _fresh(self, entry: CachedAnswer) -> bool:
+        return time.time() - entry.created_at < self.ttl
+
+    def _remember(self, key: str, entry: CachedAnswer):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self._counts["evictions"] += 1
+
+    def _check_versions(self, corpus_version: str, prompt_version: str):
+        versions = (corpus_version, prompt_version)
+        if self._versions == versions:
+            return
+        if self._versions is not None:
+            print(f"Corpus or prompt changed ({self._versions} -> {versions}), purging response cache")
+            self._entries.clear()
+            self._counts["invalidations"] += 1
+            if self.persist:
+                self._spawn(
+                    db.execute(
+                        "DELETE FROM response_cache WHERE corpus_version != ? OR prompt_version != ?",
+                        [corpus_version, prompt_version],
+                    )
+                )
+        self._versions = versions
+
+    async def _load(self, key: str) -> CachedAnswer | None:
+        row = await db.fetchone(
+            "SELECT translated_query, passages, model_reply, created_at "
+            "FROM response_cache WHERE key = ? AND created_at > ?",
+            [key, time.time() - self.ttl],
+        )
+        if row is None:
+            return None
+        return CachedAnswer(
+            translated_query=row["translated_query"] or "",
+            passages=json.loads(row["passages"] or "[]"),
+            reply=row["model_reply"],
+            created_at=row["created_at"],
+        )
+
+    async def _store(
+        self, key: str, language: str, corpus_version: str, prompt_version: str, answer: CachedAnswer
+    ):
+        await db.execute(
+            "INSERT OR REPLACE INTO response_cache (key, target_lang, corpus_version, prompt_version, "
+            "translated_query, passages, model_reply, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                key,
+                language,
+                corpus_version,
+                prompt_version,
+                answer.translated_query,
+                json.dumps(answer.passages),
+                answer.reply,
+                answer.created_at,
+            ],
+        )
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._counts["errors"] += 1
+            print(f"--- Response cache write failed: {task.exception()} ---")
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PERSIST)
+metrics.register("response_cache", response_cache.stats)
@@ -0,0 +1,206 @@
+"""Retrieval over the legal corpus (statute text files in CORPUS_DIR)."""
+
+import os
+import threading
+from pathlib import Path
+from dotenv import load_dotenv
+
+import metrics
+from retrieval.base import NullRetriever, Passage
+from retrieval.ann import IVFIndex
+from retrieval.bm25 import BM25Index, BM25Retriever
+from retrieval.chunker import CHUNK_MAX_CHARS, StatuteChunker, load_corpus
+from retrieval.corpus import Section
+from retrieval.hybrid import HybridRetriever, reciprocal_rank_fusion
+from retrieval.index_file import IndexFormatError, MappedIndex, open_index
+from retrieval.reindex import ChangeSet, CorpusIndexer
+from retrieval.router import ROUTER_ENABLED, LinearTopicModel, RoutedRetriever, TopicRouter
+
+
+load_dotenv()
+
+
+CORPUS_DIR = os.getenv("CORPUS_DIR", str(Path(__file__).resolve().parent.parent / "corpus"))
+BM25_K1 = float(os.getenv("BM25_K1", 1.2))
+BM25_B = float(os.getenv("BM25_B", 0.75))
+RETRIEVAL_INDEX = os.getenv("RETRIEVAL_INDEX", str(Path(CORPUS_DIR) / "legal.idx"))
+RETRIEVAL_INDEX_VERIFY = os.getenv("RETRIEVAL_INDEX_VERIFY", "").lower() in ("1", "true", "yes")
+RETRIEVAL_RELOAD_INTERVAL = float(os.getenv("RETRIEVAL_RELOAD_INTERVAL", 10))
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+ROUTER_MODEL = os.getenv("ROUTER_MODEL", str(Path(CORPUS_DIR) / "router.npz"))
+
+
+_retriever = None
+_indexer: CorpusIndexer | None = None
+_mapped_stamp = None
+_lock = threading.Lock()
+_watcher = None
+_stop_watching = threading.Event()
+
+
+def get_retriever():
+    if _retriever is None:
+        with _lock:
+            if _retriever is None:
+                _load()
+                metrics.register("retrieval", lambda: get_retriever().stats())
+    return _retriever
+
+
+def reload() -> bool:
+    """
+    Picks up corpus changes: a rebuilt index file is re-mapped; otherwise
+    changed statute files are re-chunked and only changed chunks re-indexed.
+    Returns True if the retriever was replaced.
+    """
+    global _retriever
+
+    with _lock:
+        if _retriever is None:
+            _load()
+            return True
+        if _mapped_stamp is not None:
+            if _file_stamp(RETRIEVAL_INDEX) == _mapped_stamp:
+                return False
+            return _load()
+        if _indexer is None:
+            return False
+        changes = _indexer.refresh()
+        if changes.empty:
+            return False
+        _retriever = _routed(BM25Retriever(_indexer.index)) if _indexer.sections else NullRetriever()
+        print(f"Corpus changed ({changes.summary()}); now serving {_retriever.version}")
+        return True
+
+
+def start_watching(interval: float = RETRIEVAL_RELOAD_INTERVAL):
+    """Calls `reload()` every `interval` seconds on a daemon thread; 0 disables it."""
+    global _watcher
+
+    if interval <= 0 or _watcher is not None:
+        return
+    _stop_watching.clear()
+    _watcher = threading.Thread(target=_watch, args=(interval,), name="corpus-watch", daemon=True)
+    _watcher.start()
+
+
+def stop_watching():
+    global _watcher
+
+    _stop_watching.set()
+    if _watcher is not None:
+        _watcher.join(5)
+    _watcher = None
+
+
+def _watch(interval: float):
+    while not _stop_watching.wait(interval):
+        try:
+            reload()
+        except Exception as e:
+            print(f"--- Corpus reload failed: {e} ---")
+
+
+def _load() -> bool:
+    global _retriever, _indexer, _mapped_stamp
+
+    index = _open_index_file()
+    if index is not None:
+        _retriever, _indexer = _routed(_mapped_retriever(index)), None
+        return True
+
+    _mapped_stamp = None
+    _indexer = CorpusIndexer(CORPUS_DIR, CHUNK_MAX_CHARS, BM25_K1, BM25_B)
+    if os.path.isdir(CORPUS_DIR):
+        _indexer.refresh()
+    if _indexer.sections:
+        _retriever = _routed(BM25Retriever(_indexer.index))
+        print(f"Indexed {len(_indexer.sections)} corpus chunks from {CORPUS_DIR}")
+    else:
+        print(f"No corpus found in {CORPUS_DIR}; answering without retrieval")
+        _retriever = NullRetriever()
+    return True
+
+
+def _mapped_retriever(index: MappedIndex):
+    """Hybrid when the file has an ANN index from the configured embedding model."""
+    if RETRIEVAL_MODE != "hybrid" or index.ann is None:
+        return BM25Retriever(index)
+    from embedding_store import get_embedder
+
+    embedder = get_embedder()
+    if embedder.model_id != index.embedding_model:
+        print(
+            f"--- {RETRIEVAL_INDEX} was embedded with {index.embedding_model}, not "
+            f"{embedder.model_id}; using BM25 only until it is rebuilt ---"
+        )
+        return BM25Retriever(index)
+    return HybridRetriever(index, index.ann, embedder)
+
+
+def _routed(retriever):
+    """Wraps the retriever in the topic router when there is more than one statute to route between."""
+    if not ROUTER_ENABLED or len(retriever.index.document_ranges) < 2:
+        return retriever
+    model = None
+    if os.path.exists(ROUTER_MODEL):
+        try:
+            model = LinearTopicModel.load(ROUTER_MODEL)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"--- Cannot load {ROUTER_MODEL} ({e}); routing with keyword rules only ---")
+    return RoutedRetriever(retriever, TopicRouter(model))
+
+
+def _file_stamp(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _open_index_file() -> MappedIndex | None:
+    global _mapped_stamp
+
+    stamp = _file_stamp(RETRIEVAL_INDEX)
+    if stamp is None:
+        return None
+    try:
+        index = open_index(RETRIEVAL_INDEX, verify=RETRIEVAL_INDEX_VERIFY)
+    except (OSError, IndexFormatError) as e:
+        print(f"--- Cannot use {RETRIEVAL_INDEX} ({e}); indexing the corpus in memory ---")
+        return None
+    _mapped_stamp = stamp
+
+    built = os.path.getmtime(RETRIEVAL_INDEX)
+    if any(p.stat().st_mtime > built for p in Path(CORPUS_DIR).glob("*.txt")):
+        print(f"--- {RETRIEVAL_INDEX} is older than the corpus; rebuild it with "
+              "`python -m retrieval build` ---")
+    print(f"Mapped {RETRIEVAL_INDEX} ({index.num_sections} sections, corpus {index.corpus_version})")
+    return index
+
+
+__all__ = [
+    "BM25Index",
+    "BM25Retriever",
+    "ChangeSet",
+    "CorpusIndexer",
+    "HybridRetriever",
+    "IVFIndex",
+    "LinearTopicModel",
+    "IndexFormatError",
+    "MappedIndex",
+    "NullRetriever",
+    "Passage",
+    "RoutedRetriever",
+    "Section",
+    "StatuteChunker",
+    "TopicRouter",
+    "get_retriever",
+    "load_corpus",
+    "open_index",
+    "reciprocal_rank_fusion",
+    "reload",
+    "start_watching",
+    "stop_watching",
+]
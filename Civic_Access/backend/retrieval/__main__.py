@@ -0,0 +1,318 @@
+"""Retrieval index CLI: build, verify, info, train-router and bench."""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from retrieval import BM25_B, BM25_K1, CORPUS_DIR, RETRIEVAL_INDEX, ROUTER_MODEL
+from retrieval.ann import (
+    ANN_NLIST,
+    ANN_PQ_SUBVECTORS,
+    ANN_QUANTIZE,
+    ANN_RECALL_TOLERANCE,
+    ANN_SEED,
+    IVFIndex,
+)
+from retrieval.bm25 import BM25Index
+from retrieval.chunker import load_corpus
+from retrieval.corpus import Section
+from retrieval.index_file import IndexFormatError, open_index, write_index
+from retrieval.reindex import diff
+from retrieval.router import LinearTopicModel, TopicRouter
+
+
+async def _embed_sections(sections: list[Section]) -> tuple[np.ndarray, str, int]:
+    """
+    Embeds each chunk's index text through the shared embedding store, so
+    only chunks whose text no earlier build has seen reach the model.
+    Returns (vectors, model id, number embedded).
+    """
+    from embedding_store import get_embedder
+
+    embedder = get_embedder()
+    before = embedder.misses
+    vectors = await embedder.embed_documents([s.index_text for s in sections])
+    return vectors, embedder.model_id, embedder.misses - before
+
+
+def _previous_index(path: str):
+    if not os.path.exists(path):
+        return None
+    try:
+        return open_index(path)
+    except (OSError, IndexFormatError) as e:
+        print(f"Ignoring previous index {path}: {e}")
+        return None
+
+
+def build(
+    corpus_dir: str,
+    out: str,
+    embeddings: bool = True,
+    nlist: int = ANN_NLIST,
+    seed: int = ANN_SEED,
+    quantize: str = ANN_QUANTIZE,
+    pq_subvectors: int = ANN_PQ_SUBVECTORS,
+    queries_path: str | None = None,
+    tolerance: float = ANN_RECALL_TOLERANCE,
+):
+    sections = load_corpus(corpus_dir)
+    if not sections:
+        raise SystemExit(f"No *.txt statutes found in {corpus_dir}")
+    start = time.perf_counter()
+    previous = _previous_index(out)
+    if previous is not None:
+        old = [previous.section(row) for row in range(previous.num_sections)]
+        print(f"Chunks: {diff(old, sections).summary()} since the previous build")
+
+    index = BM25Index(sections, BM25_K1, BM25_B)
+    vectors = model = ann = None
+    if embeddings:
+        vectors, model, embedded = asyncio.run(_embed_sections(sections))
+        print(f"Embedded {embedded} chunks, reused {len(sections) - embedded} from the embedding store")
+        ann = IVFIndex.build(vectors, nlist=nlist, seed=seed, quantize="none")
+        print(f"Clustered embeddings into {ann.nlist} IVF lists (seed {seed})")
+        if quantize != "none":
+            queries = asyncio.run(_embed_queries(_bench_queries(index, queries_path)))
+            _quantize(ann, queries, quantize, pq_subvectors, tolerance)
+    write_index(out, index, vectors, model, ann)
+    print(
+        f"Wrote {out}: {len(sections)} sections, {len(index.terms)} terms, "
+        f"{os.path.getsize(out)} bytes, corpus {index.corpus_version} "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+
+
+_FALLBACK = {"pq": "int8", "int8": "none"}
+
+
+def _quantize(ann: IVFIndex, queries: np.ndarray, kind: str, pq_subvectors: int, tolerance: float, k: int = 10):
+    """
+    Quantizes with `kind`, falling back pq -> int8 -> none until recall@k of
+    the codes alone (exhaustive probe, no re-rank, against exact float
+    search) is within `tolerance`. That is what ANN_RERANK=0 serves; a
+    re-rank window as large as the corpus would hide the codes' error, and
+    a re-rank only reorders the codes' shortlist, so it never does worse.
+    """
+    exact = _exact(ann.vectors, queries, k)
+    rerank, ann.rerank = ann.rerank, 0
+    try:
+        while kind != "none":
+            ann.quantize(kind, pq_subvectors)
+            recall, _ = _recall(ann, queries, exact, k, ann.nlist)
+            ratio = ann.vectors.nbytes / ann.codes.nbytes
+            if recall >= 1 - tolerance:
+                print(f"Quantized embeddings with {kind}: {ratio:.1f}x smaller, recall@{k} {recall:.3f} from codes alone")
+                return
+            print(f"{kind} recall@{k} {recall:.3f} is below {1 - tolerance:.3f}; trying {_FALLBACK[kind]}")
+            kind = _FALLBACK[kind]
+        ann.quantize("none")
+    finally:
+        ann.rerank = rerank
+
+
+def _bench_queries(index, path: str | None, limit: int = 200) -> list[str]:
+    """Queries from `path` (one per line), else section headings and opening words."""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    queries = []
+    for row in range(index.num_sections):
+        section = index.section(row)
+        queries.append(section.heading or " ".join(section.text.split()[:12]))
+    return list(dict.fromkeys(queries))[:limit]
+
+
+async def _embed_queries(queries: list[str]) -> np.ndarray:
+    from embedding_store import get_embedder
+
+    return await get_embedder().embed(queries)
+
+
+def _exact(vectors: np.ndarray, queries: np.ndarray, k: int) -> list[set[int]]:
+    """True top-k rows per query by brute-force float32 search."""
+    return [set(np.argsort(-(vectors @ query), kind="stable")[:k].tolist()) for query in queries]
+
+
+def _recall(ann: IVFIndex, queries: np.ndarray, exact: list[set[int]], k: int, nprobe: int):
+    """Returns (recall@k, sorted per-query latencies)."""
+    found, timings = 0, []
+    for query, truth in zip(queries, exact):
+        start = time.perf_counter()
+        hits = ann.search(query, k, nprobe=nprobe)
+        timings.append(time.perf_counter() - start)
+        found += len(truth & {row for row, _ in hits})
+    return found / max(1, sum(len(t) for t in exact)), sorted(timings)
+
+
+_SMAPS_RANGE = re.compile(r"^[0-9a-f]+-[0-9a-f]+ ")
+
+
+def _mapped_rss(path: str) -> int | None:
+    """Resident bytes of this process's mappings of `path` (Linux /proc/self/smaps), else None."""
+    target = os.path.realpath(path)
+    try:
+        with open("/proc/self/smaps", encoding="utf-8") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    total, inside = 0, False
+    for line in lines:
+        if _SMAPS_RANGE.match(line):
+            fields = line.split(maxsplit=5)
+            inside = len(fields) == 6 and fields[5].strip() == target
+        elif inside and line.startswith("Rss:"):
+            total += int(line.split()[1]) * 1024
+    return total
+
+
+def bench(path: str, queries_path: str | None, k: int, nprobes: list[int], rerank: int | None = None):
+    """
+    Reports ANN recall@k against exact float search, and latency, per
+    nprobe; then how much of the index file the searches left resident.
+    """
+    from embedding_store import get_embedder
+
+    index = open_index(path)
+    if index.ann is None:
+        raise SystemExit(f"{path} has no ANN index; rebuild it with embeddings")
+    if get_embedder().model_id != index.embedding_model:
+        raise SystemExit(f"{path} was embedded with {index.embedding_model}, not {get_embedder().model_id}")
+    if rerank is not None:
+        index.ann.rerank = rerank
+
+    queries = asyncio.run(_embed_queries(_bench_queries(index, queries_path)))
+    exact = _exact(index.embeddings, queries, k)
+    # The exact search read every vector; start the searches below from a cold mapping.
+    index.drop_pages()
+    stats = index.ann.stats()
+    print(
+        f"{len(queries)} queries, {index.num_sections} vectors, {index.ann.nlist} lists, "
+        f"quantizer {stats['quantizer']} (rerank {stats['rerank']}, {stats['code_bytes']} code bytes "
+        f"for {stats['vector_bytes']} vector bytes), recall@{k}"
+    )
+    for nprobe in nprobes:
+        recall, timings = _recall(index.ann, queries, exact, k, nprobe)
+        print(
+            f"  nprobe={nprobe:<4} recall={recall:.3f}  "
+            f"avg={np.mean(timings) * 1000:.3f}ms  p99={timings[int(0.99 * (len(timings) - 1))] * 1000:.3f}ms"
+        )
+    resident = _mapped_rss(path)
+    stats = index.ann.stats()
+    print(
+        f"Resident index pages after the searches: "
+        f"{'unavailable (no /proc/self/smaps)' if resident is None else f'{resident} bytes'} "
+        f"(codes {stats['code_bytes']}, vectors {stats['vector_bytes']}, "
+        f"{stats['avg_reranked']} float32 rows re-ranked per query)"
+    )
+
+
+def _labelled_queries(path: str) -> list[tuple[str, str]]:
+    """Lines of "<statute>\t<query>", e.g. "police_act_2020\tcan police hold me for a week"."""
+    with open(path, encoding="utf-8") as f:
+        pairs = [line.rstrip("\n").split("\t", 1) for line in f if line.strip()]
+    return [(label.strip(), query.strip()) for label, query in pairs]
+
+
+def train_router(corpus_dir: str, out: str, queries_path: str | None = None):
+    """Trains the router's topic model on section texts and headings (plus labelled queries)."""
+    sections = load_corpus(corpus_dir)
+    texts, labels = [], []
+    for section in sections:
+        texts.append(section.index_text)
+        labels.append(section.document)
+        if section.heading:
+            texts.append(section.heading)
+            labels.append(section.document)
+    queries = _labelled_queries(queries_path) if queries_path else []
+    for label, query in queries:
+        texts.append(query)
+        labels.append(label)
+    if len(set(labels)) < 2:
+        raise SystemExit(f"Need at least two statutes in {corpus_dir} to train a router")
+
+    start = time.perf_counter()
+    model = LinearTopicModel.train(texts, labels)
+    model.save(out)
+    correct = sum(max(p := model.predict(t), key=p.get) == label for t, label in zip(texts, labels))
+    print(
+        f"Wrote {out}: model {model.version}, {len(model.classes)} statutes, {len(texts)} examples, "
+        f"training accuracy {correct / len(texts):.3f} in {time.perf_counter() - start:.2f}s"
+    )
+    if queries:
+        router, shards = TopicRouter(model), model.classes
+        routes = [(label, router.route(query, shards)) for label, query in queries]
+        hit = sum(r.documents is None or label in r.documents for label, r in routes)
+        fallback = sum(r.documents is None for _, r in routes)
+        searched = sum(len(r.documents or shards) for _, r in routes) / (len(routes) * len(shards))
+        print(
+            f"Labelled queries: {hit / len(routes):.3f} routed to their statute, "
+            f"{fallback / len(routes):.3f} fell back to all, {searched:.3f} of statutes searched on average"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m retrieval", description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_cmd = commands.add_parser("build", help="index the corpus into an index file")
+    build_cmd.add_argument("--corpus", default=CORPUS_DIR)
+    build_cmd.add_argument("--out", default=RETRIEVAL_INDEX)
+    build_cmd.add_argument("--no-embeddings", action="store_true", help="skip section embeddings")
+    build_cmd.add_argument("--nlist", type=int, default=ANN_NLIST, help="IVF lists (0 = about sqrt(sections))")
+    build_cmd.add_argument("--seed", type=int, default=ANN_SEED, help="k-means seed")
+    build_cmd.add_argument("--quantize", choices=["int8", "pq", "none"], default=ANN_QUANTIZE)
+    build_cmd.add_argument("--pq-subvectors", type=int, default=ANN_PQ_SUBVECTORS, help="0 = dim / 4")
+    build_cmd.add_argument("--queries", help="benchmark queries for the recall check, one per line")
+    build_cmd.add_argument("--recall-tolerance", type=float, default=ANN_RECALL_TOLERANCE)
+    for name, help in (("verify", "check the file's checksums"), ("info", "print the file's metadata")):
+        command = commands.add_parser(name, help=help)
+        command.add_argument("path", nargs="?", default=RETRIEVAL_INDEX)
+    bench_cmd = commands.add_parser("bench", help="measure ANN recall and latency")
+    bench_cmd.add_argument("path", nargs="?", default=RETRIEVAL_INDEX)
+    bench_cmd.add_argument("--queries", help="file with one query per line")
+    bench_cmd.add_argument("-k", type=int, default=10)
+    bench_cmd.add_argument("--nprobe", default="1,2,4,8,16,32")
+    bench_cmd.add_argument("--rerank", type=int, help="exact re-rank depth (default ANN_RERANK)")
+    router_cmd = commands.add_parser("train-router", help="train the topic router's model")
+    router_cmd.add_argument("--corpus", default=CORPUS_DIR)
+    router_cmd.add_argument("--out", default=ROUTER_MODEL)
+    router_cmd.add_argument("--queries", help='labelled queries, one "<statute>\\t<query>" per line')
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build(
+            args.corpus,
+            args.out,
+            not args.no_embeddings,
+            args.nlist,
+            args.seed,
+            args.quantize,
+            args.pq_subvectors,
+            args.queries,
+            args.recall_tolerance,
+        )
+        return
+    if args.command == "train-router":
+        train_router(args.corpus, args.out, args.queries)
+        return
+    if args.command == "bench":
+        bench(args.path, args.queries, args.k, [int(n) for n in args.nprobe.split(",")], args.rerank)
+        return
+
+    try:
+        index = open_index(args.path, verify=args.command == "verify")
+    except (OSError, IndexFormatError) as e:
+        raise SystemExit(str(e))
+    if args.command == "verify":
+        print(f"{args.path}: OK ({index.num_sections} sections, corpus {index.corpus_version})")
+    else:
+        print(json.dumps(index.meta, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import os
+import time
+from dotenv import load_dotenv
+
+import numpy as np
+
+import metrics
+from retrieval.quantize import QUANTIZERS
+
+
+load_dotenv()
+
+
+ANN_NLIST = int(os.getenv("ANN_NLIST", 0))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", 16))
+ANN_SEED = int(os.getenv("ANN_SEED", 0))
+ANN_ITERATIONS = int(os.getenv("ANN_ITERATIONS", 10))
+ANN_QUANTIZE = os.getenv("ANN_QUANTIZE", "int8").lower()
+ANN_PQ_SUBVECTORS = int(os.getenv("ANN_PQ_SUBVECTORS", 0))
+ANN_RERANK = int(os.getenv("ANN_RERANK", 0))
+ANN_RECALL_TOLERANCE = float(os.getenv("ANN_RECALL_TOLERANCE", 0.02))
+
+
+def default_nlist(n: int) -> int:
+    """About sqrt(n) lists, so a probe scans roughly sqrt(n) vectors per list."""
+    return max(1, min(n, int(round(np.sqrt(n)))))
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block: int = 4096) -> np.ndarray:
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block):
+        labels[start : start + block] = np.argmax(vectors[start : start + block] @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, seed: int = 0, iterations: int = 10) -> np.ndarray:
+    """
+    Spherical k-means over unit vectors. Initial centroids are drawn with
+    `seed`, so the same vectors always give the same lists.
+    """
+    rng = np.random.default_rng(seed)
+    init = np.sort(rng.choice(len(vectors), size=nlist, replace=False))
+    centroids = np.array(vectors[init], dtype=np.float32)
+    for _ in range(iterations):
+        labels = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # An empty list keeps its previous centroid.
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids).astype(np.float32)
+    return centroids
+
+
+def _best(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the `k` highest scores, unordered."""
+    if len(scores) <= k:
+        return np.arange(len(scores))
+    return np.argpartition(-scores, k - 1)[:k]
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over unit-norm vectors (inner product = cosine).
+
+    Vectors are grouped by nearest centroid; `rows[offsets[c]:offsets[c + 1]]`
+    are the vectors of list `c`. A query scores the centroids, then scans
+    only the `nprobe` closest lists. `nprobe >= nlist` is exhaustive search.
+    The vectors themselves stay wherever the caller keeps them (typically
+    the mapped index file).
+
+    With a quantizer, lists are scanned over compact `codes`. With `rerank`
+    > 0 the best `rerank` candidates are then scored against the exact
+    vectors, which pages those rows of the mapped file in.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        centroids: np.ndarray,
+        offsets,
+        rows,
+        nprobe: int = ANN_NPROBE,
+        params: dict | None = None,
+        quantizer=None,
+        codes: np.ndarray | None = None,
+        rerank: int = ANN_RERANK,
+    ):
+        self.vectors = vectors
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.offsets = np.asarray(offsets)
+        self.rows = np.asarray(rows)
+        self.nprobe = nprobe
+        self.params = params or {}
+        self.quantizer = quantizer
+        self.codes = codes
+        self.rerank = rerank
+        self._latency = metrics.LatencyStats()
+        self._scanned = 0
+        self._reranked = 0
+        self._queries = 0
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        nlist: int = ANN_NLIST,
+        seed: int = ANN_SEED,
+        iterations: int = ANN_ITERATIONS,
+        nprobe: int = ANN_NPROBE,
+        quantize: str = ANN_QUANTIZE,
+        pq_subvectors: int = ANN_PQ_SUBVECTORS,
+    ) -> "IVFIndex":
+        nlist = min(nlist or default_nlist(len(vectors)), len(vectors))
+        centroids = train_centroids(vectors, nlist, seed, iterations)
+        labels = _assign(vectors, centroids)
+        rows = np.argsort(labels, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=nlist))))
+        index = cls(vectors, centroids, offsets, rows, nprobe, {"seed": seed, "iterations": iterations})
+        if quantize != "none":
+            index.quantize(quantize, pq_subvectors)
+        return index
+
+    def quantize(self, kind: str, pq_subvectors: int = ANN_PQ_SUBVECTORS):
+        """Trains `kind` ("int8", "pq" or "none") on the vectors and encodes them."""
+        if kind == "none":
+            self.quantizer = self.codes = None
+            return
+        if kind not in QUANTIZERS:
+            raise ValueError(f"Unknown quantizer '{kind}', expected one of {sorted(QUANTIZERS)} or 'none'")
+        seed, iterations = self.params.get("seed", ANN_SEED), self.params.get("iterations", ANN_ITERATIONS)
+        self.quantizer = QUANTIZERS[kind].train(self.vectors, m=pq_subvectors, seed=seed, iterations=iterations)
+        self.codes = self.quantizer.encode(self.vectors)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        nprobe: int | None = None,
+        ranges: list[tuple[int, int]] | None = None,
+    ) -> list[tuple[int, float]]:
+        """
+        Returns up to `k` (row, cosine) pairs, best first; with `ranges`,
+        only rows inside those [start, end) ranges.
+        """
+        start = time.perf_counter()
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        if nprobe >= self.nlist:
+            candidates = np.arange(len(self.vectors))
+        else:
+            lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+            candidates = np.concatenate([self.rows[self.offsets[c] : self.offsets[c + 1]] for c in lists])
+        if ranges is not None:
+            keep = np.zeros(len(candidates), dtype=bool)
+            for lo, hi in ranges:
+                keep |= (candidates >= lo) & (candidates < hi)
+            candidates = candidates[keep]
+        self._scanned += len(candidates)
+        if self.codes is not None:
+            approx = self.quantizer.score(query, self.codes[candidates])
+            if self.rerank <= 0:
+                return self._top(candidates, approx, k, start)
+            candidates = candidates[_best(approx, max(k, self.rerank))]
+            self._reranked += len(candidates)
+        return self._top(candidates, self.vectors[candidates] @ query, k, start)
+
+    def _top(self, candidates: np.ndarray, scores: np.ndarray, k: int, start: float) -> list[tuple[int, float]]:
+        top = _best(scores, k)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        self._queries += 1
+        self._latency.record(time.perf_counter() - start)
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def stats(self) -> dict:
+        return {
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "vectors": len(self.vectors),
+            "quantizer": self.quantizer.kind if self.quantizer is not None else "none",
+            "rerank": self.rerank if self.quantizer is not None else 0,
+            "vector_bytes": int(self.vectors.nbytes),
+            "code_bytes": int(self.codes.nbytes) if self.codes is not None else 0,
+            "avg_scanned": round(self._scanned / self._queries, 1) if self._queries else 0.0,
+            # Float32 rows read from the mapped file per query; each one pages in its vector.
+            "avg_reranked": round(self._reranked / self._queries, 1) if self._queries else 0.0,
+            "latency": self._latency.snapshot(),
+        }
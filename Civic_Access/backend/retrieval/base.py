@@ -0,0 +1,21 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class Passage:
+    id: str
+    text: str
+    score: float = 0.0
+    source: str = ""
+
+
+class NullRetriever:
+    """Retriever used until a corpus index is configured; returns no passages."""
+
+    version = "none"
+
+    async def search(self, query: str, k: int) -> list[Passage]:
+        return []
+
+    def stats(self) -> dict:
+        return {"retriever": "none"}
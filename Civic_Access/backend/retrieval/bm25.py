@@ -0,0 +1,176 @@
+import heapq
+from bisect import bisect_left
+import math
+import time
+from array import array
+from collections import Counter
+
+import metrics
+from retrieval.base import Passage
+from retrieval.corpus import Section, corpus_version, document_ranges, document_title
+from retrieval.text import tokenize
+
+
+class PostingsSearch:
+    """
+    BM25 query evaluation shared by the in-memory and memory-mapped indexes.
+
+    Subclasses provide `term_id(term)`, the flat `offsets`, `doc_ids` and
+    `weights` sequences, and `document_ranges`.
+    """
+
+    document_ranges: dict[str, tuple[int, int]]
+
+    def term_id(self, term: str) -> int | None:
+        raise NotImplementedError
+
+    def search(self, query: str, k: int, ranges: list[tuple[int, int]] | None = None) -> list[tuple[int, float]]:
+        """
+        Returns up to `k` (section index, score) pairs, best first.
+
+        With `ranges`, only sections in those [start, end) index ranges are
+        scored; postings are sorted by section, so each term's postings
+        outside the ranges are skipped by binary search, not scanned.
+        """
+        scores: dict[int, float] = {}
+        offsets, doc_ids, weights = self.offsets, self.doc_ids, self.weights
+        for term, qtf in Counter(tokenize(query)).items():
+            term_id = self.term_id(term)
+            if term_id is None:
+                continue
+            start, end = offsets[term_id], offsets[term_id + 1]
+            if ranges is None:
+                spans = [(start, end)]
+            else:
+                spans = [(bisect_left(doc_ids, lo, start, end), bisect_left(doc_ids, hi, start, end)) for lo, hi in ranges]
+            for span_start, span_end in spans:
+                for i in range(span_start, span_end):
+                    doc_id = doc_ids[i]
+                    scores[doc_id] = scores.get(doc_id, 0.0) + qtf * weights[i]
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+class BM25Index(PostingsSearch):
+    """
+    Section-level BM25 over the statute corpus.
+
+    Postings are stored term by term in flat integer arrays: `offsets[t]` to
+    `offsets[t + 1]` indexes the section ids and precomputed BM25 weights of
+    term `t`, so a query only sums weights, with no per-query idf or length
+    normalisation.
+
+    `term_counts` maps content hashes to token counts from a previous build;
+    only chunks missing from it are tokenized again (it is updated in place).
+    """
+
+    def __init__(
+        self,
+        sections: list[Section],
+        k1: float = 1.2,
+        b: float = 0.75,
+        term_counts: dict[str, Counter] | None = None,
+    ):
+        self.sections = sections
+        self.k1 = k1
+        self.b = b
+        self._term_counts = term_counts if term_counts is not None else {}
+        self.terms: dict[str, int] = {}
+        self.df = array("I")
+        self.offsets = array("I", [0])
+        self.doc_ids = array("I")
+        self.weights = array("f")
+        self.lengths = array("I")
+        self._build()
+        self.corpus_version = corpus_version(sections)
+        self.document_ranges = document_ranges(s.document for s in sections)
+
+    @property
+    def num_sections(self) -> int:
+        return len(self.sections)
+
+    def section(self, doc_id: int) -> Section:
+        return self.sections[doc_id]
+
+    def term_id(self, term: str) -> int | None:
+        return self.terms.get(term)
+
+    def _build(self):
+        term_counts = []
+        for section in self.sections:
+            counts = self._term_counts.get(section.content_hash)
+            if counts is None:
+                counts = Counter(tokenize(section.index_text))
+                if section.content_hash:
+                    self._term_counts[section.content_hash] = counts
+            term_counts.append(counts)
+            self.lengths.append(sum(counts.values()))
+
+        postings: dict[str, list[tuple[int, int]]] = {}
+        for doc_id, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        n = len(self.sections)
+        avgdl = (sum(self.lengths) / n) if n else 0.0
+        for term in sorted(postings):
+            entries = postings[term]
+            self.terms[term] = len(self.df)
+            self.df.append(len(entries))
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            for doc_id, tf in entries:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avgdl)
+                self.doc_ids.append(doc_id)
+                self.weights.append(idf * tf * (self.k1 + 1) / (tf + norm))
+            self.offsets.append(len(self.doc_ids))
+
+    def stats(self) -> dict:
+        return {
+            "source": "memory",
+            "sections": len(self.sections),
+            "terms": len(self.terms),
+            "postings": len(self.doc_ids),
+            "postings_bytes": self.doc_ids.itemsize * len(self.doc_ids)
+            + self.weights.itemsize * len(self.weights),
+        }
+
+
+class BM25Retriever:
+    """
+    Pipeline retriever over a BM25Index or MappedIndex; `version` identifies
+    the corpus content.
+    """
+
+    def __init__(self, index: PostingsSearch):
+        self.index = index
+        self.version = f"bm25-{index.corpus_version}"
+        self._latency = metrics.LatencyStats()
+
+    async def search(self, query: str, k: int, documents: list[str] | None = None) -> list[Passage]:
+        return self.search_now(query, k, documents)
+
+    def search_now(self, query: str, k: int, documents: list[str] | None = None) -> list[Passage]:
+        """`documents` restricts the search to those statutes (all when None)."""
+        start = time.perf_counter()
+        hits = self.index.search(query, k, self._ranges(documents))
+        self._latency.record(time.perf_counter() - start)
+        return [self._passage(doc_id, score) for doc_id, score in hits]
+
+    def _ranges(self, documents: list[str] | None) -> list[tuple[int, int]] | None:
+        if documents is None:
+            return None
+        return [self.index.document_ranges[d] for d in documents if d in self.index.document_ranges]
+
+    def _passage(self, doc_id: int, score: float) -> Passage:
+        section = self.index.section(doc_id)
+        source = document_title(section.document)
+        if section.citation:
+            source = f"{source}, {section.citation}"
+        return Passage(id=section.id, text=section.text, score=score, source=source)
+
+    def stats(self) -> dict:
+        return {
+            "retriever": "bm25",
+            "version": self.version,
+            **self.index.stats(),
+            "query_latency": self._latency.snapshot(),
+        }
@@ -0,0 +1,313 @@
+import hashlib
+import os
+import re
+from pathlib import Path
+from dotenv import load_dotenv
+
+from retrieval.corpus import Section
+
+
+load_dotenv()
+
+
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", 2000))
+
+
+_CHAPTER = re.compile(r"^CHAPTER\s+([IVXLCDM]+|\d+)\b[\s.:\-–—]*(.*)$", re.IGNORECASE)
+_PART = re.compile(r"^PART\s+([IVXLCDM]+|\d+|[A-Z])\b[\s.:\-–—]*(.*)$", re.IGNORECASE)
+_SCHEDULE = re.compile(
+    r"^((?:FIRST|SECOND|THIRD|FOURTH|FIFTH|SIXTH|SEVENTH|EIGHTH|NINTH|TENTH)\s+)?SCHEDULE\b[\s.:\-–—]*(.{0,80})$",
+    re.IGNORECASE,
+)
+_CONTENTS = re.compile(
+    r"^(ARRANGEMENT\s+OF\s+(SECTIONS|REGULATIONS|RULES|PARAGRAPHS)|TABLE\s+OF\s+CONTENTS)\b", re.IGNORECASE
+)
+_SECTION = re.compile(r"^(\d{1,3}[A-Z]?)\.\s+(.*)$")
+_SUBSECTION = re.compile(r"^\((\d{1,3}[A-Za-z]?)\)\s*")
+_SENTENCE_END = re.compile(r"(?<=[.;:])\s+(?=\(?[A-Z0-9])")
+
+
+def content_hash(heading: str, text: str) -> str:
+    return hashlib.sha256(f"{heading}\n{text}".encode("utf-8")).hexdigest()[:16]
+
+
+def _looks_like_heading(line: str) -> bool:
+    """Marginal notes ("Right to personal liberty") sit on their own line above a section."""
+    return (
+        len(line) <= 100
+        and line[:1].isupper()
+        and line[-1:] not in ".;:,"
+        and not _SUBSECTION.match(line)
+    )
+
+
+def _structure(line: str) -> tuple[str, str, str] | None:
+    """
+    (kind, label, inline title) for a CHAPTER, PART or SCHEDULE heading line,
+    else None. Bare "Part I" lines count too; the Constitution writes its
+    parts that way.
+    """
+    words = line.split()
+    if not (words[0].isupper() or (len(words) == 2 and words[0].istitle())):
+        return None
+    if match := _CHAPTER.match(line):
+        return "chapter", f"Chapter {match.group(1).upper()}", match.group(2)
+    if match := _PART.match(line):
+        return "part", f"Part {match.group(1).upper()}", match.group(2)
+    if match := _SCHEDULE.match(line):
+        ordinal = line.split()[0].capitalize()
+        return "schedule", "Schedule" if ordinal == "Schedule" else f"{ordinal} Schedule", match.group(2)
+    return None
+
+
+class _Section:
+    def __init__(self, number: str, heading: str, chapter: str, part: str, prefix: str, titles: dict):
+        self.number = number
+        self.heading = heading
+        self.chapter = chapter
+        self.part = part
+        self.prefix = prefix
+        self.chapter_title = titles["chapter"]
+        self.part_title = titles["part"]
+        self.lines: list[str] = []
+
+
+class StatuteChunker:
+    """
+    Splits a statute into addressable nodes along its own structure.
+
+    Chapters, parts and schedules (with their titles) are tracked as context;
+    every numbered section becomes one chunk, or one chunk per subsection when
+    it is longer than `max_chars`. Ids come from the legal address, not from
+    positions in the file ("constitution_1999:s35(4)", "constitution_1999:sch2:s1"),
+    so editing one section leaves every other chunk's id and content hash alone.
+    An arrangement of sections at the top is kept in the preamble, not read as
+    sections.
+    """
+
+    def __init__(self, max_chars: int = 2000):
+        self.max_chars = max_chars
+
+    def chunk(self, document: str, text: str) -> list[Section]:
+        chunks: list[Section] = []
+        preamble: list[str] = []
+        chapter = part = prefix = ""
+        titles = {"chapter": "", "part": ""}
+        # Lines between a CHAPTER/PART/SCHEDULE heading and what follows it,
+        # and which title ("chapter" or "part") they belong to.
+        after_heading: list[str] = []
+        level: str | None = None
+        schedules = 0
+        current: _Section | None = None
+        seen: dict[str, int] = {}
+        # While reading the arrangement of sections: the section numbers it
+        # lists and its first heading. The body starts where either repeats.
+        listed: set[str] | None = None
+        first_listed = None
+
+        def close():
+            nonlocal current
+            if current is not None:
+                chunks.extend(self._section_chunks(document, current, seen))
+            current = None
+
+        def settle():
+            """Leading heading-like lines title the heading above; any text after them is its own chunk."""
+            nonlocal after_heading
+            if level is None:
+                return
+            lead = 0
+            while lead < len(after_heading) and _looks_like_heading(after_heading[lead]):
+                lead += 1
+            if lead:
+                titles[level] = " ".join(filter(None, [titles[level], *after_heading[:lead]]))
+            if lead < len(after_heading):
+                address = prefix.rstrip(":") or (chapter + part).lower().replace(" ", "")
+                chunks.append(self._body_chunk(document, address, after_heading[lead:], chapter, part, titles, seen))
+            after_heading = []
+
+        for raw in text.splitlines():
+            line = " ".join(raw.split())
+            if not line:
+                continue
+            structure = _structure(line)
+            number = _SECTION.match(line)
+
+            if listed is None and not chunks and current is None and level is None and _CONTENTS.match(line):
+                listed = set()
+                preamble.append(line)
+                continue
+            if listed is not None:
+                if (structure and structure[:2] == first_listed) or (number and number.group(1) in listed):
+                    listed = None
+                else:
+                    if structure and first_listed is None:
+                        first_listed = structure[:2]
+                    if number:
+                        listed.add(number.group(1))
+                    preamble.append(line)
+                    continue
+
+            if structure:
+                close()
+                settle()
+                kind, label, title = structure
+                if kind == "chapter":
+                    chapter, part = label, ""
+                    titles = {"chapter": title, "part": ""}
+                    level = "chapter"
+                elif kind == "part":
+                    part = label
+                    titles = {**titles, "part": title}
+                    level = "part"
+                else:
+                    schedules += 1
+                    chapter, part, prefix = label, "", f"sch{schedules}:"
+                    titles = {"chapter": title, "part": ""}
+                    level = "chapter"
+                continue
+
+            if number:
+                heading = ""
+                if current is not None and len(current.lines) > 1 and _looks_like_heading(current.lines[-1]):
+                    heading = current.lines.pop()
+                elif current is None and level is not None:
+                    if after_heading and _looks_like_heading(after_heading[-1]) and not after_heading[-1].isupper():
+                        heading = after_heading.pop()
+                    settle()
+                elif current is None and preamble and _looks_like_heading(preamble[-1]):
+                    heading = preamble.pop()
+                close()
+                current = _Section(number.group(1), heading, chapter, part, prefix, titles)
+                current.lines.append(number.group(2))
+                continue
+
+            if current is not None:
+                current.lines.append(line)
+            elif level is not None:
+                after_heading.append(line)
+            else:
+                preamble.append(line)
+
+        close()
+        settle()
+        if preamble:
+            body = "\n".join(preamble)
+            chunks.insert(
+                0,
+                Section(
+                    id=f"{document}:preamble",
+                    document=document,
+                    number="",
+                    text=body,
+                    content_hash=content_hash("", body),
+                ),
+            )
+        return chunks
+
+    @staticmethod
+    def _body_chunk(
+        document: str, address: str, lines: list[str], chapter: str, part: str, titles: dict, seen: dict
+    ) -> Section:
+        """Unnumbered text under a heading, such as a schedule that is not divided into sections."""
+        seen[address] = seen.get(address, 0) + 1
+        if seen[address] > 1:
+            address = f"{address}-{seen[address]}"
+        body = "\n".join(lines)
+        return Section(
+            id=f"{document}:{address}",
+            document=document,
+            number="",
+            text=body,
+            chapter=chapter,
+            part=part,
+            chapter_title=titles["chapter"],
+            part_title=titles["part"],
+            content_hash=content_hash("", body),
+        )
+
+    def _section_chunks(self, document: str, section: _Section, seen: dict) -> list[Section]:
+        address = f"{section.prefix}s{section.number}"
+        seen[address] = seen.get(address, 0) + 1
+        if seen[address] > 1:
+            # Repeated numbering outside a recognised schedule; keep ids unique.
+            address = f"{address}-{seen[address]}"
+        base = f"{document}:{address}"
+
+        text = "\n".join(section.lines)
+        subsections = self._subsections(section.lines)
+        if len(text) <= self.max_chars or len(subsections) < 2:
+            pieces = [("", f"{section.number}. {text}")]
+        else:
+            pieces = [(number, body) for number, body in subsections]
+            pieces[0] = (pieces[0][0], f"{section.number}. {pieces[0][1]}")
+
+        chunks = []
+        for subsection, body in pieces:
+            parts = self._split_long(body)
+            for i, part_text in enumerate(parts, 1):
+                chunk_id = base + (f"({subsection})" if subsection else "")
+                if len(parts) > 1:
+                    chunk_id += f"#{i}"
+                chunks.append(
+                    Section(
+                        id=chunk_id,
+                        document=document,
+                        number=section.number,
+                        text=part_text,
+                        subsection=subsection,
+                        chapter=section.chapter,
+                        part=section.part,
+                        heading=section.heading,
+                        chapter_title=section.chapter_title,
+                        part_title=section.part_title,
+                        content_hash=content_hash(section.heading, part_text),
+                    )
+                )
+        return chunks
+
+    @staticmethod
+    def _subsections(lines: list[str]) -> list[tuple[str, str]]:
+        """Groups section lines under "(1)", "(2)", ...; text before "(1)" joins the first."""
+        groups: list[tuple[str, list[str]]] = []
+        lead: list[str] = []
+        for line in lines:
+            match = _SUBSECTION.match(line)
+            if match:
+                groups.append((match.group(1), lead + [line]))
+                lead = []
+            elif groups:
+                groups[-1][1].append(line)
+            else:
+                lead.append(line)
+        if lead and not groups:
+            return []
+        return [(number, "\n".join(body)) for number, body in groups]
+
+    def _split_long(self, text: str) -> list[str]:
+        """Splits text longer than `max_chars` at sentence ends, never mid-sentence."""
+        if len(text) <= self.max_chars:
+            return [text]
+        parts, current = [], ""
+        for sentence in _SENTENCE_END.split(text):
+            if current and len(current) + 1 + len(sentence) > self.max_chars:
+                parts.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            parts.append(current)
+        return parts
+
+
+def chunk_file(path: str | os.PathLike, max_chars: int = CHUNK_MAX_CHARS) -> list[Section]:
+    path = Path(path)
+    return StatuteChunker(max_chars).chunk(path.stem, path.read_text(encoding="utf-8"))
+
+
+def load_corpus(directory: str | os.PathLike, max_chars: int = CHUNK_MAX_CHARS) -> list[Section]:
+    """Chunks every `*.txt` statute in `directory` (sorted by name)."""
+    sections = []
+    for path in sorted(Path(directory).glob("*.txt")):
+        sections.extend(chunk_file(path, max_chars))
+    return sections
@@ -0,0 +1,67 @@
+import hashlib
+from dataclasses import dataclass
+
+
+# Display names for the statutes the assistant answers from. Any other
+# `<name>.txt` in the corpus directory is indexed under its file name.
+DOCUMENTS = {
+    "constitution_1999": "Constitution of the Federal Republic of Nigeria, 1999",
+    "police_act_2020": "Police Act, 2020",
+    "lagos_tenancy_law_2011": "Tenancy Law of Lagos State, 2011",
+}
+
+
+@dataclass
+class Section:
+    """One addressable node of a statute: a section, or a subsection of a long one."""
+
+    id: str
+    document: str
+    number: str
+    text: str
+    subsection: str = ""
+    chapter: str = ""
+    part: str = ""
+    heading: str = ""
+    content_hash: str = ""
+    chapter_title: str = ""
+    part_title: str = ""
+
+    @property
+    def citation(self) -> str:
+        if not self.number:
+            return ""
+        cite = f"s. {self.number}" + (f"({self.subsection})" if self.subsection else "")
+        return f"{self.chapter}, {cite}" if "Schedule" in self.chapter else cite
+
+    @property
+    def index_text(self) -> str:
+        """Text the lexical index and embeddings see: the marginal heading plus the body."""
+        return f"{self.heading}\n{self.text}" if self.heading else self.text
+
+
+def corpus_version(sections: list[Section]) -> str:
+    """Hash over chunk ids and content hashes; changes whenever any chunk changes."""
+    digest = hashlib.sha256()
+    for section in sections:
+        digest.update(f"{section.id}\0{section.content_hash}\0".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def document_ranges(documents) -> dict[str, tuple[int, int]]:
+    """
+    Maps each document to the [start, end) range of section indexes it
+    occupies. Chunks are indexed file by file, so every statute is one
+    contiguous range.
+    """
+    ranges: dict[str, tuple[int, int]] = {}
+    for position, document in enumerate(documents):
+        start, end = ranges.get(document, (position, position))
+        if end != position:
+            raise ValueError(f"Sections of {document} are not contiguous")
+        ranges[document] = (start, position + 1)
+    return ranges
+
+
+def document_title(document: str) -> str:
+    return DOCUMENTS.get(document, document.replace("_", " ").title())
@@ -0,0 +1,82 @@
+import os
+import time
+from dotenv import load_dotenv
+
+import metrics
+from retrieval.ann import IVFIndex
+from retrieval.base import Passage
+from retrieval.bm25 import BM25Retriever, PostingsSearch
+
+
+load_dotenv()
+
+
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 50))
+RRF_K = int(os.getenv("RRF_K", 60))
+
+
+def reciprocal_rank_fusion(rankings: list[list[int]], k: int = RRF_K) -> list[tuple[int, float]]:
+    """
+    Fuses ranked lists of ids: each list adds 1 / (k + rank) to an id's score.
+    Only ranks are used, so BM25 and cosine scores need no calibration.
+    """
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever(BM25Retriever):
+    """
+    BM25 plus dense retrieval over the same sections, fused by rank.
+
+    BM25 catches exact terms and section numbers; the ANN index over section
+    embeddings catches paraphrases ("the police beat me" -> dignity of the
+    human person). Each side contributes its top `candidates`; `nprobe` on
+    the ANN index trades recall for latency.
+    """
+
+    def __init__(
+        self,
+        index: PostingsSearch,
+        ann: IVFIndex,
+        embedder,
+        candidates: int = HYBRID_CANDIDATES,
+        rrf_k: int = RRF_K,
+    ):
+        super().__init__(index)
+        self.ann = ann
+        self.embedder = embedder
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.version = f"hybrid-{index.corpus_version}-{embedder.model_id}"
+        self._lexical_latency = metrics.LatencyStats()
+        self._embed_latency = metrics.LatencyStats()
+
+    async def search(self, query: str, k: int, documents: list[str] | None = None) -> list[Passage]:
+        start = time.perf_counter()
+        depth = max(k, self.candidates)
+        ranges = self._ranges(documents)
+        lexical = [doc_id for doc_id, _ in self.index.search(query, depth, ranges)]
+        lexical_done = time.perf_counter()
+        self._lexical_latency.record(lexical_done - start)
+
+        vector = (await self.embedder.embed([query]))[0]
+        self._embed_latency.record(time.perf_counter() - lexical_done)
+        dense = [row for row, _ in self.ann.search(vector, depth, ranges=ranges)]
+
+        fused = reciprocal_rank_fusion([lexical, dense], self.rrf_k)[:k]
+        self._latency.record(time.perf_counter() - start)
+        return [self._passage(doc_id, score) for doc_id, score in fused]
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "retriever": "hybrid",
+            "candidates": self.candidates,
+            "rrf_k": self.rrf_k,
+            "lexical_latency": self._lexical_latency.snapshot(),
+            "embed_latency": self._embed_latency.snapshot(),
+            "ann": self.ann.stats(),
+        }
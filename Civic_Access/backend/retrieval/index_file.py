@@ -0,0 +1,320 @@
+"""On-disk retrieval index, opened with mmap."""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+from retrieval.ann import IVFIndex
+from retrieval.quantize import code_dtype, load_quantizer
+from retrieval.bm25 import BM25Index, PostingsSearch
+from retrieval.corpus import Section, document_ranges
+
+
+MAGIC = b"CIVICIDX"
+FORMAT_VERSION = 3
+
+# Little-endian: header (magic, format version, block count, file size, payload
+# CRC32, header CRC32), one (name, offset, length) entry per block, then the
+# blocks, each 8-byte aligned.
+_HEADER = struct.Struct("<8sHHIQII")
+_TOC_ENTRY = struct.Struct("<16sQQ")
+_ALIGN = 8
+
+
+class IndexFormatError(ValueError):
+    """The file is not a retrieval index this code can read, or it is corrupt."""
+
+
+def _pad(length: int) -> int:
+    return -length % _ALIGN
+
+
+def _blob(strings: list[str]) -> tuple[bytes, array]:
+    """Concatenates UTF-8 strings; returns (data, offsets) with len(strings) + 1 offsets."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array("Q", [0])
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+    return b"".join(encoded), offsets
+
+
+_KEY_FIELDS = (
+    "id",
+    "document",
+    "number",
+    "subsection",
+    "chapter",
+    "part",
+    "heading",
+    "content_hash",
+    "chapter_title",
+    "part_title",
+)
+
+
+def _section_key(section: Section) -> list[str]:
+    return [" ".join(str(getattr(section, name)).split()) for name in _KEY_FIELDS]
+
+
+def write_index(
+    path: str | os.PathLike,
+    index: BM25Index,
+    embeddings: np.ndarray | None = None,
+    embedding_model: str | None = None,
+    ann: IVFIndex | None = None,
+):
+    """
+    Writes `index` (and optional per-section embeddings with their IVF
+    lists) to `path` atomically.
+    """
+    if sys.byteorder != "little":
+        raise IndexFormatError("Index files can only be written on little-endian hosts")
+
+    terms = sorted(index.terms, key=index.terms.get)
+    term_data, term_offsets = _blob(terms)
+    key_data, key_offsets = _blob(["\t".join(_section_key(s)) for s in index.sections])
+    text_data, text_offsets = _blob([s.text for s in index.sections])
+
+    meta = {
+        "corpus_version": index.corpus_version,
+        "k1": index.k1,
+        "b": index.b,
+        "sections": len(index.sections),
+        "terms": len(terms),
+        "postings": len(index.doc_ids),
+        "built_at": time.time(),
+        "embedding_model": None,
+        "embedding_dim": 0,
+        "ann": None,
+        "documents": index.document_ranges,
+    }
+    blocks = [
+        ("terms", term_data),
+        ("term_offs", term_offsets.tobytes()),
+        ("df", index.df.tobytes()),
+        ("post_offs", index.offsets.tobytes()),
+        ("post_docs", index.doc_ids.tobytes()),
+        ("post_weights", index.weights.tobytes()),
+        ("lengths", index.lengths.tobytes()),
+        ("sec_keys", key_data),
+        ("sec_key_offs", key_offsets.tobytes()),
+        ("sec_text", text_data),
+        ("sec_text_offs", text_offsets.tobytes()),
+    ]
+    if embeddings is not None:
+        if embeddings.shape[0] != len(index.sections):
+            raise ValueError("Need exactly one embedding per section")
+        meta["embedding_model"] = embedding_model
+        meta["embedding_dim"] = int(embeddings.shape[1])
+        blocks.append(("embeddings", np.ascontiguousarray(embeddings, dtype="<f4").tobytes()))
+    if ann is not None:
+        if embeddings is None:
+            raise ValueError("An ANN index needs the embeddings it was built from")
+        meta["ann"] = {"nlist": ann.nlist, **ann.params, "quantizer": None}
+        blocks.append(("ivf_centroids", np.ascontiguousarray(ann.centroids, dtype="<f4").tobytes()))
+        blocks.append(("ivf_offs", np.asarray(ann.offsets, dtype="<u4").tobytes()))
+        blocks.append(("ivf_rows", np.asarray(ann.rows, dtype="<u4").tobytes()))
+        if ann.quantizer is not None:
+            meta["ann"]["quantizer"] = ann.quantizer.meta()
+            blocks.extend((name, np.ascontiguousarray(data).tobytes()) for name, data in ann.quantizer.blocks())
+            blocks.append(("q_codes", np.ascontiguousarray(ann.codes).tobytes()))
+    blocks.insert(0, ("meta", json.dumps(meta).encode("utf-8")))
+
+    payload_start = _HEADER.size + _TOC_ENTRY.size * len(blocks)
+    payload_start += _pad(payload_start)
+    toc, offset = [], payload_start
+    for name, data in blocks:
+        toc.append((name, offset, len(data)))
+        offset += len(data) + _pad(len(data))
+    file_size = offset
+
+    payload_crc = 0
+    for _, data in blocks:
+        payload_crc = zlib.crc32(data, payload_crc)
+        payload_crc = zlib.crc32(b"\0" * _pad(len(data)), payload_crc)
+
+    for name, _, _ in toc:
+        if len(name) > 16:
+            raise ValueError(f"Block name {name!r} is longer than 16 bytes")
+    toc_bytes = b"".join(_TOC_ENTRY.pack(name.encode("ascii"), off, length) for name, off, length in toc)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(blocks), file_size, payload_crc, 0)
+    header_crc = zlib.crc32(header + toc_bytes)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(blocks), file_size, payload_crc, header_crc)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(toc_bytes)
+        f.write(b"\0" * (payload_start - _HEADER.size - len(toc_bytes)))
+        for _, data in blocks:
+            f.write(data)
+            f.write(b"\0" * _pad(len(data)))
+        f.flush()
+        os.fsync(f.fileno())
+    # Workers that already mapped the old file keep reading it until they reopen.
+    os.replace(tmp, path)
+
+
+class MappedIndex(PostingsSearch):
+    """
+    Read-only BM25 index backed by an mmap of an index file.
+
+    Typed views over the mapping replace the in-memory arrays, so opening
+    costs one header check regardless of corpus size.
+    """
+
+    def __init__(self, path: str | os.PathLike, verify: bool = False):
+        if sys.byteorder != "little":
+            raise IndexFormatError("Index files can only be read on little-endian hosts")
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._blocks, self._payload_crc = self._read_header()
+            if verify:
+                self.verify()
+        except Exception:
+            self._mmap.close()
+            raise
+
+        self._view = memoryview(self._mmap)
+        self.meta = json.loads(bytes(self._block("meta")))
+        self.corpus_version = self.meta["corpus_version"]
+        self.k1 = self.meta["k1"]
+        self.b = self.meta["b"]
+        self.num_sections = self.meta["sections"]
+
+        self._terms = self._block("terms")
+        self._term_offsets = self._block("term_offs").cast("Q")
+        self.df = self._block("df").cast("I")
+        self.offsets = self._block("post_offs").cast("I")
+        self.doc_ids = self._block("post_docs").cast("I")
+        self.weights = self._block("post_weights").cast("f")
+        self.lengths = self._block("lengths").cast("I")
+        self._keys = self._block("sec_keys")
+        self._key_offsets = self._block("sec_key_offs").cast("Q")
+        self._text = self._block("sec_text")
+        self._text_offsets = self._block("sec_text_offs").cast("Q")
+        if "documents" in self.meta:
+            self.document_ranges = {d: tuple(r) for d, r in self.meta["documents"].items()}
+        else:  # files written before shard ranges were recorded
+            self.document_ranges = document_ranges(self.section(i).document for i in range(self.num_sections))
+
+        self.embedding_model = self.meta.get("embedding_model")
+        self.embeddings = None
+        self.ann = None
+        if "embeddings" in self._blocks:
+            self.embeddings = self._array("embeddings", "<f4").reshape(
+                self.num_sections, self.meta["embedding_dim"]
+            )
+        if "ivf_centroids" in self._blocks:
+            dim = self.meta["embedding_dim"]
+            quantizer = codes = None
+            if self.meta["ann"].get("quantizer"):
+                quantizer = load_quantizer(self.meta["ann"]["quantizer"], dim, self._array)
+                codes = self._array("q_codes", code_dtype(quantizer.kind)).reshape(self.num_sections, -1)
+            self.ann = IVFIndex(
+                self.embeddings,
+                self._array("ivf_centroids", "<f4").reshape(-1, dim),
+                self._array("ivf_offs", "<u4"),
+                self._array("ivf_rows", "<u4"),
+                params=self.meta["ann"],
+                quantizer=quantizer,
+                codes=codes,
+            )
+
+    def _read_header(self) -> tuple[dict, int]:
+        mm = self._mmap
+        if len(mm) < _HEADER.size:
+            raise IndexFormatError(f"{self.path}: too short to be an index file")
+        magic, version, _, count, file_size, payload_crc, header_crc = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise IndexFormatError(f"{self.path}: not a retrieval index file")
+        if version != FORMAT_VERSION:
+            raise IndexFormatError(
+                f"{self.path}: format version {version}, expected {FORMAT_VERSION}; rebuild the index"
+            )
+        toc_end = _HEADER.size + _TOC_ENTRY.size * count
+        if file_size != len(mm) or toc_end > len(mm):
+            raise IndexFormatError(f"{self.path}: truncated ({len(mm)} of {file_size} bytes)")
+
+        unsigned = _HEADER.pack(magic, version, 0, count, file_size, payload_crc, 0)
+        if zlib.crc32(unsigned + mm[_HEADER.size : toc_end]) != header_crc:
+            raise IndexFormatError(f"{self.path}: header checksum mismatch")
+
+        blocks = {}
+        for i in range(count):
+            name, offset, length = _TOC_ENTRY.unpack_from(mm, _HEADER.size + i * _TOC_ENTRY.size)
+            if offset + length > file_size:
+                raise IndexFormatError(f"{self.path}: block out of range")
+            blocks[name.rstrip(b"\0").decode("ascii")] = (offset, length)
+        return blocks, payload_crc
+
+    def verify(self):
+        """Checks the payload CRC32; reads the whole file."""
+        start = min(offset for offset, _ in self._blocks.values())
+        crc = 0
+        for position in range(start, len(self._mmap), 1 << 24):
+            crc = zlib.crc32(self._mmap[position : min(position + (1 << 24), len(self._mmap))], crc)
+        if crc != self._payload_crc:
+            raise IndexFormatError(f"{self.path}: payload checksum mismatch")
+
+    def drop_pages(self):
+        """Releases this process's resident pages of the file; they are read back on demand."""
+        if hasattr(mmap, "MADV_DONTNEED"):
+            self._mmap.madvise(mmap.MADV_DONTNEED)
+
+    def _block(self, name: str) -> memoryview:
+        offset, length = self._blocks[name]
+        return self._view[offset : offset + length]
+
+    def _array(self, name: str, dtype: str) -> np.ndarray:
+        offset, length = self._blocks[name]
+        return np.frombuffer(self._mmap, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=offset)
+
+    def term_id(self, term: str) -> int | None:
+        target = term.encode("utf-8")
+        terms, offsets = self._terms, self._term_offsets
+        lo, hi = 0, len(offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate = terms[offsets[mid] : offsets[mid + 1]].tobytes()
+            if candidate < target:
+                lo = mid + 1
+            elif candidate > target:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def section(self, doc_id: int) -> Section:
+        key = self._keys[self._key_offsets[doc_id] : self._key_offsets[doc_id + 1]]
+        fields = dict(zip(_KEY_FIELDS, key.tobytes().decode("utf-8").split("\t")))
+        text = self._text[self._text_offsets[doc_id] : self._text_offsets[doc_id + 1]]
+        return Section(text=text.tobytes().decode("utf-8"), **fields)
+
+    def stats(self) -> dict:
+        return {
+            "source": "mmap",
+            "path": self.path,
+            "sections": self.num_sections,
+            "terms": self.meta["terms"],
+            "postings": self.meta["postings"],
+            "file_bytes": len(self._mmap),
+            "embedding_model": self.embedding_model,
+            "ann": self.meta.get("ann"),
+        }
+
+
+def open_index(path: str | os.PathLike, verify: bool = False) -> MappedIndex:
+    return MappedIndex(path, verify=verify)
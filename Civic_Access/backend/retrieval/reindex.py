@@ -0,0 +1,97 @@
+import hashlib
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from retrieval.bm25 import BM25Index
+from retrieval.chunker import StatuteChunker
+from retrieval.corpus import Section
+
+
+@dataclass
+class ChangeSet:
+    added: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.added)} added, {len(self.changed)} changed, "
+            f"{len(self.removed)} removed, {self.unchanged} unchanged"
+        )
+
+
+def diff(old: list[Section], new: list[Section]) -> ChangeSet:
+    """Compares two chunkings of the corpus by chunk id and content hash."""
+    before = {s.id: s.content_hash for s in old}
+    changes = ChangeSet()
+    for section in new:
+        previous = before.pop(section.id, None)
+        if previous is None:
+            changes.added.append(section.id)
+        elif previous != section.content_hash:
+            changes.changed.append(section.id)
+        else:
+            changes.unchanged += 1
+    changes.removed = sorted(before)
+    return changes
+
+
+class CorpusIndexer:
+    """
+    Keeps the chunked corpus between rebuilds so a corpus edit costs only
+    what it touched.
+
+    Files whose size, mtime and content digest are unchanged keep their
+    chunks; changed files are re-chunked, and only chunks with new content
+    hashes are tokenized again when the BM25 index is rebuilt.
+    """
+
+    def __init__(self, corpus_dir: str | os.PathLike, max_chars: int, k1: float, b: float):
+        self.corpus_dir = Path(corpus_dir)
+        self.chunker = StatuteChunker(max_chars)
+        self.k1 = k1
+        self.b = b
+        self.sections: list[Section] = []
+        self.index: BM25Index | None = None
+        self._files: dict[str, tuple[float, int, str, list[Section]]] = {}
+        self._term_counts: dict[str, Counter] = {}
+
+    def refresh(self) -> ChangeSet:
+        """Re-reads changed corpus files; rebuilds the index if any chunk changed."""
+        sections = []
+        seen = set()
+        for path in sorted(self.corpus_dir.glob("*.txt")):
+            seen.add(path.name)
+            sections.extend(self._chunks(path))
+        for name in set(self._files) - seen:
+            del self._files[name]
+
+        changes = diff(self.sections, sections)
+        if self.index is None or not changes.empty:
+            live = {s.content_hash for s in sections}
+            self._term_counts = {h: c for h, c in self._term_counts.items() if h in live}
+            self.index = BM25Index(sections, self.k1, self.b, self._term_counts)
+            self.sections = sections
+        return changes
+
+    def _chunks(self, path: Path) -> list[Section]:
+        stat = path.stat()
+        cached = self._files.get(path.name)
+        if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+            return cached[3]
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if cached and cached[2] == digest:
+            chunks = cached[3]
+        else:
+            chunks = self.chunker.chunk(path.stem, data.decode("utf-8"))
+        self._files[path.name] = (stat.st_mtime, stat.st_size, digest, chunks)
+        return chunks
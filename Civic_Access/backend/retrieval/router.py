@@ -0,0 +1,243 @@
+"""Routes each query to the statutes (shards) likely to answer it."""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from dotenv import load_dotenv
+
+import numpy as np
+
+from retrieval.text import tokenize
+
+
+load_dotenv()
+
+
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", 0.45))
+ROUTER_RELATIVE_SHARE = float(os.getenv("ROUTER_RELATIVE_SHARE", 0.5))
+ROUTER_RULE_WEIGHT = float(os.getenv("ROUTER_RULE_WEIGHT", 1.0))
+
+_FEATURES = 1 << 14
+
+
+# (pattern, statutes): a match adds ROUTER_RULE_WEIGHT to each statute.
+# Police encounters also route to the Constitution's fundamental rights.
+KEYWORD_RULES = [
+    (
+        r"\b(police\w*|officers?|arrest\w*|detain\w*|detention|bail|custody|checkpoints?|"
+        r"station|warrants?|dpo|ipo|sars|brutality|handcuff\w*|interrogat\w*|suspects?)\b",
+        ("police_act_2020", "constitution_1999"),
+    ),
+    (
+        r"\b(landlords?|tenants?|tenancy|rent\w*|evict\w*|quit|lease\w*|premises|caution fee|"
+        r"agency fee|mesne|recovery of possession)\b",
+        ("lagos_tenancy_law_2011",),
+    ),
+    (
+        r"\b(constitution\w*|fundamental|freedom|dignity|liberty|privacy|vote|citizen\w*|"
+        r"discriminat\w*|religion|expression|assembly|torture)\b",
+        ("constitution_1999",),
+    ),
+]
+
+
+def _features(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """Hashed unigram and bigram counts, L2-normalized: (feature ids, values)."""
+    words = tokenize(text)
+    counts = Counter(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    hashed: Counter = Counter()
+    for feature, count in counts.items():
+        hashed[zlib.crc32(feature.encode("utf-8")) % _FEATURES] += count
+    ids = np.fromiter(hashed.keys(), dtype=np.int64, count=len(hashed))
+    values = np.fromiter(hashed.values(), dtype=np.float32, count=len(hashed))
+    return ids, values / np.linalg.norm(values)
+
+
+class LinearTopicModel:
+    """Multinomial logistic regression over hashed word features."""
+
+    def __init__(self, classes: list[str], weights: np.ndarray, bias: np.ndarray):
+        self.classes = list(classes)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.version = hashlib.sha256(
+            json.dumps(self.classes).encode("utf-8") + self.weights.tobytes() + self.bias.tobytes()
+        ).hexdigest()[:8]
+
+    @classmethod
+    def train(
+        cls,
+        texts: list[str],
+        labels: list[str],
+        epochs: int = 300,
+        learning_rate: float = 10.0,
+        l2: float = 1e-4,
+    ) -> "LinearTopicModel":
+        """
+        Full-batch gradient descent from zero weights, so the same examples
+        always give the same model. Classes are weighted by inverse
+        frequency; the Constitution has far more sections than the others.
+        """
+        classes = sorted(set(labels))
+        targets = np.array([classes.index(label) for label in labels])
+        rows, ids, values = [], [], []
+        for row, text in enumerate(texts):
+            feature_ids, feature_values = _features(text)
+            rows.append(np.full(len(feature_ids), row))
+            ids.append(feature_ids)
+            values.append(feature_values)
+        rows, ids, values = np.concatenate(rows), np.concatenate(ids), np.concatenate(values)
+
+        counts = np.bincount(targets, minlength=len(classes))
+        sample_weights = (len(targets) / (len(classes) * counts))[targets] / len(targets)
+        onehot = np.eye(len(classes), dtype=np.float32)[targets]
+        weights = np.zeros((_FEATURES, len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        for _ in range(epochs):
+            logits = np.stack(
+                [np.bincount(rows, weights[ids, c] * values, minlength=len(texts)) for c in range(len(classes))],
+                axis=1,
+            ) + bias
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            error = (probs - onehot) * sample_weights[:, None]
+            gradient = np.stack(
+                [np.bincount(ids, error[rows, c] * values, minlength=_FEATURES) for c in range(len(classes))],
+                axis=1,
+            )
+            weights -= learning_rate * (gradient + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+        return cls(classes, weights.T, bias)
+
+    def predict(self, text: str) -> dict[str, float]:
+        ids, values = _features(text)
+        logits = self.weights[:, ids] @ values + self.bias
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        return dict(zip(self.classes, probs.tolist()))
+
+    def save(self, path: str | os.PathLike):
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, classes=np.array(self.classes), weights=self.weights, bias=self.bias)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike) -> "LinearTopicModel":
+        with np.load(path) as data:
+            return cls([str(c) for c in data["classes"]], data["weights"], data["bias"])
+
+
+@dataclass
+class Route:
+    documents: list[str] | None
+    confidence: float
+    source: str
+
+
+class TopicRouter:
+    """
+    Picks the shards to search: every statute scoring at least
+    `relative_share` of the best one, or every shard (documents=None) when
+    the best one's share is below `min_confidence`.
+
+    Scores are the model's probabilities plus `rule_weight` per matching
+    keyword rule, normalized to sum to one. Short queries give the model
+    few features, so its probabilities stay soft; selecting relative to the
+    best statute, rather than by cumulative probability, still narrows them.
+    """
+
+    def __init__(
+        self,
+        model: LinearTopicModel | None = None,
+        rules=KEYWORD_RULES,
+        min_confidence: float = ROUTER_MIN_CONFIDENCE,
+        relative_share: float = ROUTER_RELATIVE_SHARE,
+        rule_weight: float = ROUTER_RULE_WEIGHT,
+    ):
+        self.model = model
+        self.rules = [(re.compile(pattern, re.IGNORECASE), documents) for pattern, documents in rules]
+        self.min_confidence = min_confidence
+        self.relative_share = relative_share
+        self.rule_weight = rule_weight
+        settings = json.dumps([rules, min_confidence, relative_share, rule_weight, model and model.version])
+        self.version = "r" + hashlib.sha256(settings.encode("utf-8")).hexdigest()[:8]
+
+    def route(self, query: str, shards: list[str]) -> Route:
+        scores = dict.fromkeys(shards, 0.0)
+        source = "rules"
+        if self.model is not None:
+            source = "model"
+            for document, probability in self.model.predict(query).items():
+                if document in scores:
+                    scores[document] = probability
+        for pattern, documents in self.rules:
+            if pattern.search(query):
+                source = "rules+model" if self.model is not None else "rules"
+                for document in documents:
+                    if document in scores:
+                        scores[document] += self.rule_weight
+
+        total = sum(scores.values())
+        if total <= 0:
+            return Route(None, 0.0, "fallback")
+        ranked = sorted(((score / total, document) for document, score in scores.items()), reverse=True)
+        if ranked[0][0] < self.min_confidence:
+            return Route(None, ranked[0][0], "fallback")
+
+        cutoff = ranked[0][0] * self.relative_share
+        chosen = [document for probability, document in ranked if probability >= cutoff]
+        if len(chosen) == len(shards):
+            return Route(None, ranked[0][0], source)
+        return Route(chosen, ranked[0][0], source)
+
+
+class RoutedRetriever:
+    """Wraps a BM25 or hybrid retriever; each query searches only its routed shards."""
+
+    def __init__(self, inner, router: TopicRouter):
+        self.inner = inner
+        self.index = inner.index
+        self.router = router
+        self.version = f"{inner.version}-{router.version}"
+        self._lock = threading.Lock()
+        self._queries = 0
+        self._fallbacks = 0
+        self._searched = 0
+        self._by_shard: Counter = Counter()
+
+    async def search(self, query: str, k: int) -> list:
+        ranges = self.index.document_ranges
+        route = self.router.route(query, list(ranges))
+        searched = self.index.num_sections
+        if route.documents is not None:
+            searched = sum(ranges[d][1] - ranges[d][0] for d in route.documents)
+        with self._lock:
+            self._queries += 1
+            self._searched += searched
+            if route.documents is None:
+                self._fallbacks += 1
+            self._by_shard.update(route.documents or ["*"])
+        return await self.inner.search(query, k, route.documents)
+
+    def stats(self) -> dict:
+        with self._lock:
+            routing = {
+                "queries": self._queries,
+                "fallback_rate": round(self._fallbacks / self._queries, 4) if self._queries else 0.0,
+                "avg_fraction_searched": (
+                    round(self._searched / (self._queries * self.index.num_sections), 4)
+                    if self._queries and self.index.num_sections
+                    else 0.0
+                ),
+                "by_shard": dict(self._by_shard),
+                "model": self.router.model.version if self.router.model else None,
+            }
+        return {**self.inner.stats(), "version": self.version, "routing": routing}
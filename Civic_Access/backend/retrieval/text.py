@@ -0,0 +1,20 @@
+import re
+import unicodedata
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    """
+    a an and are as at be been by can do does for from had has have he her his
+    how i if in into is it its me my of on or our she so such than that the
+    their them then there these they this to was we were what when where which
+    who will with would you your
+    """.split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased ASCII word tokens with stopwords removed; used for indexing and queries."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return [t for t in _WORD.findall(text.lower()) if t not in STOPWORDS]
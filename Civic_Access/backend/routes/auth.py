@@ -1,15 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel, EmailStr
 from datetime import datetime, timedelta
-from typing import Annotated
 import jwt
-import bcrypt
 import os
-import libsql
 from dotenv import load_dotenv
 
 
-from database import get_db
+from db_async import db
+from hashing import hash_password, needs_rehash, verify_password
 
 load_dotenv()
 
@@ -46,17 +45,6 @@ class TokenResponse(BaseModel):
     user: UserResponse
 
 
-def hash_password(password: str) -> str:
-    """Hash password using bcrypt"""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode(), salt).decode()
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hash"""
-    return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
-
-
 def create_access_token(user_id: int, email: str) -> str:
     """Create JWT token"""
     payload = {
@@ -68,19 +56,64 @@ def create_access_token(user_id: int, email: str) -> str:
     return token
 
 
+async def rehash_password(user_id: int, plain_password: str, old_hash: str):
+    """Re-hash a password at the current bcrypt cost after a successful login"""
+    try:
+        new_hash = await hash_password(plain_password)
+        await db.execute(
+            "UPDATE user SET password = ? WHERE id = ? AND password = ?",
+            [new_hash, user_id, old_hash],
+        )
+        print(f"Password hash upgraded for user {user_id}")
+    except Exception as e:
+        print(f"Password rehash skipped for user {user_id}: {e}")
+
+
+def decode_access_token(token: str) -> int:
+    """Validate a JWT and return the user id it was issued for"""
+    try:
+
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user_id: int = int(payload.get("sub"))
+        if user_id is None:
+            raise HTTPException(status_code=401, detail="Invalid token")
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Authentication error: {e}")
+    return user_id
+
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def current_user_id(credentials: HTTPAuthorizationCredentials | None = Depends(_bearer)) -> int:
+    """Dependency: the user id from the `Authorization: Bearer` token; 401 without one"""
+    if credentials is None:
+        raise HTTPException(
+            status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"}
+        )
+    return decode_access_token(credentials.credentials)
+
+
+def optional_user_id(credentials: HTTPAuthorizationCredentials | None = Depends(_bearer)) -> int | None:
+    """Dependency: like current_user_id, but None for anonymous requests"""
+    return decode_access_token(credentials.credentials) if credentials else None
+
+
 @router.post("/signup", status_code=status.HTTP_201_CREATED)
-async def signup(
-    data: SignUpRequest, conn: Annotated[libsql.Connection, Depends(get_db)]
-):
+async def signup(data: SignUpRequest):
     """Register a new user using direct SQL"""
     print(f" Signup request for: {data.email}")
 
     try:
 
         print("Checking if user exists...")
-        existing_user = conn.execute(
+        existing_user = await db.fetchone(
             "SELECT id FROM user WHERE email = ?", [data.email]
-        ).fetchone()
+        )
 
         if existing_user:
             print(f" User already exists: {data.email}")
@@ -90,14 +123,13 @@ async def signup(
             )
 
         print("Hashing password...")
-        hashed_password = hash_password(data.password)
+        hashed_password = await hash_password(data.password)
 
         print("Creating new user...")
-        conn.execute(
+        await db.execute(
             "INSERT INTO user (email, password) VALUES (?, ?)",
             [data.email, hashed_password],
         )
-        conn.commit()
 
         print(f"User created: {data.email}")
         return {
@@ -114,46 +146,38 @@ async def signup(
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(
-    data: LoginRequest, conn: Annotated[libsql.Connection, Depends(get_db)]
-):
+async def login(data: LoginRequest, background_tasks: BackgroundTasks):
     """Login user and return token"""
     print(f" Login request for: {data.email}")
 
     try:
 
         print("Finding user...")
-        user_row = conn.execute(
+        user = await db.fetchone(
             "SELECT id, email, password, created_at FROM user WHERE email = ?",
             [data.email],
-        ).fetchone()
+        )
 
-        if not user_row:
+        if not user:
             print(f"User not found: {data.email}")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password",
             )
 
-        if isinstance(user_row, dict):
-            user = user_row
-        else:
-
-            user = {
-                "id": user_row[0],
-                "email": user_row[1],
-                "password": user_row[2],
-                "created_at": user_row[3],
-            }
-
         print("Verifying password...")
-        if not verify_password(data.password, user["password"]):
+        if not await verify_password(data.password, user["password"]):
             print(f" Password incorrect for: {data.email}")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password",
             )
 
+        if needs_rehash(user["password"]):
+            background_tasks.add_task(
+                rehash_password, user["id"], data.password, user["password"]
+            )
+
         print("Creating token...")
         access_token = create_access_token(user["id"], user["email"])
 
@@ -172,35 +196,17 @@ async def login(
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(
-    token: str, conn: Annotated[libsql.Connection, Depends(get_db)]
-):
+async def get_current_user(token: str):
     """Get current user from token"""
     print(f"Getting current user...")
 
-    try:
+    user_id = decode_access_token(token)
 
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = int(payload.get("sub"))
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    except Exception as e:
-        raise HTTPException(status_code=401, detail=f"Authentication error: {e}")
-
-    user_row = conn.execute(
+    user = await db.fetchone(
         "SELECT id, email, created_at FROM user WHERE id = ?", [user_id]
-    ).fetchone()
+    )
 
-    if user_row is None:
+    if user is None:
         raise HTTPException(status_code=401, detail="User not found")
 
-    if isinstance(user_row, dict):
-        user = user_row
-    else:
-        user = {"id": user_row[0], "email": user_row[1], "created_at": user_row[2]}
-
     return UserResponse(**user)
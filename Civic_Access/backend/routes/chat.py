@@ -0,0 +1,96 @@
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+
+from pipeline import chat_pipeline
+from routes.auth import optional_user_id
+
+
+router = APIRouter(tags=["chat"])
+
+
+SUPPORTED_LANGUAGES = {"english", "hausa", "igbo", "yoruba", "pidgin"}
+
+
+class ChatRequest(BaseModel):
+    message: str = Field(min_length=1, max_length=4000)
+    language: str = "english"
+    stream: bool = False
+
+    @field_validator("message")
+    @classmethod
+    def message_not_blank(cls, value: str) -> str:
+        value = value.strip()
+        if not value:
+            raise ValueError("Message must not be blank")
+        return value
+
+
+class ChatResponse(BaseModel):
+    response: str
+    interaction_id: int | None = None
+    debug_info: dict
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_chat(message: str, language: str, user_id: int | None):
+    try:
+        async for event, data in chat_pipeline.run_stream(message, language, user_id):
+            yield sse_event(event, data)
+    except Exception as e:
+        print(f"Chat stream error: {str(e)}")
+        detail = e.detail if isinstance(e, HTTPException) else "An internal server error occurred."
+        yield sse_event("error", {"detail": detail})
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(data: ChatRequest, request: Request, user_id: int | None = Depends(optional_user_id)):
+    """
+    Answer a legal question in the user's language.
+
+    Send `"stream": true` (or `Accept: text/event-stream`) to receive
+    server-sent events instead: translated_query, citations, token..., done.
+    With a bearer token the interaction is saved under that user, who can
+    then read its grade.
+    """
+    language = data.language.lower()
+    if language not in SUPPORTED_LANGUAGES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported language: {data.language}",
+        )
+
+    if data.stream or "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            stream_chat(data.message, language, user_id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    try:
+        turn = await chat_pipeline.run(data.message, language, user_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Chat error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An internal server error occurred.",
+        )
+
+    return ChatResponse(
+        response=turn.reply,
+        interaction_id=turn.interaction_id,
+        debug_info={
+            "translated_query": turn.translated_query,
+            "citations": turn.citations(),
+            "cache": turn.cache,
+            "coalesced": turn.coalesced,
+            "timings_ms": turn.timings,
+        },
+    )
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from grades import GRADE_MAX_WAIT, grade_notifier
+from routes.auth import current_user_id
+
+
+router = APIRouter(prefix="/interactions", tags=["interactions"])
+
+
+@router.get("/{interaction_id}/grade")
+async def get_grade(
+    interaction_id: int,
+    wait: float = Query(0, ge=0),
+    user_id: int = Depends(current_user_id),
+):
+    """
+    Get the judge grade for one of the caller's interactions.
+
+    With `wait` > 0 the request is held open (up to GRADE_MAX_WAIT seconds)
+    until the interaction is graded, so clients need one request per grade
+    instead of polling. Interactions belonging to someone else (or to no
+    one) are reported as not found.
+    """
+    grade = await grade_notifier.wait(interaction_id, min(wait, GRADE_MAX_WAIT), user_id)
+    if grade is None:
+        raise HTTPException(status_code=404, detail="Interaction not found")
+    return grade
@@ -0,0 +1,29 @@
+import time
+
+from fastapi import APIRouter, Query
+
+from retrieval import get_retriever
+
+
+router = APIRouter(tags=["search"])
+
+
+@router.get("/search")
+async def search(q: str = Query(min_length=1, max_length=500), k: int = Query(5, ge=1, le=50)):
+    """
+    Search the legal corpus directly, without going through the LLM.
+
+    Returns the best-matching sections with their retrieval scores and text.
+    """
+    retriever = get_retriever()
+    start = time.perf_counter()
+    passages = await retriever.search(q, k)
+    return {
+        "query": q,
+        "corpus_version": retriever.version,
+        "took_ms": round((time.perf_counter() - start) * 1000, 3),
+        "results": [
+            {"id": p.id, "source": p.source, "score": round(p.score, 4), "text": p.text}
+            for p in passages
+        ],
+    }
@@ -0,0 +1,187 @@
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+
+from grades import grade_notifier
+from pipeline import chat_pipeline
+from realtime import UserChannel, hub
+from routes.auth import decode_access_token
+from routes.chat import SUPPORTED_LANGUAGES
+
+
+load_dotenv()
+
+router = APIRouter(tags=["websocket"])
+
+
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", 20))
+WS_GRADE_WAIT = float(os.getenv("WS_GRADE_WAIT", 600))
+
+
+async def send(channel: UserChannel, websocket: WebSocket, message: dict):
+    async with channel.send_lock:
+        await websocket.send_json(message)
+
+
+async def run_chat(channel: UserChannel, request_id, message: str, language: str):
+    """Streams one chat turn over the channel, then pushes its grade when ready"""
+    interaction_id = None
+    try:
+        async for event, data in chat_pipeline.run_stream(message, language, channel.user_id):
+            if event == "done":
+                interaction_id = data["interaction_id"]
+            await channel.publish(event, data, request_id)
+    except Exception as e:
+        print(f"WebSocket chat error: {str(e)}")
+        detail = e.detail if isinstance(e, HTTPException) else "An internal server error occurred."
+        await channel.publish("error", {"detail": detail}, request_id)
+        return
+
+    if interaction_id is None:
+        return
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + WS_GRADE_WAIT
+    while (remaining := deadline - loop.time()) > 0:
+        grade = await grade_notifier.wait(interaction_id, min(remaining, 60))
+        if grade and grade["status"] in ("graded", "failed"):
+            await channel.publish("grade", grade, request_id)
+            return
+
+
+async def heartbeat(channel: UserChannel, websocket: WebSocket):
+    while True:
+        await asyncio.sleep(WS_HEARTBEAT_INTERVAL)
+        await send(channel, websocket, {"type": "ping", "id": None, "data": {}})
+
+
+async def handle(channel: UserChannel, websocket: WebSocket, message):
+    if not isinstance(message, dict):
+        await send(
+            channel,
+            websocket,
+            {"type": "error", "id": None, "data": {"detail": "Messages must be JSON objects"}},
+        )
+        return
+
+    kind = message.get("type")
+    request_id = message.get("id")
+
+    if kind == "ping":
+        await send(channel, websocket, {"type": "pong", "id": request_id, "data": {}})
+    elif kind == "pong":
+        pass
+    elif kind == "chat":
+        language = str(message.get("language", "english")).lower()
+        text = str(message.get("message", "")).strip()
+        if language not in SUPPORTED_LANGUAGES or not text:
+            await send(
+                channel,
+                websocket,
+                {"type": "error", "id": request_id, "data": {"detail": "Invalid chat message"}},
+            )
+            return
+
+        retry_after = channel.rate_limit.take()
+        if retry_after:
+            await send(
+                channel,
+                websocket,
+                {
+                    "type": "rate_limited",
+                    "id": request_id,
+                    "data": {"retry_after": round(retry_after, 1)},
+                },
+            )
+            return
+        channel.spawn(run_chat(channel, request_id, text, language))
+    else:
+        await send(
+            channel,
+            websocket,
+            {"type": "error", "id": request_id, "data": {"detail": f"Unknown message type: {kind}"}},
+        )
+
+
+@router.websocket("/ws")
+async def user_socket(
+    websocket: WebSocket,
+    token: str,
+    last_event_id: int | None = None,
+    session: str | None = None,
+):
+    """
+    One authenticated connection per user for chat, streamed answers and grades.
+
+    Reconnect with `session` and `last_event_id` from the previous connection
+    to receive the events published while disconnected.
+    """
+    try:
+        user_id = decode_access_token(token)
+    except HTTPException as e:
+        await websocket.close(code=4401, reason=str(e.detail))
+        return
+
+    await websocket.accept()
+    channel = hub.channel(user_id)
+
+    resumed = session == channel.session and last_event_id is not None
+    await send(
+        channel,
+        websocket,
+        {
+            "type": "hello",
+            "id": None,
+            "data": {
+                "session": channel.session,
+                "last_event_id": channel.last_event_id,
+                "heartbeat_interval": WS_HEARTBEAT_INTERVAL,
+                "resumed": resumed,
+            },
+        },
+    )
+
+    # Replay until caught up, then attach without awaiting in between so no
+    # live event can slip past between the last replayed one and the attach.
+    sent = last_event_id if resumed else channel.last_event_id
+    if resumed:
+        _, complete = channel.replay_after(sent)
+        if not complete:
+            await send(
+                channel,
+                websocket,
+                {"type": "replay_gap", "id": None, "data": {"oldest_available": channel.oldest_event_id}},
+            )
+    while True:
+        missed, _ = channel.replay_after(sent)
+        if not missed:
+            break
+        for event in missed:
+            await send(channel, websocket, event)
+            sent = event["event_id"]
+    hub.attach(channel, websocket, sent)
+
+    beats = asyncio.get_running_loop().create_task(heartbeat(channel, websocket))
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    websocket.receive_json(), timeout=WS_HEARTBEAT_INTERVAL * 3
+                )
+            except asyncio.TimeoutError:
+                await websocket.close(code=1001, reason="Heartbeat timeout")
+                break
+            except ValueError:
+                await send(
+                    channel,
+                    websocket,
+                    {"type": "error", "id": None, "data": {"detail": "Messages must be JSON"}},
+                )
+                continue
+            await handle(channel, websocket, message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        beats.cancel()
+        hub.detach(channel, websocket)
@@ -0,0 +1,305 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from dotenv import load_dotenv
+
+import numpy as np
+
+import metrics
+from db_async import db
+from embedding_store import get_embedder
+from providers import EmbeddingProvider
+
+
+load_dotenv()
+
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.88))
+SEMANTIC_CACHE_MIN_SCORE = int(os.getenv("SEMANTIC_CACHE_MIN_SCORE", 4))
+SEMANTIC_CACHE_REFRESH = float(os.getenv("SEMANTIC_CACHE_REFRESH", 30))
+SEMANTIC_LSH_TABLES = int(os.getenv("SEMANTIC_LSH_TABLES", 12))
+SEMANTIC_LSH_BITS = int(os.getenv("SEMANTIC_LSH_BITS", 8))
+SEMANTIC_RERANK = int(os.getenv("SEMANTIC_RERANK", 3))
+
+_PAGE_SIZE = 2000
+_EMBED_BATCH = 256
+# Largest cosine error int8 codes are allowed to hide before the exact re-rank.
+_INT8_MARGIN = 0.05
+
+
+class LSHIndex:
+    """
+    Approximate cosine nearest neighbour over unit vectors.
+
+    Each of `tables` hash tables buckets a vector by which side of `bits`
+    random hyperplanes it falls on, so close vectors usually share at least
+    one bucket. Candidates from the query's buckets are then scored against
+    int8 codes (one byte per dimension plus a per-vector scale), a quarter
+    of the memory of float32 vectors.
+    """
+
+    def __init__(self, dim: int, tables: int = 12, bits: int = 8, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((tables, bits, dim)).astype(np.float32)
+        self._weights = 1 << np.arange(bits)
+        self._buckets = [{} for _ in range(tables)]
+        self._codes = np.empty((64, dim), dtype=np.int8)
+        self._scales = np.empty(64, dtype=np.float32)
+        self.ids: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, ids: list[int], vectors: np.ndarray):
+        start = len(self.ids)
+        needed = start + len(ids)
+        if needed > len(self._codes):
+            size = max(needed, 2 * len(self._codes))
+            codes = np.empty((size, self._codes.shape[1]), np.int8)
+            codes[:start] = self._codes[:start]
+            scales = np.empty(size, np.float32)
+            scales[:start] = self._scales[:start]
+            self._codes, self._scales = codes, scales
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        self._codes[start:needed] = np.rint(vectors / scales[:, None]).astype(np.int8)
+        self._scales[start:needed] = scales
+        self.ids.extend(ids)
+
+        for offset, buckets in enumerate(self._hashes(vectors)):
+            for table, bucket in zip(self._buckets, buckets.tolist()):
+                table.setdefault(bucket, []).append(start + offset)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.ids) * (self._codes.shape[1] + 4)
+
+    def search(self, vector: np.ndarray, n: int = 1) -> list[tuple[int, float]]:
+        """Returns up to `n` (id, approximate cosine similarity) pairs, best first."""
+        buckets = self._hashes(vector[None, :])[0].tolist()
+        candidates = set()
+        for table, bucket in zip(self._buckets, buckets):
+            candidates.update(table.get(bucket, ()))
+        if not candidates:
+            return []
+        positions = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarities = (self._codes[positions] @ vector) * self._scales[positions]
+        best = np.argsort(-similarities, kind="stable")[:n]
+        return [(self.ids[positions[i]], float(similarities[i])) for i in best]
+
+    def _hashes(self, vectors: np.ndarray) -> np.ndarray:
+        bits = np.einsum("tbd,nd->ntb", self.planes, vectors) > 0
+        return bits.astype(np.int64) @ self._weights
+
+
+@dataclass
+class SemanticHit:
+    interaction_id: int
+    similarity: float
+    judge_score: int
+    translated_query: str
+    passages: list[dict]
+    reply: str
+
+
+class _LanguageStats:
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.similarity_sum = 0.0
+        self.score_sum = 0
+
+    def snapshot(self, index: "LSHIndex | None") -> dict:
+        return {
+            "entries": len(index) if index else 0,
+            "vector_bytes": index.nbytes if index else 0,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "avg_similarity": round(self.similarity_sum / self.hits, 4) if self.hits else None,
+            "avg_judge_score": round(self.score_sum / self.hits, 3) if self.hits else None,
+        }
+
+
+class SemanticCache:
+    """
+    Serves a past answer when a new question is close enough to one already
+    answered well.
+
+    Only graded model answers (not ones served from a cache) with
+    `judge_score >= min_score` generated under the current answer version
+    are indexed, one LSH index per target language. The index refreshes in
+    the background every `refresh` seconds, reading only rows graded since
+    the last pass.
+    """
+
+    def __init__(
+        self,
+        embedder: EmbeddingProvider | None = None,
+        threshold: float = 0.88,
+        min_score: int = 4,
+        refresh: float = 30.0,
+        tables: int = 12,
+        bits: int = 8,
+        rerank: int = 3,
+    ):
+        self._embedder = embedder
+        self.threshold = threshold
+        self.min_score = min_score
+        self.refresh_interval = refresh
+        self.tables = tables
+        self.bits = bits
+        self.rerank = max(1, rerank)
+        self._version = None
+        self._reset()
+        self._refresh_task = None
+        self._refreshed_at = 0.0
+        self._refreshes = 0
+        self._stats: dict[str, _LanguageStats] = {}
+
+    @property
+    def embedder(self) -> EmbeddingProvider:
+        if self._embedder is None:
+            self._embedder = get_embedder()
+        return self._embedder
+
+    async def lookup(self, translated_query: str, language: str, version: str) -> SemanticHit | None:
+        self._check_version(version)
+        self._maybe_refresh()
+
+        stats = self._stats.setdefault(language, _LanguageStats())
+        stats.lookups += 1
+        # A version change while the embedder runs swaps in fresh dicts; keep
+        # answering from the ones this lookup started with.
+        answers, indexes = self._answers, self._indexes
+        index = indexes.get(language)
+        if not index:
+            return None
+
+        vector = (await self.embedder.embed([translated_query]))[0]
+        found = index.search(vector, self.rerank)
+        if not found or found[0][1] < self.threshold - _INT8_MARGIN:
+            return None
+
+        # Exact re-rank of the shortlist; the embedding store already holds these vectors.
+        exact = await self.embedder.embed([answers[i][1] for i, _ in found]) @ vector
+        best = int(np.argmax(exact))
+        interaction_id, similarity = found[best][0], float(exact[best])
+        if similarity < self.threshold:
+            return None
+        judge_score, cached_query, rag_context, reply = answers[interaction_id]
+        stats.hits += 1
+        stats.similarity_sum += similarity
+        stats.score_sum += judge_score
+        return SemanticHit(
+            interaction_id=interaction_id,
+            similarity=round(similarity, 4),
+            judge_score=judge_score,
+            translated_query=cached_query,
+            passages=json.loads(rag_context or "[]"),
+            reply=reply,
+        )
+
+    async def refresh(self):
+        """Indexes interactions graded since the last refresh."""
+        version = self._version
+        # Everything below the oldest unsettled row is final before the scan
+        # starts, so the scan is guaranteed to see it.
+        row = await db.fetchone(
+            "SELECT MIN(id) AS id FROM interactions WHERE status IN ('pending', 'judging')"
+        )
+        if row["id"] is None:
+            row = await db.fetchone("SELECT COALESCE(MAX(id), 0) + 1 AS id FROM interactions")
+        next_floor = row["id"] - 1
+
+        cursor = self._floor
+        while True:
+            rows = await db.fetchall(
+                "SELECT id, target_lang, translated_query, rag_context, model_reply, judge_score "
+                "FROM interactions WHERE status = 'graded' AND id > ? AND judge_score >= ? "
+                "AND answer_version = ? AND source = 'model' AND translated_query IS NOT NULL "
+                "ORDER BY id LIMIT ?",
+                [cursor, self.min_score, version, _PAGE_SIZE],
+            )
+            if version != self._version:
+                return
+            await self._add([r for r in rows if r["id"] not in self._answers])
+            if len(rows) < _PAGE_SIZE:
+                break
+            cursor = rows[-1]["id"]
+
+        self._floor = max(self._floor, next_floor)
+        self._refreshes += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._answers),
+            "refreshes": self._refreshes,
+            "by_language": {
+                language: stats.snapshot(self._indexes.get(language))
+                for language, stats in self._stats.items()
+            },
+        }
+
+    def _reset(self):
+        self._indexes: dict[str, LSHIndex] = {}
+        self._answers: dict[int, tuple] = {}
+        self._floor = 0
+
+    def _check_version(self, version: str):
+        if version != self._version:
+            if self._version is not None:
+                print(f"Answer version changed to {version}, rebuilding semantic cache")
+            self._version = version
+            self._reset()
+            self._refreshed_at = 0.0
+
+    def _maybe_refresh(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        if time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        self._refreshed_at = time.monotonic()
+        self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_logged())
+
+    async def _refresh_logged(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            print(f"--- Semantic cache refresh failed: {e} ---")
+
+    async def _add(self, rows: list[dict]):
+        for start in range(0, len(rows), _EMBED_BATCH):
+            batch = rows[start : start + _EMBED_BATCH]
+            vectors = await self.embedder.embed([r["translated_query"] for r in batch])
+            by_language = {}
+            for position, r in enumerate(batch):
+                self._answers[r["id"]] = (
+                    r["judge_score"],
+                    r["translated_query"],
+                    r["rag_context"],
+                    r["model_reply"],
+                )
+                by_language.setdefault(r["target_lang"] or "", []).append(position)
+            for language, positions in by_language.items():
+                index = self._indexes.get(language)
+                if index is None:
+                    index = self._indexes[language] = LSHIndex(
+                        self.embedder.dim, self.tables, self.bits
+                    )
+                index.add([batch[p]["id"] for p in positions], vectors[positions])
+
+
+semantic_cache = None
+if SEMANTIC_CACHE_ENABLED:
+    semantic_cache = SemanticCache(
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        min_score=SEMANTIC_CACHE_MIN_SCORE,
+        refresh=SEMANTIC_CACHE_REFRESH,
+        tables=SEMANTIC_LSH_TABLES,
+        bits=SEMANTIC_LSH_BITS,
+        rerank=SEMANTIC_RERANK,
+    )
+    metrics.register("semantic_cache", semantic_cache.stats)
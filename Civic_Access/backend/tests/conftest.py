@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other by bare name (`import metrics`), as
+# they do when the app is started from this directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+CONSTITUTION = """CONSTITUTION OF THE FEDERAL REPUBLIC OF NIGERIA, 1999
+CHAPTER IV
+FUNDAMENTAL RIGHTS
+Right to life
+33. (1) Every person has a right to life, and no one shall be deprived intentionally of his life.
+(2) A person shall not be regarded as having been deprived of his life in contravention of this section.
+Right to dignity of human person
+34. (1) Every individual is entitled to respect for the dignity of his person.
+Right to personal liberty
+35. (1) Every person shall be entitled to his personal liberty.
+(4) Any person who is arrested or detained shall be brought before a court of law within a reasonable time.
+FIRST SCHEDULE
+States of the Federation
+1. Abia State
+"""
+
+TENANCY = """LAGOS STATE TENANCY LAW, 2011
+PART I
+Rent in advance
+4. (1) It shall be unlawful for a landlord to demand or receive rent in advance in excess of one year.
+Notice to quit
+13. (1) Where there is no stipulation as to the notice to be given, a tenant shall be given notice to quit.
+"""
+
+
+@pytest.fixture
+def corpus_dir(tmp_path):
+    """Two small statutes in the layout `load_corpus` reads."""
+    directory = tmp_path / "corpus"
+    directory.mkdir()
+    (directory / "constitution_1999.txt").write_text(CONSTITUTION, encoding="utf-8")
+    (directory / "lagos_tenancy_law_2011.txt").write_text(TENANCY, encoding="utf-8")
+    return directory
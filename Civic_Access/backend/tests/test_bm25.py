@@ -0,0 +1,34 @@
+import pytest
+
+from retrieval.bm25 import BM25Index, BM25Retriever
+from retrieval.chunker import load_corpus
+
+
+@pytest.fixture
+def index(corpus_dir):
+    return BM25Index(load_corpus(corpus_dir, max_chars=120))
+
+
+def top_ids(index, query, k=3, documents=None):
+    return [p.id for p in BM25Retriever(index).search_now(query, k, documents)]
+
+
+def test_matching_section_ranks_first(index):
+    assert top_ids(index, "arrested and detained, brought before a court")[0] == "constitution_1999:s35(4)"
+    assert top_ids(index, "landlord rent in advance")[0] == "lagos_tenancy_law_2011:s4"
+
+
+def test_scores_are_best_first_and_skip_unmatched_sections(index):
+    hits = index.search("notice to quit", 10)
+
+    scores = [score for _, score in hits]
+    assert scores == sorted(scores, reverse=True)
+    assert all(score > 0 for score in scores)
+    assert index.search("zzzunknownterm", 10) == []
+
+
+def test_document_filter_searches_only_those_statutes(index):
+    found = top_ids(index, "person notice rent life", k=10, documents=["lagos_tenancy_law_2011"])
+
+    assert found
+    assert all(chunk_id.startswith("lagos_tenancy_law_2011:") for chunk_id in found)
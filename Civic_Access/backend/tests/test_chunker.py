@@ -0,0 +1,126 @@
+from conftest import CONSTITUTION
+from retrieval.chunker import StatuteChunker, load_corpus
+
+
+def ids(sections):
+    return [s.id.split(":", 1)[1] for s in sections]
+
+
+def test_short_sections_are_one_chunk_each():
+    sections = StatuteChunker(2000).chunk("constitution_1999", CONSTITUTION)
+
+    assert ids(sections) == ["preamble", "s33", "s34", "s35", "sch1:s1"]
+    s35 = sections[3]
+    assert s35.heading == "Right to personal liberty"
+    assert s35.chapter == "Chapter IV"
+    assert s35.citation == "s. 35"
+
+
+def test_long_sections_split_at_subsections():
+    sections = StatuteChunker(120).chunk("constitution_1999", CONSTITUTION)
+
+    assert ids(sections) == ["preamble", "s33(1)", "s33(2)", "s34", "s35(1)", "s35(4)", "sch1:s1"]
+    s35_4 = sections[5]
+    assert s35_4.subsection == "4"
+    assert s35_4.citation == "s. 35(4)"
+    assert s35_4.heading == "Right to personal liberty"
+
+
+def test_schedule_sections_cite_the_schedule():
+    schedule = StatuteChunker(2000).chunk("constitution_1999", CONSTITUTION)[-1]
+
+    assert schedule.id == "constitution_1999:sch1:s1"
+    assert schedule.chapter == "First Schedule"
+    assert schedule.citation == "First Schedule, s. 1"
+
+
+def test_editing_a_section_changes_only_its_hash():
+    before = StatuteChunker(120).chunk("constitution_1999", CONSTITUTION)
+    edited = CONSTITUTION.replace("within a reasonable time", "within 24 hours")
+    after = StatuteChunker(120).chunk("constitution_1999", edited)
+
+    assert ids(before) == ids(after)
+    changed = [b.id for b, a in zip(before, after) if b.content_hash != a.content_hash]
+    assert changed == ["constitution_1999:s35(4)"]
+
+
+def test_load_corpus_reads_statutes_in_name_order(corpus_dir):
+    sections = load_corpus(corpus_dir)
+
+    assert [s.document for s in sections] == ["constitution_1999"] * 5 + ["lagos_tenancy_law_2011"] * 3
+    assert sections[-1].id == "lagos_tenancy_law_2011:s13"
+
+
+# Shape of the published text: title, arrangement of sections, preamble, then
+# the body, with mixed-case part headings and a chapter title under each chapter.
+CONSTITUTION_WITH_CONTENTS = """CONSTITUTION OF THE FEDERAL REPUBLIC OF NIGERIA 1999
+ARRANGEMENT OF SECTIONS
+Section
+CHAPTER I
+GENERAL PROVISIONS
+Part I
+Federal Republic of Nigeria
+1. Supremacy of constitution.
+2. The Federal Republic of Nigeria.
+CHAPTER IV
+FUNDAMENTAL RIGHTS
+33. Right to life.
+35. Right to personal liberty.
+SCHEDULES
+First Schedule
+Part I – States of the Federation
+We the people of the Federal Republic of Nigeria
+Having firmly and solemnly resolved, to live in unity and harmony as one indivisible and indissoluble sovereign nation under God.
+Do hereby make, enact and give to ourselves the following Constitution:-
+CHAPTER I
+GENERAL PROVISIONS
+Part I
+Federal Republic of Nigeria
+Supremacy of constitution
+1. (1) This Constitution is supreme and its provisions shall have binding force on the authorities and persons throughout the Federal Republic of Nigeria.
+(2) The Federal Republic of Nigeria shall not be governed except in accordance with the provisions of this Constitution.
+The Federal Republic of Nigeria
+2. (1) Nigeria is one indivisible and indissoluble sovereign state to be known by the name of the Federal Republic of Nigeria.
+CHAPTER IV
+FUNDAMENTAL RIGHTS
+Right to life
+33. (1) Every person has a right to life, and no one shall be deprived intentionally of his life.
+Right to personal liberty
+35. (1) Every person shall be entitled to his personal liberty and no person shall be deprived of such liberty save in accordance with a procedure permitted by law.
+(4) Any person who is arrested or detained shall be brought before a court of law within a reasonable time.
+FIRST SCHEDULE
+PART I
+STATES OF THE FEDERATION
+1. Abia State
+"""
+
+
+def test_arrangement_of_sections_stays_in_the_preamble():
+    sections = StatuteChunker(2000).chunk("constitution_1999", CONSTITUTION_WITH_CONTENTS)
+
+    assert ids(sections) == ["preamble", "s1", "s2", "s33", "s35", "sch1:s1"]
+    preamble = sections[0].text
+    assert "35. Right to personal liberty." in preamble
+    assert "We the people" in preamble and "GENERAL PROVISIONS" not in preamble.split("We the people")[1]
+
+
+def test_sections_carry_their_chapter_and_part_titles():
+    by_id = {s.id: s for s in StatuteChunker(2000).chunk("constitution_1999", CONSTITUTION_WITH_CONTENTS)}
+
+    s1 = by_id["constitution_1999:s1"]
+    assert (s1.chapter, s1.chapter_title) == ("Chapter I", "GENERAL PROVISIONS")
+    assert (s1.part, s1.part_title, s1.heading) == ("Part I", "Federal Republic of Nigeria", "Supremacy of constitution")
+    s35 = by_id["constitution_1999:s35"]
+    assert (s35.chapter, s35.chapter_title, s35.part) == ("Chapter IV", "FUNDAMENTAL RIGHTS", "")
+    assert s35.heading == "Right to personal liberty"
+    schedule = by_id["constitution_1999:sch1:s1"]
+    assert (schedule.chapter, schedule.part_title) == ("First Schedule", "STATES OF THE FEDERATION")
+
+
+def test_schedule_without_sections_is_one_chunk():
+    text = CONSTITUTION + "SEVENTH SCHEDULE\nOaths\nI, ..., do solemnly swear that I will be faithful and bear true allegiance.\n"
+    sections = StatuteChunker(2000).chunk("constitution_1999", text)
+
+    assert ids(sections)[-1] == "sch2"
+    assert sections[-1].chapter_title == "Oaths"
+    assert sections[-1].text.startswith("I, ..., do solemnly swear")
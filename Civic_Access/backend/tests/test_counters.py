@@ -0,0 +1,32 @@
+import sqlite3
+
+import migrate
+
+
+def counters(conn):
+    rows = conn.execute("SELECT status, target_lang, count FROM interaction_counters WHERE count != 0")
+    return sorted(rows.fetchall())
+
+
+def actual(conn):
+    rows = conn.execute("SELECT status, target_lang, COUNT(*) FROM interactions GROUP BY status, target_lang")
+    return sorted(rows.fetchall())
+
+
+def test_counters_backfill_existing_rows_and_follow_later_writes():
+    conn = sqlite3.connect(":memory:")
+    migrations = migrate.discover()
+    migrate.run(conn, [m for m in migrations if m.version < 3], sync=False)
+    conn.executemany(
+        "INSERT INTO interactions (user_query, target_lang, status) VALUES (?, ?, ?)",
+        [("q1", "english", "pending"), ("q2", "hausa", "graded")],
+    )
+    conn.commit()
+
+    migrate.run(conn, migrations, sync=False)
+    assert counters(conn) == actual(conn)
+
+    conn.execute("INSERT INTO interactions (user_query, target_lang, status) VALUES ('q3', 'english', 'pending')")
+    conn.execute("UPDATE interactions SET status = 'graded' WHERE user_query = 'q1'")
+    conn.execute("DELETE FROM interactions WHERE user_query = 'q2'")
+    assert counters(conn) == actual(conn) == [("graded", "english", 1), ("pending", "english", 1)]
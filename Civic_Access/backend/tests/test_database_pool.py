@@ -0,0 +1,96 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import database
+from database import ConnectionPool, PoolTimeout
+
+
+def memory_connection():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+def test_exhausted_pool_times_out():
+    pool = ConnectionPool(memory_connection, max_size=1, timeout=5.0)
+    held = pool.acquire()
+
+    start = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0.05)
+    assert time.monotonic() - start < 1.0
+    assert pool.stats()["timeouts"] == 1
+
+    pool.release(held)
+    assert pool.acquire(timeout=0.05).conn is held.conn
+
+
+def test_release_wakes_a_waiting_caller():
+    pool = ConnectionPool(memory_connection, max_size=1)
+    held = pool.acquire()
+    releaser = threading.Timer(0.05, pool.release, [held])
+    releaser.start()
+
+    entry = pool.acquire(timeout=2.0)
+    releaser.join()
+    assert entry.conn is held.conn
+    assert pool.stats()["timeouts"] == 0
+
+
+def test_old_connections_are_recycled_on_checkout():
+    opened = []
+
+    def connect():
+        opened.append(memory_connection())
+        return opened[-1]
+
+    pool = ConnectionPool(connect, max_size=1, recycle=0.0)
+    first = pool.acquire()
+    pool.release(first)
+    time.sleep(0.01)
+    second = pool.acquire()
+
+    assert second.conn is not first.conn
+    assert len(opened) == 2
+    stats = pool.stats()
+    assert stats["recycled"] == 1
+    assert stats["size"] == 1
+
+
+def test_connections_within_recycle_age_are_reused():
+    pool = ConnectionPool(memory_connection, max_size=2, recycle=60.0)
+    with pool.connection() as conn:
+        first = conn
+    with pool.connection() as conn:
+        assert conn is first
+    assert pool.stats()["recycled"] == 0
+
+
+def test_open_transaction_is_rolled_back_on_release():
+    pool = ConnectionPool(memory_connection, max_size=1)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_get_db_returns_its_connection_to_the_pool(monkeypatch):
+    pool = ConnectionPool(memory_connection, max_size=1, timeout=0.05)
+    monkeypatch.setattr(database, "get_pool", lambda: pool)
+
+    dependency = database.get_db()
+    conn = next(dependency)
+    assert conn.execute("SELECT 1").fetchone() == (1,)
+    assert pool.stats()["in_use"] == 1
+
+    busy = database.get_db()
+    with pytest.raises(HTTPException) as error:
+        next(busy)
+    assert error.value.status_code == 503
+
+    dependency.close()
+    assert pool.stats()["in_use"] == 0
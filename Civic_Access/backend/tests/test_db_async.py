@@ -0,0 +1,46 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import db_async
+from database import ConnectionPool
+from db_async import AsyncDatabase
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = ConnectionPool(lambda: sqlite3.connect(":memory:", check_same_thread=False), max_size=2, timeout=0.5)
+    monkeypatch.setattr(db_async, "get_pool", lambda: pool)
+    return pool
+
+
+def test_workers_must_leave_a_pooled_connection_free():
+    with pytest.raises(RuntimeError, match="must be below DB_POOL_MAX_SIZE"):
+        AsyncDatabase(max_workers=4, pool_size=4)
+
+
+def test_run_commits_on_the_pinned_connection(pool):
+    def create(conn):
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+
+    def failing_insert(conn):
+        conn.execute("INSERT INTO t VALUES (3)")
+        raise ValueError("boom")
+
+    async def scenario():
+        database = AsyncDatabase(max_workers=1, pool_size=2)
+        try:
+            await database.run(create)
+            with pytest.raises(ValueError):
+                await database.run(failing_insert)
+            return await database.fetchall("SELECT x FROM t ORDER BY x"), database.stats()
+        finally:
+            database.close()
+
+    rows, stats = asyncio.run(scenario())
+
+    assert rows == [{"x": 1}, {"x": 2}]
+    assert stats["pinned_connections"] == 1
+    assert pool.stats()["in_use"] == 0
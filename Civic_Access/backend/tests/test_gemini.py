@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from providers import GeminiClient, GeminiJudge, GeminiProvider
+
+
+def reply(text):
+    return {"candidates": [{"content": {"parts": [{"text": text}]}, "finishReason": "STOP"}]}
+
+
+def client(handler):
+    return GeminiClient("key", "test-model", "https://gemini.test/v1beta", transport=httpx.MockTransport(handler))
+
+
+def test_missing_key_fails_fast():
+    with pytest.raises(RuntimeError, match="GEMINI_API_KEY"):
+        GeminiClient(None, "test-model", "https://gemini.test/v1beta")
+
+
+def test_generate_and_translate_send_the_prompt():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        prompt = json.loads(request.content)["contents"][0]["parts"][0]["text"]
+        return httpx.Response(200, json=reply(" Ẹ̀tọ́ rẹ " if "Translate" in prompt else "You may ask for a lawyer."))
+
+    provider = GeminiProvider(client(handler))
+    answer = asyncio.run(provider.generate("Question: can I see a lawyer?", "english"))
+    translated = asyncio.run(provider.translate("your rights", "english", "yoruba"))
+
+    assert answer == "You may ask for a lawyer."
+    assert translated == "Ẹ̀tọ́ rẹ"
+    assert requests[0].url.path == "/v1beta/models/test-model:generateContent"
+    assert requests[0].headers["x-goog-api-key"] == "key"
+    assert "from english to yoruba" in json.loads(requests[1].content)["contents"][0]["parts"][0]["text"]
+
+
+def test_stream_yields_each_sse_chunk():
+    def handler(request):
+        assert request.url.params["alt"] == "sse"
+        body = "".join(f"data: {json.dumps(reply(text))}\r\n\r\n" for text in ["You may ", "ask for ", "a lawyer."])
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    async def collect():
+        return [chunk async for chunk in GeminiProvider(client(handler)).stream("prompt", "english")]
+
+    assert asyncio.run(collect()) == ["You may ", "ask for ", "a lawyer."]
+
+
+def test_blocked_prompt_is_an_error():
+    def handler(request):
+        return httpx.Response(200, json={"promptFeedback": {"blockReason": "SAFETY"}})
+
+    with pytest.raises(RuntimeError, match="SAFETY"):
+        asyncio.run(GeminiProvider(client(handler)).generate("prompt", "english"))
+
+
+def test_http_errors_propagate():
+    def handler(request):
+        return httpx.Response(429, json={"error": {"message": "quota"}})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(GeminiProvider(client(handler)).generate("prompt", "english"))
+
+
+def test_judge_asks_for_json_and_parses_the_scores():
+    def handler(request):
+        body = json.loads(request.content)
+        assert body["generationConfig"]["responseMimeType"] == "application/json"
+        assert "### Item 2" in body["contents"][0]["parts"][0]["text"]
+        return httpx.Response(200, json=reply('[{"item": 1, "score": 4, "reason": "ok"}, {"item": 2, "score": 2, "reason": "thin"}]'))
+
+    judge = GeminiJudge(client(handler))
+    scores = asyncio.run(judge.grade_batch([("q1", "ctx", "a1"), ("q2", "ctx", "a2")]))
+    assert scores == [(4, "ok"), (2, "thin")]
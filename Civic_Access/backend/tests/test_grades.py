@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+import grades
+from grades import GradeNotifier
+
+
+class FakeDB:
+    def __init__(self, row):
+        self.row = row
+
+    async def fetchone(self, sql, params):
+        return dict(self.row)
+
+    async def fetchall(self, sql, params):
+        return []
+
+
+@pytest.fixture(autouse=True)
+def pending_row(monkeypatch):
+    row = {"id": 7, "user_id": 1, "status": "judging", "judge_score": None, "judge_reason": None}
+    monkeypatch.setattr(grades, "db", FakeDB(row))
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"status": "graded", "judge_score": 4, "judge_reason": "Grounded."},
+        {"status": "failed", "judge_reason": "Judge lease expired too many times"},
+    ],
+)
+def test_finished_writes_wake_waiters(fields):
+    notifier = GradeNotifier(interval=60)
+
+    async def scenario():
+        waiting = asyncio.create_task(notifier.wait(7, timeout=5, user_id=1))
+        await asyncio.sleep(0.01)
+        notifier.on_write("update", 7, fields)
+        return await asyncio.wait_for(waiting, 1)
+
+    grade = asyncio.run(scenario())
+
+    assert grade["status"] == fields["status"]
+    assert grade["judge_reason"] == fields["judge_reason"]
+    assert notifier.stats()["notified"] == 1
+
+
+def test_other_users_get_nothing():
+    assert asyncio.run(GradeNotifier().wait(7, timeout=0, user_id=2)) is None
@@ -0,0 +1,30 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from hashing import HashingPool
+
+
+def test_queue_limit_holds_during_a_cold_start_burst():
+    pool = HashingPool(1, queue_limit=2)
+
+    def slow_start():
+        time.sleep(0.05)
+        pool._executor = pool._executor or ThreadPoolExecutor(1)
+
+    pool.start = slow_start
+
+    async def burst():
+        calls = [pool.run("hash", time.sleep, 0.01) for _ in range(5)]
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    results = asyncio.run(burst())
+    pool._executor.shutdown()
+
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 3
+    assert all(r.status_code == 503 for r in rejected)
+    assert pool.stats()["rejected"] == 3
+    assert pool.stats()["in_flight"] == 0
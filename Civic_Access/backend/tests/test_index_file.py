@@ -0,0 +1,52 @@
+import pytest
+
+from retrieval.bm25 import BM25Index, BM25Retriever
+from retrieval.chunker import load_corpus
+from retrieval.index_file import IndexFormatError, open_index, write_index
+
+
+@pytest.fixture
+def index(corpus_dir):
+    return BM25Index(load_corpus(corpus_dir, max_chars=120))
+
+
+@pytest.fixture
+def path(index, tmp_path):
+    path = tmp_path / "index.bin"
+    write_index(path, index)
+    return path
+
+
+def corrupt(path, offset):
+    data = bytearray(path.read_bytes())
+    data[offset] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+
+def test_mapped_file_returns_the_in_memory_results(index, path):
+    mapped = open_index(path, verify=True)
+
+    assert mapped.corpus_version == index.corpus_version
+    assert mapped.document_ranges == index.document_ranges
+    for query in ["arrested detained court", "landlord rent", "right to life", "abia state"]:
+        expected = index.search(query, 5)
+        got = mapped.search(query, 5)
+        assert [doc_id for doc_id, _ in got] == [doc_id for doc_id, _ in expected]
+        assert [score for _, score in got] == pytest.approx([score for _, score in expected], rel=1e-5)
+    query = "arrested detained court"
+    assert BM25Retriever(mapped).search_now(query, 3) == BM25Retriever(index).search_now(query, 3)
+
+
+def test_corrupt_payload_fails_verification(path):
+    corrupt(path, -1)
+
+    open_index(path)  # only the header is checked on open
+    with pytest.raises(IndexFormatError):
+        open_index(path, verify=True)
+
+
+def test_corrupt_header_fails_on_open(path):
+    corrupt(path, 12)
+
+    with pytest.raises(IndexFormatError):
+        open_index(path)
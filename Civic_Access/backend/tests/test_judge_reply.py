@@ -0,0 +1,36 @@
+import pytest
+
+from providers import JudgeReplyError, PromptJudge
+
+
+def test_reply_is_read_in_item_order():
+    reply = """Here are the grades:
+    [
+      {"item": 2, "score": 3, "reason": " Partly supported. "},
+      {"item": 1, "score": 5, "reason": "Cites s. 35(4)."}
+    ]
+    Let me know if you need more."""
+
+    assert PromptJudge.parse_reply(reply, 2) == [(5, "Cites s. 35(4)."), (3, "Partly supported.")]
+
+
+def test_numeric_strings_are_accepted_and_reason_is_optional():
+    assert PromptJudge.parse_reply('[{"item": "1", "score": "4"}]', 1) == [(4, "")]
+
+
+@pytest.mark.parametrize(
+    "reply, message",
+    [
+        ("All answers look fine.", "no JSON list"),
+        ('[{"item": 1, "score": 5,}]', "not valid JSON"),
+        ('[{"item": 1}]', "malformed entry"),
+        ('[{"item": 1, "score": "high"}]', "malformed entry"),
+        ('["5"]', "malformed entry"),
+        ('[{"item": 1, "score": 0}]', "out of range"),
+        ('[{"item": 1, "score": 6}]', "out of range"),
+        ('[{"item": 1, "score": 4}]', r"no result for items \[2\]"),
+    ],
+)
+def test_bad_replies_raise(reply, message):
+    with pytest.raises(JudgeReplyError, match=message):
+        PromptJudge.parse_reply(reply, 2)
@@ -0,0 +1,49 @@
+import asyncio
+import sqlite3
+
+import judge_worker
+import migrate
+from providers import FakeJudge
+
+
+class InlineDB:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def run(self, fn, *args):
+        result = fn(self.conn, *args)
+        self.conn.commit()
+        return result
+
+
+class LeaseLosingJudge(FakeJudge):
+    """Grades normally, but another worker reclaims `stolen` while the call is in flight."""
+
+    def __init__(self, conn, stolen):
+        super().__init__(latency_ms=0, item_ms=0)
+        self.conn = conn
+        self.stolen = stolen
+
+    async def complete(self, prompt):
+        self.conn.execute("UPDATE interactions SET lease_owner = 'other-worker' WHERE id = ?", [self.stolen])
+        return await super().complete(prompt)
+
+
+def test_only_rows_still_leased_are_written_and_notified(monkeypatch):
+    conn = sqlite3.connect(":memory:")
+    migrate.run(conn, migrate.discover(), sync=False)
+    conn.executemany(
+        "INSERT INTO interactions (user_query, rag_context, model_reply, status) VALUES (?, '[]', 'An answer.', 'pending')",
+        [("q1",), ("q2",)],
+    )
+    conn.commit()
+    monkeypatch.setattr(judge_worker, "db", InlineDB(conn))
+
+    notified = []
+    worker = judge_worker.JudgeWorker(LeaseLosingJudge(conn, stolen=2), on_graded=notified.append)
+    assert asyncio.run(worker.run_once()) == 2
+
+    assert [event["interaction_id"] for event in notified] == [1]
+    assert worker.stats()["graded"] == 1
+    rows = conn.execute("SELECT id, status, lease_owner FROM interactions ORDER BY id").fetchall()
+    assert rows == [(1, "graded", None), (2, "judging", "other-worker")]
@@ -0,0 +1,110 @@
+import shutil
+import sqlite3
+import threading
+
+import pytest
+
+import migrate
+
+
+TRIGGER_SCRIPT = """-- leading comment
+CREATE TABLE t (x INTEGER);
+
+-- a comment between statements
+CREATE TRIGGER trg AFTER INSERT ON t
+BEGIN
+    UPDATE t SET x = x + 1;
+    DELETE FROM t WHERE x > 10;
+END;
+INSERT INTO t VALUES (1)
+"""
+
+
+def columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def test_split_statements_keeps_trigger_bodies_whole():
+    statements = migrate.split_statements(TRIGGER_SCRIPT)
+
+    assert len(statements) == 3
+    assert statements[0] == "CREATE TABLE t (x INTEGER);"
+    assert statements[1].startswith("CREATE TRIGGER trg")
+    assert statements[1].endswith("END;")
+    assert "DELETE FROM t WHERE x > 10;" in statements[1]
+    assert statements[2] == "INSERT INTO t VALUES (1)"
+
+
+def test_split_statements_of_every_shipped_migration_execute():
+    conn = sqlite3.connect(":memory:")
+    for migration in migrate.discover():
+        _, statements = migration.read()
+        assert statements
+        for statement in statements:
+            conn.execute(statement)
+
+
+def test_run_applies_everything_once():
+    conn = sqlite3.connect(":memory:")
+    migrations = migrate.discover()
+
+    applied = migrate.run(conn, migrations, sync=False)
+
+    assert applied == [m.version for m in migrations]
+    assert migrate.applied_versions(conn) == set(applied)
+    assert {"lease_owner", "answer_version", "user_id"} <= columns(conn, "interactions")
+    assert migrate.run(conn, migrations, sync=False) == []
+
+
+def test_failed_migration_is_rolled_back_and_can_be_rerun(tmp_path):
+    shipped = {m.version: m for m in migrate.discover()}
+    for version in range(1, 5):
+        shutil.copy(shipped[version].path, tmp_path)
+    broken = tmp_path / "0005_judge_leases.sql"
+    broken.write_text(
+        "ALTER TABLE interactions ADD COLUMN lease_owner TEXT;\n\nALTER TABLE interactions ADD COLUMN;\n",
+        encoding="utf-8",
+    )
+    conn = sqlite3.connect(":memory:")
+
+    with pytest.raises(sqlite3.Error):
+        migrate.run(conn, migrate.discover(str(tmp_path)), sync=False)
+    assert "lease_owner" not in columns(conn, "interactions")
+    assert migrate.applied_versions(conn) == {1, 2, 3, 4}
+
+    shutil.copy(shipped[5].path, broken)
+    assert migrate.run(conn, migrate.discover(str(tmp_path)), sync=False) == [5]
+    assert {"lease_owner", "lease_expires_at", "judge_attempts"} <= columns(conn, "interactions")
+    assert migrate.applied_versions(conn) == {1, 2, 3, 4, 5}
+
+
+def test_processes_starting_together_apply_each_migration_once(tmp_path):
+    path = tmp_path / "shared.db"
+    results, errors = [], []
+
+    def start_worker():
+        conn = sqlite3.connect(path, check_same_thread=False)
+        try:
+            results.append(migrate.run(conn, sync=False))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    workers = [threading.Thread(target=start_worker) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    applied = sorted(v for versions in results for v in versions)
+    assert applied == [m.version for m in migrate.discover()]
+
+
+def test_duplicate_versions_are_refused(tmp_path):
+    (tmp_path / "0001_a.sql").write_text("SELECT 1;", encoding="utf-8")
+    (tmp_path / "0001_b.sql").write_text("SELECT 1;", encoding="utf-8")
+
+    with pytest.raises(RuntimeError, match="Duplicate migration versions"):
+        migrate.discover(str(tmp_path))
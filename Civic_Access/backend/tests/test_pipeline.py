@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+import pipeline
+from coalescing import SingleFlight
+from pipeline import ChatPipeline
+from providers import FakeProvider
+from retrieval import Passage
+from semantic_cache import SemanticHit
+
+
+class FakeRetriever:
+    version = "test"
+
+    async def search(self, query, k):
+        return [Passage(id="constitution_1999:s35", text="Right to personal liberty.", source="Constitution")]
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.rows = []
+
+    async def insert(self, fields, wait_for_id=False):
+        self.rows.append(fields)
+        return len(self.rows)
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    writer = RecordingWriter()
+    monkeypatch.setattr(pipeline, "writer", writer)
+    return writer
+
+
+def chat_pipeline():
+    return ChatPipeline(
+        provider=FakeProvider(translate_ms=0, latency_ms=0, token_ms=5),
+        retriever=FakeRetriever(),
+        flights=SingleFlight(),
+    )
+
+
+def test_stream_persists_before_done(writer):
+    async def scenario():
+        return [event async for event, _ in chat_pipeline().run_stream("Can police detain me?", "english")]
+
+    events = asyncio.run(scenario())
+
+    assert events[0] == "translated_query" and events[-1] == "done"
+    assert len(writer.rows) == 1
+    assert writer.rows[0]["model_reply"].startswith("[english] Here is what the law says")
+
+
+def test_disconnected_stream_still_records_the_full_answer(writer):
+    async def scenario():
+        chat = chat_pipeline()
+        stream = chat.run_stream("Can police detain me?", "english")
+        async for event, _ in stream:
+            if event == "token":
+                break
+        await stream.aclose()
+        assert writer.rows == []
+        while chat._tasks:
+            await asyncio.gather(*chat._tasks)
+
+    asyncio.run(scenario())
+
+    assert len(writer.rows) == 1
+    reply = writer.rows[0]["model_reply"]
+    assert reply.endswith("ask for a lawyer.")
+
+
+class StaticSemanticCache:
+    async def lookup(self, translated_query, language, version):
+        return SemanticHit(
+            interaction_id=41,
+            similarity=0.93,
+            judge_score=5,
+            translated_query="May police hold me without a reason?",
+            passages=[{"id": "constitution_1999:s35", "text": "Right to personal liberty.", "source": "Constitution"}],
+            reply="You must be told why you are detained.",
+        )
+
+
+def test_semantic_hit_is_recorded_as_cache_served(writer):
+    chat = ChatPipeline(
+        provider=FakeProvider(translate_ms=0, latency_ms=0, token_ms=0),
+        retriever=FakeRetriever(),
+        semantic_cache=StaticSemanticCache(),
+        flights=SingleFlight(),
+    )
+
+    async def scenario():
+        return [event async for event, _ in chat.run_stream("Can police detain me?", "english")]
+
+    asyncio.run(scenario())
+
+    assert writer.rows[0]["source"] == "semantic"
+    assert writer.rows[0]["cached_from"] == 41
+    assert writer.rows[0]["model_reply"] == "You must be told why you are detained."
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from retrieval.ann import IVFIndex
+from retrieval.quantize import Int8Quantizer, ProductQuantizer
+
+
+def unit(rows):
+    return (rows / np.linalg.norm(rows, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def data():
+    """Clustered unit vectors, like sentence embeddings, and nearby queries."""
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 64))
+    vectors = unit(centers[rng.integers(0, 20, 2000)] + 0.5 * rng.normal(size=(2000, 64)))
+    queries = unit(vectors[rng.choice(2000, 50, replace=False)] + 0.1 * rng.normal(size=(50, 64)))
+    exact = [set(np.argsort(-(vectors @ q))[:10]) for q in queries]
+    return vectors, queries, exact
+
+
+def recall(search, queries, exact):
+    return np.mean([len(set(search(q)) & truth) / len(truth) for q, truth in zip(queries, exact)])
+
+
+def test_int8_scores_track_exact_cosine(data):
+    vectors, queries, _ = data
+    quantizer = Int8Quantizer.train(vectors)
+    codes = quantizer.encode(vectors)
+
+    assert codes.dtype == np.int8
+    error = np.abs(quantizer.score(queries[0], codes) - vectors @ queries[0])
+    assert error.max() < 0.05
+
+
+@pytest.mark.parametrize("kind, without_rerank", [("int8", 0.95), ("pq", 0.5)])
+def test_quantized_recall_bounds(data, kind, without_rerank):
+    vectors, queries, exact = data
+    index = IVFIndex.build(vectors, nlist=16, seed=0, iterations=10, nprobe=16, quantize=kind, pq_subvectors=16)
+
+    def search(q):
+        return [row for row, _ in index.search(q, 10)]
+
+    index.rerank = 0
+    assert recall(search, queries, exact) >= without_rerank
+    # Re-scoring the best 50 codes against the float vectors recovers the exact top 10.
+    index.rerank = 50
+    assert recall(search, queries, exact) >= 0.95
+
+
+def test_reranked_scores_are_exact_cosines(data):
+    vectors, queries, _ = data
+    index = IVFIndex.build(vectors, nlist=16, seed=0, nprobe=16, quantize="pq", pq_subvectors=16)
+    index.rerank = 50
+
+    for row, score in index.search(queries[0], 5):
+        assert score == pytest.approx(float(vectors[row] @ queries[0]), abs=1e-5)
+
+
+def test_pq_codes_are_one_byte_per_subvector(data):
+    vectors, _, _ = data
+    quantizer = ProductQuantizer.train(vectors, m=16, seed=0)
+    codes = quantizer.encode(vectors[:10])
+
+    assert codes.shape == (10, 16)
+    assert codes.dtype == np.uint8
+
+
+def test_build_checks_recall_of_the_codes_not_the_rerank(data):
+    from retrieval.__main__ import _quantize
+
+    vectors, queries, _ = data
+    index = IVFIndex.build(vectors, nlist=16, seed=0, nprobe=16, quantize="none")
+    index.rerank = 100
+
+    # pq with a 100-row exact re-rank finds every true neighbour here, but its
+    # codes alone do not, so the build falls back to int8.
+    _quantize(index, queries, "pq", 16, 0.02)
+
+    assert index.quantizer.kind == "int8"
+    assert index.rerank == 100
+
+
+class Unreadable(np.ndarray):
+    def __getitem__(self, item):
+        raise AssertionError("read a float32 vector")
+
+
+def test_codes_only_search_never_touches_the_vectors(data):
+    vectors, queries, _ = data
+    index = IVFIndex.build(vectors, nlist=16, seed=0, nprobe=16, quantize="int8")
+    index.rerank = 0
+    index.vectors = vectors.view(Unreadable)
+
+    assert len(index.search(queries[0], 10)) == 10
+    assert index.stats()["avg_reranked"] == 0.0
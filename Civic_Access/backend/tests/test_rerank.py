@@ -0,0 +1,95 @@
+import asyncio
+
+from providers import RerankScorer
+from rerank import Reranker
+from retrieval import Passage
+
+
+class ScriptedScorer(RerankScorer):
+    """Scores each passage from a table, recording every call."""
+
+    name = model_id = "scripted"
+
+    def __init__(self, scores: dict[str, float]):
+        self.scores = scores
+        self.calls = []
+
+    async def score(self, query: str, passages: list[str]) -> list[float]:
+        self.calls.append(list(passages))
+        return [self.scores[text] for text in passages]
+
+
+def passages(count):
+    return [Passage(id=f"doc:s{n}", text=f"passage {n}", score=1.0 / (n + 1)) for n in range(count)]
+
+
+def rerank(reranker, query, candidates, k=3, corpus_version="v1"):
+    return asyncio.run(reranker.rerank(query, candidates, k, corpus_version))
+
+
+def test_stops_once_a_batch_scores_well_below_the_top_k():
+    scores = {f"passage {n}": (1.0 if n < 3 else 0.2) for n in range(40)}
+    scorer = ScriptedScorer(scores)
+
+    result = rerank(Reranker(scorer, batch_size=8, margin=0.1), "question", passages(40))
+
+    assert result.early_exit
+    assert result.batches == 2 and result.scored == 16
+    assert [p.id for p in result.passages] == ["doc:s0", "doc:s1", "doc:s2"]
+    assert [p.score for p in result.passages] == [1.0, 1.0, 1.0]
+
+
+def test_keeps_scoring_while_candidates_are_within_the_margin():
+    scores = {f"passage {n}": 0.95 for n in range(40)}
+    scores.update({"passage 0": 1.0, "passage 1": 1.0, "passage 2": 1.0, "passage 30": 2.0})
+    scorer = ScriptedScorer(scores)
+
+    result = rerank(Reranker(scorer, batch_size=8, margin=0.1), "question", passages(40))
+
+    assert not result.early_exit
+    assert result.scored == 40
+    assert [p.id for p in result.passages] == ["doc:s30", "doc:s0", "doc:s1"]
+
+
+def test_repeated_question_is_served_from_the_cache():
+    scorer = ScriptedScorer({f"passage {n}": n / 10 for n in range(10)})
+    reranker = Reranker(scorer, batch_size=4, margin=10.0)
+    first = rerank(reranker, "question", passages(10))
+
+    second = rerank(reranker, "question", passages(10))
+
+    assert len(scorer.calls) == first.batches
+    assert second.batches == 0 and second.scored == 0
+    assert second.cached == first.scored
+    assert [p.id for p in second.passages] == [p.id for p in first.passages] == ["doc:s9", "doc:s8", "doc:s7"]
+    assert reranker.stats()["cache_hits"] == second.cached
+
+
+def test_cache_is_keyed_by_question():
+    scorer = ScriptedScorer({f"passage {n}": 0.5 for n in range(4)})
+    reranker = Reranker(scorer, batch_size=4)
+    rerank(reranker, "first question", passages(4))
+
+    other = rerank(reranker, "second question", passages(4))
+
+    assert other.cached == 0 and other.scored == 4
+
+
+def test_corpus_change_empties_the_cache():
+    scorer = ScriptedScorer({f"passage {n}": 0.5 for n in range(4)})
+    reranker = Reranker(scorer, batch_size=4)
+    rerank(reranker, "question", passages(4), corpus_version="v1")
+
+    after = rerank(reranker, "question", passages(4), corpus_version="v2")
+
+    assert after.cached == 0 and after.scored == 4
+    assert reranker.stats()["invalidations"] == 1
+
+
+def test_cache_is_bounded():
+    scorer = ScriptedScorer({f"passage {n}": 0.5 for n in range(10)})
+    reranker = Reranker(scorer, batch_size=10, cache_size=4)
+
+    rerank(reranker, "question", passages(10))
+
+    assert reranker.stats()["cached_scores"] == 4
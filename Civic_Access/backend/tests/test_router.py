@@ -0,0 +1,78 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from retrieval.bm25 import BM25Index, BM25Retriever
+from retrieval.chunker import load_corpus
+from retrieval.router import LinearTopicModel, RoutedRetriever, TopicRouter
+
+
+SHARDS = ["constitution_1999", "lagos_tenancy_law_2011", "police_act_2020"]
+
+
+def test_no_rule_and_no_model_falls_back_to_every_shard():
+    route = TopicRouter().route("what is the weather like today", SHARDS)
+
+    assert route.documents is None
+    assert route.source == "fallback"
+
+
+def test_keyword_rules_pick_their_statutes():
+    tenancy = TopicRouter().route("my landlord wants two years rent", SHARDS)
+    police = TopicRouter().route("can the police detain me without a warrant", SHARDS)
+
+    assert tenancy.documents == ["lagos_tenancy_law_2011"]
+    assert tenancy.source == "rules"
+    assert sorted(police.documents) == ["constitution_1999", "police_act_2020"]
+
+
+def test_low_confidence_falls_back():
+    # A model with no opinion spreads probability evenly, below min_confidence.
+    model = LinearTopicModel(SHARDS, np.zeros((len(SHARDS), 1 << 14), dtype=np.float32), np.zeros(len(SHARDS)))
+    route = TopicRouter(model=model, min_confidence=0.45).route("what is the weather like today", SHARDS)
+
+    assert route.documents is None
+    assert route.source == "fallback"
+    assert route.confidence == pytest.approx(1 / 3)
+
+
+def test_trained_model_routes_without_a_rule():
+    texts = [
+        "rent paid in advance to the landlord",
+        "notice to quit the premises",
+        "right to life and dignity",
+        "freedom of expression and the press",
+        "powers of a police officer to arrest",
+        "bail for a suspect in custody",
+    ]
+    labels = ["lagos_tenancy_law_2011"] * 2 + ["constitution_1999"] * 2 + ["police_act_2020"] * 2
+    model = LinearTopicModel.train(texts, labels, epochs=100)
+
+    route = TopicRouter(model=model, rules=[]).route("advance payment to my landlord", SHARDS)
+
+    assert route.documents == ["lagos_tenancy_law_2011"]
+    assert route.source == "model"
+
+
+def test_choosing_every_shard_is_reported_as_no_restriction():
+    router = TopicRouter(rules=[(r"\blaw\b", SHARDS)], min_confidence=0.3)
+    route = router.route("what does the law say", SHARDS)
+
+    assert route.documents is None
+    assert route.source == "rules"
+
+
+def test_routed_retriever_searches_only_routed_shards(corpus_dir):
+    index = BM25Index(load_corpus(corpus_dir))
+    retriever = RoutedRetriever(BM25Retriever(index), TopicRouter())
+
+    routed = asyncio.run(retriever.search("landlord notice to a person", 10))
+    fallback = asyncio.run(retriever.search("what is the weather like today", 10))
+
+    assert routed and all(p.id.startswith("lagos_tenancy_law_2011:") for p in routed)
+    assert fallback == []
+    routing = retriever.stats()["routing"]
+    assert routing["queries"] == 2
+    assert routing["fallback_rate"] == 0.5
+    assert routing["by_shard"] == {"lagos_tenancy_law_2011": 1, "*": 1}
@@ -0,0 +1,73 @@
+import asyncio
+import sqlite3
+
+import migrate
+import semantic_cache
+from providers import HashingEmbedder
+from semantic_cache import SemanticCache
+
+
+class InlineDB:
+    def __init__(self, conn):
+        conn.row_factory = sqlite3.Row
+        self.conn = conn
+
+    async def fetchone(self, sql, params=()):
+        row = self.conn.execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+    async def fetchall(self, sql, params=()):
+        return [dict(row) for row in self.conn.execute(sql, params).fetchall()]
+
+
+QUESTION = "Can the police detain me without telling me why?"
+
+
+def test_refresh_indexes_only_model_answers(monkeypatch):
+    conn = sqlite3.connect(":memory:")
+    migrate.run(conn, migrate.discover(), sync=False)
+    conn.executemany(
+        "INSERT INTO interactions (translated_query, target_lang, rag_context, model_reply, status, "
+        "judge_score, answer_version, source, cached_from) VALUES (?, 'english', '[]', 'No.', 'graded', 5, 'v1', ?, ?)",
+        [(QUESTION, "model", None), ("Can police detain me without a reason?", "semantic", 1), (QUESTION, "memory", None)],
+    )
+    conn.commit()
+    monkeypatch.setattr(semantic_cache, "db", InlineDB(conn))
+
+    cache = SemanticCache(embedder=HashingEmbedder(64))
+    cache._check_version("v1")
+    asyncio.run(cache.refresh())
+
+    assert cache.stats()["entries"] == 1
+    assert list(cache._answers) == [1]
+
+
+class VersionChangingEmbedder(HashingEmbedder):
+    """Another request moves the cache to a new answer version while this one embeds."""
+
+    cache = None
+
+    async def embed(self, texts):
+        if self.cache is not None:
+            self.cache._check_version("v2")
+        return await super().embed(texts)
+
+
+def test_lookup_survives_a_version_change_while_embedding():
+    embedder = VersionChangingEmbedder(64)
+    cache = SemanticCache(embedder=embedder, threshold=0.5, refresh=3600)
+
+    async def scenario():
+        cache._check_version("v1")
+        cache._refreshed_at = float("inf")
+        await cache._add(
+            [{"id": 7, "target_lang": "english", "translated_query": QUESTION, "rag_context": "[]",
+              "model_reply": "No.", "judge_score": 5}]
+        )
+        embedder.cache = cache
+        return await cache.lookup(QUESTION, "english", "v1")
+
+    hit = asyncio.run(scenario())
+
+    assert hit is not None and hit.interaction_id == 7
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,118 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+import migrate
+import write_behind
+from write_behind import InteractionWriter
+
+
+class FakeDB:
+    """Stands in for db_async.db: runs each batch on one SQLite connection."""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        migrate.run(self.conn, sync=False)
+        self.batches = []
+
+    async def run(self, fn, *args):
+        self.batches.append(len(args[0]))
+        try:
+            result = fn(self.conn, *args)
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+        return result
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(write_behind, "db", db)
+    return db
+
+
+def row(n):
+    return {"user_query": f"question {n}", "target_lang": "english", "status": "pending"}
+
+
+def test_full_batch_flushes_without_waiting(fake_db):
+    async def scenario():
+        writer = InteractionWriter(batch_size=3, flush_ms=10_000)
+        start = time.monotonic()
+        ids = await asyncio.gather(*(writer.insert(row(n)) for n in range(3)))
+        elapsed = time.monotonic() - start
+        await writer.stop()
+        return ids, elapsed, writer.stats()
+
+    ids, elapsed, stats = asyncio.run(scenario())
+
+    assert elapsed < 1.0
+    assert fake_db.batches == [3]
+    assert len(set(ids)) == 3
+    assert stats["batches"] == 1 and stats["rows"] == 3
+    assert fake_db.conn.execute("SELECT COUNT(*) FROM interactions").fetchone()[0] == 3
+
+
+def test_partial_batch_flushes_after_flush_ms(fake_db):
+    async def scenario():
+        writer = InteractionWriter(batch_size=100, flush_ms=50)
+        start = time.monotonic()
+        interaction_id = await writer.insert(row(1))
+        elapsed = time.monotonic() - start
+        await writer.stop()
+        return interaction_id, elapsed
+
+    interaction_id, elapsed = asyncio.run(scenario())
+
+    assert 0.04 <= elapsed < 1.0
+    assert fake_db.batches == [1]
+    stored = fake_db.conn.execute("SELECT user_query FROM interactions WHERE id = ?", (interaction_id,))
+    assert stored.fetchone()[0] == "question 1"
+
+
+def test_stop_flushes_buffered_writes(fake_db):
+    async def scenario():
+        writer = InteractionWriter(batch_size=100, flush_ms=10_000, durability="enqueue")
+        for n in range(5):
+            assert await writer.insert(row(n)) is None
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+    assert fake_db.batches == [5]
+    assert fake_db.conn.execute("SELECT COUNT(*) FROM interactions").fetchone()[0] == 5
+
+
+def test_a_bad_row_fails_alone(fake_db):
+    fake_db.conn.execute(
+        "CREATE TRIGGER reject_bad BEFORE INSERT ON interactions WHEN NEW.user_query = 'bad' "
+        "BEGIN SELECT RAISE(ABORT, 'bad row'); END"
+    )
+
+    async def scenario():
+        writer = InteractionWriter(batch_size=3, flush_ms=10_000)
+        bad = dict(row(0), user_query="bad")
+        results = await asyncio.gather(
+            writer.insert(row(1)), writer.insert(bad), writer.insert(row(2)), return_exceptions=True
+        )
+        await writer.stop()
+        return results, writer.stats()
+
+    (first, bad, second), stats = asyncio.run(scenario())
+
+    assert isinstance(bad, sqlite3.IntegrityError)
+    assert isinstance(first, int) and isinstance(second, int)
+    assert fake_db.batches == [3, 1, 1, 1]
+    assert stats["rows"] == 2 and stats["failed_rows"] == 1
+    queries = fake_db.conn.execute("SELECT user_query FROM interactions ORDER BY id").fetchall()
+    assert queries == [("question 1",), ("question 2",)]
+
+
+def test_unknown_columns_are_rejected_before_buffering(fake_db):
+    writer = InteractionWriter()
+    with pytest.raises(ValueError, match="Unknown interaction columns"):
+        writer.submit_insert({"no_such_column": 1})
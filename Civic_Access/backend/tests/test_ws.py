@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routes.ws
+from realtime import ChannelHub
+from routes.auth import create_access_token
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = ChannelHub(replay=2)
+    monkeypatch.setattr(routes.ws, "hub", hub)
+    return hub
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(routes.ws.router)
+    return TestClient(app)
+
+
+def test_replay_gap_reports_the_oldest_buffered_event(hub, client):
+    channel = hub.channel(1)
+    for n in range(5):
+        asyncio.run(channel.publish("grade", {"n": n}))
+    token = create_access_token(1, "user@example.com")
+
+    with client.websocket_connect(f"/ws?token={token}&session={channel.session}&last_event_id=1") as socket:
+        assert socket.receive_json()["data"]["resumed"] is True
+        gap = socket.receive_json()
+        replayed = [socket.receive_json()["event_id"] for _ in range(2)]
+
+    assert gap["type"] == "replay_gap"
+    assert gap["data"]["oldest_available"] == 4
+    assert replayed == [4, 5]
+
+
+@pytest.mark.parametrize("message", ["[]", '"hi"', "42"])
+def test_json_that_is_not_an_object_gets_an_error_frame(hub, client, message):
+    token = create_access_token(1, "user@example.com")
+
+    with client.websocket_connect(f"/ws?token={token}") as socket:
+        socket.receive_json()  # hello
+        socket.send_text(message)
+        error = socket.receive_json()
+        socket.send_json({"type": "ping", "id": "p1"})
+        pong = socket.receive_json()
+
+    assert error["type"] == "error"
+    assert error["data"]["detail"] == "Messages must be JSON objects"
+    assert pong == {"type": "pong", "id": "p1", "data": {}}
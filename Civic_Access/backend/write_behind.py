@@ -0,0 +1,259 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+
+import metrics
+from db_async import db
+
+
+load_dotenv()
+
+
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 50))
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", 50))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", 5000))
+# "flush": insert()/update() return once the row is committed.
+# "enqueue": they return as soon as the row is buffered (lost if the worker dies).
+WRITE_BEHIND_DURABILITY = os.getenv("WRITE_BEHIND_DURABILITY", "flush")
+
+INTERACTION_COLUMNS = (
+    "timestamp",
+    "user_query",
+    "translated_query",
+    "target_lang",
+    "rag_context",
+    "model_reply",
+    "judge_score",
+    "judge_reason",
+    "status",
+    "answer_version",
+    "user_id",
+    "source",
+    "cached_from",
+)
+
+
+def _check_columns(fields: dict):
+    unknown = set(fields) - set(INTERACTION_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown interaction columns: {sorted(unknown)}")
+
+
+def _write_batch(conn, ops):
+    """Applies a batch of buffered writes on one connection; committed by the caller."""
+    results = []
+    for kind, interaction_id, fields in ops:
+        columns = list(fields)
+        values = [fields[c] for c in columns]
+        if kind == "insert":
+            cursor = conn.execute(
+                f"INSERT INTO interactions ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})",
+                values,
+            )
+            results.append(cursor.lastrowid)
+        else:
+            conn.execute(
+                f"UPDATE interactions SET {', '.join(f'{c} = ?' for c in columns)} "
+                "WHERE id = ?",
+                values + [interaction_id],
+            )
+            results.append(interaction_id)
+    return results
+
+
+class InteractionWriter:
+    """
+    Buffers writes to the `interactions` table and commits them in groups.
+
+    A batch is flushed as soon as `batch_size` writes are waiting, or
+    `flush_ms` after the oldest one arrived, whichever comes first. Every
+    batch is a single transaction (one commit, one replica sync request);
+    a batch that fails is retried row by row, so only the bad row fails.
+    """
+
+    def __init__(self, batch_size=50, flush_ms=50.0, max_pending=5000, durability="flush"):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_ms / 1000
+        self.max_pending = max(self.batch_size, max_pending)
+        self.durability = durability
+
+        self._pending = []
+        self._oldest = 0.0
+        self._task = None
+        self._stopping = False
+        self._has_work = None
+        self._batch_full = None
+        self._space = None
+
+        self._listeners = []
+        self._batches = 0
+        self._rows = 0
+        self._failed_rows = 0
+        self._flush_latency = metrics.LatencyStats()
+
+    def submit_insert(self, fields: dict) -> asyncio.Future:
+        """Buffers a new interaction row. The future resolves to its id once committed."""
+        _check_columns(fields)
+        return self._submit("insert", None, fields)
+
+    def submit_update(self, interaction_id: int, fields: dict) -> asyncio.Future:
+        """Buffers an update to an existing interaction row."""
+        _check_columns(fields)
+        return self._submit("update", interaction_id, fields)
+
+    async def insert(self, fields: dict, wait_for_id: bool = False) -> int | None:
+        """
+        Adds an interaction row. Returns its id in "flush" durability mode and
+        None in "enqueue" mode, unless `wait_for_id` asks for the id regardless.
+        """
+        await self._wait_for_space()
+        future = self.submit_insert(fields)
+        if wait_for_id:
+            return await future
+        return await self._ack(future)
+
+    async def update(self, interaction_id: int, fields: dict):
+        await self._wait_for_space()
+        await self._ack(self.submit_update(interaction_id, fields))
+
+    def add_listener(self, listener):
+        """Calls `listener(kind, interaction_id, fields)` for every committed write."""
+        self._listeners.append(listener)
+
+    async def flush(self):
+        """Waits until everything buffered so far has been written."""
+        if self._pending:
+            await asyncio.gather(
+                *(future for *_, future in self._pending), return_exceptions=True
+            )
+
+    async def stop(self):
+        """Flushes whatever is still buffered and stops the background writer."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._has_work.set()
+        self._batch_full.set()
+        await self._task
+        self._task = None
+        self._stopping = False
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "durability": self.durability,
+            "batches": self._batches,
+            "rows": self._rows,
+            "failed_rows": self._failed_rows,
+            "avg_batch_size": round(self._rows / self._batches, 2) if self._batches else 0,
+            "flush_latency": self._flush_latency.snapshot(),
+        }
+
+    def _submit(self, kind, interaction_id, fields) -> asyncio.Future:
+        if self._stopping:
+            raise RuntimeError("Interaction writer is shutting down")
+        self._ensure_started()
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        future.add_done_callback(_consume_exception)
+        self._pending.append((kind, interaction_id, dict(fields), future))
+
+        if len(self._pending) == 1:
+            self._oldest = loop.time()
+            self._has_work.set()
+        if len(self._pending) >= self.batch_size:
+            self._batch_full.set()
+        return future
+
+    async def _ack(self, future: asyncio.Future):
+        if self.durability == "enqueue":
+            return None
+        return await future
+
+    async def _wait_for_space(self):
+        self._ensure_started()
+        while len(self._pending) >= self.max_pending:
+            self._space.clear()
+            await self._space.wait()
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._has_work = asyncio.Event()
+            self._batch_full = asyncio.Event()
+            self._space = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._has_work.wait()
+
+            if not self._stopping and len(self._pending) < self.batch_size:
+                delay = self._oldest + self.flush_interval - loop.time()
+                if delay > 0:
+                    self._batch_full.clear()
+                    try:
+                        await asyncio.wait_for(self._batch_full.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+
+            batch = self._pending[: self.batch_size]
+            self._pending = self._pending[self.batch_size :]
+            if self._pending:
+                self._oldest = loop.time()
+            else:
+                self._has_work.clear()
+            self._space.set()
+
+            if batch:
+                await self._flush(batch)
+            if self._stopping and not self._pending:
+                return
+
+    async def _flush(self, batch):
+        start = time.monotonic()
+        try:
+            ids = await db.run(_write_batch, [op[:3] for op in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # One bad row fails the whole transaction; retry singly so only it fails.
+                print(f"--- Interaction batch of {len(batch)} failed, writing rows one by one: {e} ---")
+                for op in batch:
+                    await self._flush([op])
+                return
+            print(f"--- Interaction write failed: {e} ---")
+            self._failed_rows += 1
+            future = batch[0][-1]
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        self._flush_latency.record(time.monotonic() - start)
+        self._batches += 1
+        self._rows += len(batch)
+        for (kind, _, fields, future), interaction_id in zip(batch, ids):
+            if not future.done():
+                future.set_result(interaction_id)
+            for listener in self._listeners:
+                try:
+                    listener(kind, interaction_id, fields)
+                except Exception as e:
+                    print(f"--- Interaction write listener failed: {e} ---")
+
+
+def _consume_exception(future: asyncio.Future):
+    # Writes acked on enqueue may never be awaited; failures are already logged.
+    if not future.cancelled():
+        future.exception()
+
+
+writer = InteractionWriter(
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_MS,
+    WRITE_BEHIND_MAX_PENDING,
+    WRITE_BEHIND_DURABILITY,
+)
+metrics.register("interaction_writer", writer.stats)